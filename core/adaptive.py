@@ -0,0 +1,240 @@
+import logging
+import threading
+import time
+
+from core.detection import ObjectDetector, tile_grid
+
+logger = logging.getLogger(__name__)
+
+# Quality ladder from most accurate (index 0) to cheapest
+QUALITY_LEVELS = [
+    {"model": "models/yolov8l.pt", "imgsz": 640, "sample_rate": 30},
+    {"model": "models/yolov8m.pt", "imgsz": 640, "sample_rate": 30},
+    {"model": "models/yolov8m.pt", "imgsz": 480, "sample_rate": 45},
+    {"model": "models/yolov8s.pt", "imgsz": 480, "sample_rate": 60},
+    {"model": "models/yolov8n.pt", "imgsz": 320, "sample_rate": 90},
+]
+
+
+class AdaptiveDetector:
+    """
+    Wraps ObjectDetector and trades accuracy for speed under load.
+    Queue depth and a moving average of per-frame latency decide whether to step
+    down the quality ladder (smaller model, smaller imgsz, sparser video sampling)
+    or back up. Separate thresholds for each direction plus a minimum dwell time
+    between changes keep the level from flapping.
+
+    Every model on the ladder is loaded up front, so stepping down under load never
+    waits for a model to load. The latency average only counts once warmup samples
+    have been taken at the current level; until then only queue depth can move it.
+    """
+
+    def __init__(self, levels=QUALITY_LEVELS, queue_depth=None, base_detector=None,
+                 high_queue=4, low_queue=0, high_latency=2.0, low_latency=0.75,
+                 min_dwell=5.0, smoothing=0.2, warmup=5, preload=True):
+        self.levels = levels
+        self.queue_depth = queue_depth or (lambda: 0)
+        self.high_queue = high_queue
+        self.low_queue = low_queue
+        self.high_latency = high_latency
+        self.low_latency = low_latency
+        self.min_dwell = min_dwell
+        self.smoothing = smoothing
+        self.warmup = warmup
+
+        self.level = 0
+        self.latency = None  # Moving average of per-frame seconds at this level
+        self.samples = 0
+        self._last_change = time.monotonic()
+        self._detectors = {}
+        self._unavailable = set()
+        self._lock = threading.Lock()
+
+        if base_detector is not None:
+            self._detectors[levels[0]["model"]] = base_detector
+        if preload:
+            self.preload()
+
+    def preload(self):
+        """Load every model on the ladder; models that fail to load are skipped from then on"""
+        for level in self.levels:
+            self._load(level["model"])
+
+    def _load(self, model_path):
+        if model_path in self._detectors or model_path in self._unavailable:
+            return
+        try:
+            self._detectors[model_path] = ObjectDetector(model_path)
+        except Exception as e:
+            logger.warning("Could not load %s, skipping it: %s", model_path, e)
+            self._unavailable.add(model_path)
+
+    def _detector_for(self, model_path):
+        """The loaded detector for a model path, or None if it is not available"""
+        with self._lock:
+            return self._detectors.get(model_path)
+
+    def record_latency(self, seconds, frames=1, level=None):
+        """
+        Fold a per-frame latency measured over `frames` frames into the moving average.
+        Samples taken at another level than the current one (the level changed while
+        the request ran) are ignored.
+        """
+        with self._lock:
+            if level is not None and level != self.level:
+                return
+            if self.latency is None:
+                self.latency = seconds
+            else:
+                # Long runs (whole videos) weigh more than a single image
+                weight = 1 - (1 - self.smoothing) ** max(1, frames)
+                self.latency += weight * (seconds - self.latency)
+            self.samples += frames
+
+    def current_level(self):
+        """Re-evaluate load and return the quality level index to use now"""
+        depth = self.queue_depth()
+        now = time.monotonic()
+        with self._lock:
+            if now - self._last_change < self.min_dwell:
+                return self.level
+
+            warm = self.latency is not None and self.samples >= self.warmup
+            overloaded = depth >= self.high_queue or (warm and self.latency > self.high_latency)
+            # Stepping up needs evidence that this level is fast, not just an empty queue
+            relaxed = depth <= self.low_queue and warm and self.latency < self.low_latency
+
+            if overloaded and self.level < len(self.levels) - 1:
+                self.level += 1
+            elif relaxed and self.level > 0:
+                self.level -= 1
+            else:
+                return self.level
+
+            self._last_change = now
+            # Fresh latency samples are needed at the new level
+            self.latency = None
+            self.samples = 0
+            logger.info("Quality level -> %d %s (queue depth %d)", self.level, self.levels[self.level], depth)
+            return self.level
+
+    def _select(self):
+        """Pick the detector and settings for the current level, falling back to better levels"""
+        index = self.current_level()
+        while index >= 0:
+            level = self.levels[index]
+            detector = self._detector_for(level["model"])
+            if detector is not None:
+                return detector, level, index
+            index -= 1
+        raise RuntimeError("No detection model could be loaded")
+
+    def _options(self, level, options):
+        """Merge request options with the level; a request may ask for a smaller imgsz, never a larger one"""
+        merged = dict(options or {})
+        merged["imgsz"] = min(merged.get("imgsz", level["imgsz"]), level["imgsz"])
+        return merged
+
+    def _info(self, detector, level, index, options, cache_stats, use_cache=False):
+        """Describe the settings actually used (and frame cache reuse), for the response"""
+        hits = cache_stats.get("hits", 0)
+        total = hits + cache_stats.get("misses", 0)
+        return {
+            "model": detector.model_name,
+            "imgsz": options["imgsz"],
+            "sample_rate": level["sample_rate"],
+            "quality_level": index,
+            "frame_cache": {
+                "enabled": use_cache,
+                "hits": hits,
+                "misses": total - hits,
+                "hit_rate": round(hits / total, 4) if total else 0.0
+            }
+        }
+
+    def get_object_positions(self, frame, options=None, tiled=False, use_cache=False, cancel_event=None):
+        """
+        Process a single frame at the current quality; returns (detections, info).
+        tiled=True runs overlapping tiles instead of one squashed pass (for large images);
+        the tile size stays fixed, so lower levels still save work through a smaller imgsz,
+        and setting cancel_event stops it between tile batches.
+        use_cache=True lets near-duplicates of earlier frames reuse their detections.
+        """
+        detector, level, index = self._select()
+        options = self._options(level, options)
+        cache_stats = {}
+        started = time.monotonic()
+        if tiled:
+            results = detector.get_object_positions_tiled(frame, options=options, cancel_event=cancel_event)
+        else:
+            results = detector.get_object_positions(frame, options=options, cache_stats=cache_stats, use_cache=use_cache)
+        info = self._info(detector, level, index, options, cache_stats, use_cache and not tiled)
+        passes = 1
+        if tiled:
+            # Each tile is a model input, so the cost is compared per pass; frames
+            # larger than one tile also get a whole-frame pass
+            info["tiles"] = len(tile_grid(*frame.shape[:2]))
+            passes = info["tiles"] + 1 if info["tiles"] > 1 else 1
+        self.record_latency((time.monotonic() - started) / passes, level=index)
+        return results, info
+
+    def get_object_positions_batch(self, frames, options=None, use_cache=False):
+        """Process a batch of frames at the current quality; returns (detections, info)"""
+        detector, level, index = self._select()
+        options = self._options(level, options)
+        cache_stats = {}
+        started = time.monotonic()
+        results = detector.get_object_positions_batch(frames, options=options, cache_stats=cache_stats, use_cache=use_cache)
+        if frames:
+            self.record_latency((time.monotonic() - started) / len(frames), len(frames), index)
+        return results, self._info(detector, level, index, options, cache_stats, use_cache)
+
+    def process_video(self, video_path, cancel_event=None, options=None, timeline=None,
+                      checkpoints=None, content_hash=None, use_cache=False):
+        """
+        Process a video at the current quality; returns (detections, info).
+        With a CheckpointStore and the file's content hash, progress is checkpointed
+        and an earlier interrupted run with the same settings is resumed.
+        """
+        detector, level, index = self._select()
+        options = self._options(level, options)
+        cache_stats = {}
+        pipeline_stats = {}
+        checkpoint = None
+        if checkpoints is not None and content_hash is not None:
+            checkpoint = checkpoints.open(
+                content_hash, detector.model_name, level["sample_rate"], options, timeline is not None
+            )
+        started = time.monotonic()
+        try:
+            results = detector.process_video(
+                video_path,
+                sample_rate=level["sample_rate"],
+                cancel_event=cancel_event,
+                options=options,
+                timeline=timeline,
+                cache_stats=cache_stats,
+                checkpoint=checkpoint,
+                pipeline_stats=pipeline_stats,
+                use_cache=use_cache
+            )
+        finally:
+            # Also counted for cancelled runs: slow videos are what pushes the level down
+            frames = pipeline_stats.get("stages", {}).get("inference", {}).get("items", 0)
+            if frames:
+                self.record_latency((time.monotonic() - started) / frames, frames, index)
+        info = self._info(detector, level, index, options, cache_stats, use_cache)
+        info["pipeline"] = pipeline_stats
+        if checkpoint is not None:
+            info["resumed_from_frame"] = checkpoint.resumed_from
+        return results, info
+
+    def stats(self):
+        """Current level and load signals for monitoring"""
+        return {
+            "quality_level": self.level,
+            "settings": self.levels[self.level],
+            "latency_ewma": round(self.latency, 4) if self.latency is not None else None,
+            "latency_samples": self.samples,
+            "queue_depth": self.queue_depth()
+        }
@@ -0,0 +1,158 @@
+import asyncio
+import contextvars
+import math
+import threading
+from contextlib import asynccontextmanager
+
+from starlette.concurrency import run_in_threadpool
+
+
+class Overloaded(Exception):
+    """Raised when a request is shed because the route is saturated"""
+
+    def __init__(self, retry_after):
+        super().__init__("Server is busy, please retry later")
+        self.retry_after = retry_after
+
+
+class DeadlineExceeded(Exception):
+    """Raised when a request runs past its deadline"""
+
+
+class ClientDisconnected(Exception):
+    """Raised when the client goes away while its request is being processed"""
+
+
+class _Slot:
+    """One admitted request's hold on a slot"""
+
+    def __init__(self):
+        self.detached = False  # Handed over to a worker thread that outlived the request
+
+
+_current_slot = contextvars.ContextVar("admission_slot", default=None)
+
+
+class AdmissionController:
+    """
+    Concurrency limit with a bounded wait queue for one route.
+    Requests beyond max_concurrent wait in line (at most max_queue of them, for at
+    most queue_timeout seconds); anything past that is shed with Overloaded.
+    """
+
+    def __init__(self, name, max_concurrent, max_queue, queue_timeout=10.0, retry_after=None):
+        self.name = name
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.retry_after = retry_after or max(1, math.ceil(queue_timeout))
+        self._semaphore = None  # Created on first use so it binds to the server's loop
+        self.in_flight = 0
+        self.waiting = 0
+        self.admitted = 0
+        self.shed = 0
+        self.timed_out = 0
+        self.cancelled = 0
+
+    async def acquire(self):
+        """Take a slot, waiting in the queue if needed, or raise Overloaded"""
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrent)
+        if not self._semaphore.locked():
+            # Free slot: acquire() returns without suspending
+            await self._semaphore.acquire()
+        else:
+            if self.waiting >= self.max_queue:
+                self.shed += 1
+                raise Overloaded(self.retry_after)
+
+            self.waiting += 1
+            try:
+                await asyncio.wait_for(self._semaphore.acquire(), self.queue_timeout)
+            except asyncio.TimeoutError:
+                self.shed += 1
+                raise Overloaded(self.retry_after)
+            finally:
+                self.waiting -= 1
+
+        self.in_flight += 1
+        self.admitted += 1
+
+    def release(self):
+        """Give a slot back"""
+        self.in_flight -= 1
+        self._semaphore.release()
+
+    @asynccontextmanager
+    async def admit(self):
+        """
+        Hold a slot for the duration of the block. If run() gave up on its worker
+        thread inside the block, the slot stays held until that thread finishes.
+        """
+        await self.acquire()
+        slot = _Slot()
+        token = _current_slot.set(slot)
+        try:
+            yield
+        finally:
+            _current_slot.reset(token)
+            if not slot.detached:
+                self.release()
+
+    async def check(self, request, started, deadline):
+        """Raise DeadlineExceeded / ClientDisconnected if either has tripped (started is loop time)"""
+        if await request.is_disconnected():
+            self.cancelled += 1
+            raise ClientDisconnected()
+        if asyncio.get_running_loop().time() - started >= deadline:
+            self.timed_out += 1
+            raise DeadlineExceeded()
+
+    def _finish_detached(self, task):
+        if not task.cancelled():
+            task.exception()  # Consumed so it is not reported as unhandled
+        self.release()
+
+    async def run(self, request, func, deadline, cancel_event=None, poll_interval=0.5):
+        """
+        Run blocking func in the threadpool while watching the deadline and the client.
+        When either trips, cancel_event is set so cooperative work (video decoding)
+        stops early, and DeadlineExceeded / ClientDisconnected is raised right away.
+        The worker thread cannot be interrupted, so it finishes detached; when called
+        inside admit(), it keeps the request's slot until then so the route's
+        concurrency limit still counts it.
+        """
+        cancel_event = cancel_event or threading.Event()
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        task = asyncio.ensure_future(run_in_threadpool(func))
+
+        try:
+            while True:
+                remaining = started + deadline - loop.time()
+                done, _ = await asyncio.wait({task}, timeout=max(0.0, min(poll_interval, remaining)))
+                if done:
+                    return task.result()
+                await self.check(request, started, deadline)
+        except (ClientDisconnected, DeadlineExceeded):
+            cancel_event.set()
+            slot = _current_slot.get()
+            if slot is not None:
+                slot.detached = True
+                task.add_done_callback(self._finish_detached)
+            else:
+                task.add_done_callback(lambda task: task.cancelled() or task.exception())
+            raise
+
+    def stats(self):
+        """Current queue depth and counters for monitoring"""
+        return {
+            "max_concurrent": self.max_concurrent,
+            "max_queue": self.max_queue,
+            "in_flight": self.in_flight,
+            "queue_depth": self.waiting,
+            "admitted": self.admitted,
+            "shed": self.shed,
+            "timed_out": self.timed_out,
+            "cancelled": self.cancelled
+        }
@@ -0,0 +1,198 @@
+import gzip
+import hashlib
+import mimetypes
+import os
+import re
+
+from starlette.datastructures import Headers
+from starlette.responses import FileResponse, PlainTextResponse, Response
+
+try:
+    import brotli
+except ImportError:  # Brotli is optional; gzip is always available
+    brotli = None
+
+TEXT_EXTENSIONS = {'.css', '.js', '.html', '.svg', '.json', '.txt', '.map'}
+MIN_COMPRESS_SIZE = 1024  # Smaller files are not worth compressing
+IMMUTABLE_CACHE = "public, max-age=31536000, immutable"
+REVALIDATE_CACHE = "no-cache"
+
+# "css/style.3f9a1c2b7d.css" -> "css/style.css" with fingerprint 3f9a1c2b7d
+FINGERPRINT_RE = re.compile(r'^(?P<stem>.+)\.(?P<fingerprint>[0-9a-f]{10})(?P<ext>\.[^./]+)$')
+
+
+class Asset:
+    """One static file: content digest, strong ETag and, for text, precompressed variants"""
+
+    def __init__(self, path, relative):
+        self.path = path
+        self.relative = relative
+        stat = os.stat(path)
+        self.mtime = stat.st_mtime
+        self.size = stat.st_size
+        self.content_type = mimetypes.guess_type(path)[0] or 'application/octet-stream'
+        if self.content_type.startswith('text/') or self.content_type in ('application/javascript', 'application/json'):
+            self.content_type += '; charset=utf-8'
+
+        digest = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b''):
+                digest.update(chunk)
+        self.digest = digest.hexdigest()
+        self.fingerprint = self.digest[:10]
+
+        # Text assets are small: keep them (and their compressed forms) in memory
+        self.variants = {}
+        if os.path.splitext(path)[1].lower() in TEXT_EXTENSIONS:
+            with open(path, 'rb') as f:
+                content = f.read()
+            self.variants[None] = content
+            if len(content) >= MIN_COMPRESS_SIZE:
+                self.variants['gzip'] = gzip.compress(content, compresslevel=9, mtime=0)
+                if brotli is not None:
+                    self.variants['br'] = brotli.compress(content, quality=11)
+
+    def etag(self, encoding=None):
+        """Strong ETag per representation (each encoding has different bytes)"""
+        suffix = f'-{encoding}' if encoding else ''
+        return f'"{self.digest[:32]}{suffix}"'
+
+    def is_stale(self):
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            return True
+        return stat.st_mtime != self.mtime or stat.st_size != self.size
+
+
+def _route_path(scope):
+    """Request path relative to the mount point"""
+    path = scope['path']
+    root_path = scope.get('root_path', '')
+    if root_path and path.startswith(root_path + '/'):
+        return path[len(root_path):]
+    return path
+
+
+def _accepted_encodings(header):
+    """Encodings from Accept-Encoding with a non-zero q value"""
+    accepted = set()
+    for part in header.split(','):
+        name, _, params = part.strip().partition(';')
+        name = name.strip().lower()
+        q = 1.0
+        if params.strip().startswith('q='):
+            try:
+                q = float(params.strip()[2:])
+            except ValueError:
+                q = 0.0
+        if name and q > 0:
+            accepted.add(name)
+    return accepted
+
+
+class AssetFiles:
+    """
+    ASGI app serving a static directory with:
+    - gzip/brotli variants of text assets built once at startup and picked by Accept-Encoding
+    - strong content-hash ETags and 304 answers to If-None-Match
+    - immutable, year-long caching for fingerprinted URLs (see url()); plain URLs revalidate
+    - Range requests for everything else (images, the demo video) via FileResponse
+    """
+
+    def __init__(self, directory, prefix="/static"):
+        self.directory = os.path.realpath(directory)
+        self.prefix = prefix.rstrip('/')
+        self.assets = {}
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                path = os.path.join(root, name)
+                relative = os.path.relpath(path, self.directory).replace(os.sep, '/')
+                self.assets[relative] = Asset(path, relative)
+
+    def url(self, relative):
+        """Fingerprinted URL for a file, e.g. /static/js/api.1a2b3c4d5e.js"""
+        asset = self._lookup(relative)
+        if asset is None:
+            return f"{self.prefix}/{relative}"
+        stem, ext = os.path.splitext(relative)
+        return f"{self.prefix}/{stem}.{asset.fingerprint}{ext}"
+
+    def _lookup(self, relative):
+        """Find (and refresh if changed on disk) the asset for a relative path"""
+        asset = self.assets.get(relative)
+        if asset is not None and not asset.is_stale():
+            return asset
+
+        path = os.path.realpath(os.path.join(self.directory, relative))
+        if not path.startswith(self.directory + os.sep) or not os.path.isfile(path):
+            self.assets.pop(relative, None)
+            return None
+        asset = self.assets[relative] = Asset(path, relative)
+        return asset
+
+    def _resolve(self, relative):
+        """Map a request path to (asset, immutable)"""
+        match = FINGERPRINT_RE.match(relative)
+        if match:
+            asset = self._lookup(match.group('stem') + match.group('ext'))
+            if asset is not None:
+                # Only a matching fingerprint may be cached forever
+                return asset, asset.fingerprint == match.group('fingerprint')
+        return self._lookup(relative), False
+
+    async def __call__(self, scope, receive, send):
+        assert scope['type'] == 'http'
+        if scope['method'] not in ('GET', 'HEAD'):
+            response = PlainTextResponse("Method Not Allowed", status_code=405, headers={"Allow": "GET, HEAD"})
+            await response(scope, receive, send)
+            return
+
+        relative = _route_path(scope).lstrip('/')
+        if '..' in relative.split('/'):
+            asset, immutable = None, False
+        else:
+            asset, immutable = self._resolve(relative)
+
+        if asset is None:
+            await PlainTextResponse("Not Found", status_code=404)(scope, receive, send)
+            return
+
+        headers = Headers(scope=scope)
+        response = self._response(asset, immutable, headers, scope['method'] == 'HEAD')
+        await response(scope, receive, send)
+
+    def _response(self, asset, immutable, request_headers, head):
+        encoding = None
+        if asset.variants:
+            accepted = _accepted_encodings(request_headers.get('accept-encoding', ''))
+            for candidate in ('br', 'gzip'):
+                if candidate in asset.variants and candidate in accepted:
+                    encoding = candidate
+                    break
+
+        etag = asset.etag(encoding)
+        headers = {
+            "ETag": etag,
+            "Cache-Control": IMMUTABLE_CACHE if immutable else REVALIDATE_CACHE,
+        }
+        if asset.variants:
+            headers["Vary"] = "Accept-Encoding"
+
+        if_none_match = request_headers.get('if-none-match')
+        if if_none_match:
+            tags = {tag.strip().removeprefix('W/') for tag in if_none_match.split(',')}
+            if etag in tags or '*' in tags:
+                return Response(status_code=304, headers=headers)
+
+        if asset.variants:
+            if encoding:
+                headers["Content-Encoding"] = encoding
+            body = b'' if head else asset.variants[encoding]
+            response = Response(content=body, media_type=asset.content_type, headers=headers)
+            if head:
+                response.headers['content-length'] = str(len(asset.variants[encoding]))
+            return response
+
+        # Binary assets stream from disk; FileResponse answers Range / If-Range requests
+        return FileResponse(asset.path, media_type=asset.content_type, headers=headers)
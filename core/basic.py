@@ -1,7 +1,7 @@
 from ultralytics import YOLO
 import cv2
-import requests
 import time
+from core.publisher import EventPublisher
 
 # Load YOLOv8 model
 model = YOLO("yolov8l.pt")  # Use "yolov8n.pt" for speed
@@ -9,9 +9,15 @@ model = YOLO("yolov8l.pt")  # Use "yolov8n.pt" for speed
 # Define target objects
 TARGET_OBJECTS = ["person", "chair", "bottle", "bag", "table", "cellphone"]
 
+# Class IDs for the targets, so the model skips everything else during inference
+TARGET_CLASS_IDS = [cls for cls, name in model.names.items() if name in TARGET_OBJECTS]
+
 
 API_URL = "https://jaguar-giving-awfully.ngrok-free.app/process_objects"  # Replace with actual server URL
 
+# Sends updates from a background thread so the capture loop never waits on the network
+publisher = EventPublisher(API_URL).start()
+
 # Tracking variables
 previous_objects = {}
 last_stable_objects = {}  # Stores the last stable detection
@@ -28,7 +34,7 @@ while cap.isOpened():
         break
 
     # Run YOLOv8 inference9-
-    results = model(frame, device="cpu", imgsz=640, conf=0.5, verbose=False)
+    results = model(frame, device="cpu", imgsz=640, conf=0.5, classes=TARGET_CLASS_IDS, verbose=False)
 
     detected_objects = {}
 
@@ -65,11 +71,8 @@ while cap.isOpened():
         previous_objects = detected_objects.copy()
         data = {"objects": detected_objects}
 
-        try:
-            response = requests.post(API_URL, json=data, headers={"Content-Type": "application/json"})
-            print(f"✅ Sent to API: {data} | Response: {response.status_code} {response.text}")
-        except requests.exceptions.RequestException as e:
-            print(f"❌ API Error: {e}")
+        publisher.publish("camera-0", data)
+        print(f"✅ Queued for API: {data}")
 
     # Display the live feed (Optional)
     cv2.imshow("YOLOv8 Object Detection", frame)
@@ -80,3 +83,4 @@ while cap.isOpened():
 
 cap.release()
 cv2.destroyAllWindows()
+publisher.stop()
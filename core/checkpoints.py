@@ -0,0 +1,107 @@
+import hashlib
+import json
+import os
+import tempfile
+import time
+
+import numpy as np
+
+from core.frame_cache import options_key
+
+CHECKPOINT_DIR = os.environ.get("VIOR_CHECKPOINT_DIR", "checkpoints")
+CHECKPOINT_INTERVAL = 30  # Seconds between saves while a video is processed
+MAX_AGE = 24 * 60 * 60  # Checkpoints nobody came back for are removed after a day
+
+
+class VideoCheckpoint:
+    """
+    Saved progress of one video run: the next frame to read, tracker state and,
+    when a timeline is recorded, its rows. Saves are atomic (write then rename),
+    so a worker killed mid-save leaves the previous checkpoint intact.
+    """
+
+    def __init__(self, path, interval=CHECKPOINT_INTERVAL):
+        self.path = path
+        self.interval = interval
+        self.resumed_from = None  # Frame the last load() resumed at
+        self._last_save = time.monotonic()
+
+    def load(self):
+        """Return the saved state ({'frame', 'tracker', 'timeline'}) or None"""
+        try:
+            with np.load(self.path, allow_pickle=False) as data:
+                state = json.loads(str(data['state']))
+                state['timeline'] = data['rows'] if 'rows' in data.files else None
+        except (OSError, ValueError, KeyError):
+            # Missing or unreadable (e.g. from an older layout): start from the beginning
+            return None
+        self.resumed_from = state['frame']
+        self._last_save = time.monotonic()
+        return state
+
+    def due(self):
+        return time.monotonic() - self._last_save >= self.interval
+
+    def save(self, frame, tracker, timeline=None):
+        """Record that everything before `frame` is processed"""
+        arrays = {}
+        if timeline is not None:
+            arrays['rows'] = timeline.rows
+            tracker = dict(tracker, track_names={str(k): v for k, v in timeline.track_names.items()})
+        arrays['state'] = np.array(json.dumps({'frame': frame, 'tracker': tracker}))
+
+        fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(self.path), suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                np.savez(f, **arrays)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(temp_path, self.path)
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+        self._last_save = time.monotonic()
+
+    def clear(self):
+        """Drop the checkpoint once the video is fully processed"""
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+
+
+class CheckpointStore:
+    """
+    Local directory of video checkpoints keyed by the file's content hash plus
+    everything that changes the results (model, sample rate, inference options,
+    whether a timeline is recorded), so a retried upload of the same file with the
+    same settings resumes where the last attempt stopped.
+    """
+
+    def __init__(self, directory=CHECKPOINT_DIR, interval=CHECKPOINT_INTERVAL, max_age=MAX_AGE):
+        self.directory = directory
+        self.interval = interval
+        self.max_age = max_age
+
+    def open(self, content_hash, model_name, sample_rate, options=None, timeline=False):
+        """Checkpoint for one video run (nothing is read or written until it is used)"""
+        os.makedirs(self.directory, exist_ok=True)
+        self.prune()
+        settings = json.dumps([options_key(model_name, options), sample_rate, bool(timeline)], default=str)
+        key = hashlib.sha256(f"{content_hash}:{settings}".encode()).hexdigest()[:32]
+        return VideoCheckpoint(os.path.join(self.directory, f"{key}.npz"), self.interval)
+
+    def prune(self):
+        """Remove checkpoints (and stray temp files) older than max_age"""
+        cutoff = time.time() - self.max_age
+        try:
+            entries = list(os.scandir(self.directory))
+        except FileNotFoundError:
+            return
+        for entry in entries:
+            try:
+                if entry.stat().st_mtime < cutoff:
+                    os.remove(entry.path)
+            except OSError:
+                pass
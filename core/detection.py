@@ -4,42 +4,297 @@ from ultralytics import YOLO
 import tempfile
 import os
 import shutil
+import threading
+import logging
+from core.admission import DeadlineExceeded
+from core.frame_cache import fingerprint, options_key, shared_frame_cache
+from core.inference_options import PREDICT_DEFAULTS
+from core.pipeline import Pipeline, Stage
+
+logger = logging.getLogger(__name__)
+
+class ProcessingCancelled(Exception):
+    """Raised when a caller asks a long-running job to stop"""
+
+BATCH_SIZE = 8  # Frames per model call on batch paths
+
+IMGSZ = 640  # Model input size when the request does not set imgsz
+MODEL_STRIDE = 32  # Letterboxed inputs must be a multiple of this
+LETTERBOX_COLOR = (114, 114, 114)  # Padding the YOLO models are trained with
+
+TILE_SIZE = 640  # Tile edge in pixels for tiled inference
+TILE_OVERLAP = 0.2  # Fraction of a tile shared with its neighbour
+TILE_MERGE_THRESHOLD = 0.6  # Share of a box cut at a tile seam inside a kept box above which it is dropped
+TILE_SEAM_MARGIN = 2  # Pixels from a tile seam within which a box counts as cut off by it
+
+def tile_grid(height, width, tile_size=TILE_SIZE, overlap=TILE_OVERLAP):
+    """Top-left (x, y) corners of overlapping tiles covering the frame; edge tiles are shifted inward"""
+    stride = max(1, int(tile_size * (1 - overlap)))
+
+    def starts(length):
+        if length <= tile_size:
+            return [0]
+        positions = list(range(0, length - tile_size, stride))
+        positions.append(length - tile_size)
+        return positions
+
+    return [(x, y) for y in starts(height) for x in starts(width)]
+
+def _cut_at_seam(data, regions, width, height, margin=TILE_SEAM_MARGIN):
+    """Whether each box reaches an edge of the region it was found in that lies inside the image"""
+    left = (regions[:, 0] > 0) & (data[:, 0] - regions[:, 0] <= margin)
+    top = (regions[:, 1] > 0) & (data[:, 1] - regions[:, 1] <= margin)
+    right = (regions[:, 2] < width) & (regions[:, 2] - data[:, 2] <= margin)
+    bottom = (regions[:, 3] < height) & (regions[:, 3] - data[:, 3] <= margin)
+    return left | top | right | bottom
+
+def merge_tile_boxes(boxes, regions, shape, iou_threshold=PREDICT_DEFAULTS['iou'], threshold=TILE_MERGE_THRESHOLD):
+    """
+    Cross-tile non-maximum suppression. regions holds the (x1, y1, x2, y2) tile (or
+    whole frame) each box was found in, and only same-class boxes from different
+    regions are compared - each model pass already ran NMS on its own boxes.
+    Boxes whole within their tile go first, then by confidence; a later box is
+    dropped if its IoU with a kept one reaches iou_threshold or, when it is cut
+    off at a tile seam, if at least threshold of it lies inside a kept box.
+    Kept boxes are returned unchanged.
+    """
+    if not boxes:
+        return []
+    height, width = shape
+    data = np.array([box[:4] for box in boxes], dtype=np.float64)
+    classes = np.array([box[4] for box in boxes])
+    scores = np.array([box[5] for box in boxes], dtype=np.float64)
+    regions = np.array(regions, dtype=np.float64)
+    region_ids = np.unique(regions, axis=0, return_inverse=True)[1].reshape(-1)
+    areas = np.maximum((data[:, 2] - data[:, 0]) * (data[:, 3] - data[:, 1]), 1e-6)
+    cut = _cut_at_seam(data, regions, width, height)
+
+    kept = []
+    for i in np.lexsort((-scores, cut)):
+        others = np.array(kept, dtype=np.int64)
+        others = others[(classes[others] == classes[i]) & (region_ids[others] != region_ids[i])]
+        if len(others):
+            x1 = np.maximum(data[i, 0], data[others, 0])
+            y1 = np.maximum(data[i, 1], data[others, 1])
+            x2 = np.minimum(data[i, 2], data[others, 2])
+            y2 = np.minimum(data[i, 3], data[others, 3])
+            inter = np.clip(x2 - x1, 0, None) * np.clip(y2 - y1, 0, None)
+            duplicate = inter / (areas[i] + areas[others] - inter) >= iou_threshold
+            if cut[i]:
+                duplicate |= inter / areas[i] >= threshold
+            if duplicate.any():
+                continue
+        kept.append(i)
+    return [
+        (float(data[i, 0]), float(data[i, 1]), float(data[i, 2]), float(data[i, 3]), int(classes[i]), float(scores[i]))
+        for i in kept
+    ]
+
+def letterbox(frame, imgsz=IMGSZ, stride=MODEL_STRIDE, auto=True):
+    """
+    YOLO preprocessing done outside the model call: resize a BGR frame to fit imgsz
+    keeping its aspect ratio, pad it (minimally to a stride multiple when auto, else to
+    a square) and convert it to a normalized RGB CHW float32 array. Returns the array
+    and (gain, pad_x, pad_y) for mapping boxes back with unletterbox_boxes().
+    """
+    height, width = frame.shape[:2]
+    gain = min(imgsz / height, imgsz / width)
+    new_width, new_height = int(round(width * gain)), int(round(height * gain))
+    pad_w, pad_h = imgsz - new_width, imgsz - new_height
+    if auto:
+        pad_w, pad_h = pad_w % stride, pad_h % stride
+    pad_w, pad_h = pad_w / 2, pad_h / 2
+
+    if (new_width, new_height) != (width, height):
+        frame = cv2.resize(frame, (new_width, new_height), interpolation=cv2.INTER_LINEAR)
+    top, bottom = int(round(pad_h - 0.1)), int(round(pad_h + 0.1))
+    left, right = int(round(pad_w - 0.1)), int(round(pad_w + 0.1))
+    frame = cv2.copyMakeBorder(frame, top, bottom, left, right, cv2.BORDER_CONSTANT, value=LETTERBOX_COLOR)
+    return cv2.dnn.blobFromImage(frame, scalefactor=1 / 255, swapRB=True)[0], (gain, left, top)
+
+def unletterbox_boxes(result, transform, shape):
+    """Map a result's boxes from letterboxed input back to (x1, y1, x2, y2, cls, conf) in the original frame"""
+    gain, pad_x, pad_y = transform
+    height, width = shape
+    boxes = []
+    for box in result.boxes:
+        x1, y1, x2, y2 = box.xyxy[0].tolist()
+        boxes.append((
+            min(max((x1 - pad_x) / gain, 0), width), min(max((y1 - pad_y) / gain, 0), height),
+            min(max((x2 - pad_x) / gain, 0), width), min(max((y2 - pad_y) / gain, 0), height),
+            int(box.cls[0].item()), float(box.conf[0].item())
+        ))
+    return boxes
 
 class ObjectDetector:
-    def __init__(self, model_path="models/yolov8l.pt"):
+    def __init__(self, model_path="models/yolov8l.pt", batch_size=BATCH_SIZE, frame_cache=shared_frame_cache):
         self.model = YOLO(model_path)
+        self.model_name = os.path.splitext(os.path.basename(model_path))[0]
+        self.batch_size = batch_size
+        self.frame_cache = frame_cache  # Store for near-duplicate reuse; callers opt in per call
+        # The predictor keeps per-call state, and routes, batches and video pipelines share one model
+        self._model_lock = threading.Lock()
 
-    def get_object_positions(self, frame):
-        """Process a single frame and return detections"""
-        height, width = frame.shape[:2]
-        results = self.model(frame)
+    def _predict(self, source, options=None):
+        """
+        Run the model with predict kwargs (classes, conf, iou, max_det, imgsz). Unset
+        options are passed with their defaults: the predictor would otherwise keep
+        whatever the previous caller set.
+        """
+        kwargs = dict(PREDICT_DEFAULTS, **(options or {}))
+        with self._model_lock:
+            return self.model(source, **kwargs)
+
+    def _predict_preprocessed(self, arrays, options=None):
+        """Run the model on letterboxed arrays from letterbox(); boxes come back in letterboxed coordinates"""
+        import torch  # Installed with ultralytics
+        return self._predict(torch.from_numpy(np.stack(arrays)), options)
+
+    def _cached_boxes(self, namespace, key, shape, source=None):
+        """Boxes of a near-duplicate frame scaled to this frame's size, or None"""
+        cached = self.frame_cache.get(namespace, key, source)
+        if cached is None:
+            return None
+        # Cached boxes are stored relative to frame size
+        height, width = shape
+        return [
+            (x1 * width, y1 * height, x2 * width, y2 * height, cls, confidence)
+            for x1, y1, x2, y2, cls, confidence in cached
+        ]
+
+    def _cache_boxes(self, namespace, key, shape, boxes, source=None):
+        height, width = shape
+        self.frame_cache.put(namespace, key, [
+            (x1 / width, y1 / height, x2 / width, y2 / height, cls, confidence)
+            for x1, y1, x2, y2, cls, confidence in boxes
+        ], source)
+
+    def _detect(self, frames, options=None, cache_stats=None, use_cache=False):
+        """
+        Return (x1, y1, x2, y2, cls, confidence) boxes for each frame.
+        With use_cache, frames that are near-duplicates of earlier ones reuse the
+        cached boxes; only the rest go through the model, together in one call.
+        """
+        boxes = [None] * len(frames)
+        misses = list(range(len(frames)))
+        use_cache = use_cache and self.frame_cache is not None
+        
+        if use_cache:
+            namespace = options_key(self.model_name, options)
+            keys = [fingerprint(frame) for frame in frames]
+            misses = []
+            for i, frame in enumerate(frames):
+                boxes[i] = self._cached_boxes(namespace, keys[i], frame.shape[:2])
+                if boxes[i] is None:
+                    misses.append(i)
         
+        if misses:
+            source = frames[misses[0]] if len(misses) == 1 else [frames[i] for i in misses]
+            for i, result in zip(misses, self._predict(source, options)):
+                boxes[i] = [
+                    (*box.xyxy[0].tolist(), int(box.cls[0].item()), float(box.conf[0].item()))
+                    for box in result.boxes
+                ]
+                if use_cache:
+                    self._cache_boxes(namespace, keys[i], frames[i].shape[:2], boxes[i])
+        
+        if cache_stats is not None:
+            cache_stats['hits'] = cache_stats.get('hits', 0) + len(frames) - len(misses)
+            cache_stats['misses'] = cache_stats.get('misses', 0) + len(misses)
+        return boxes
+
+    def _detect_tiled(self, frame, options=None, tile_size=TILE_SIZE, overlap=TILE_OVERLAP, cancel_event=None):
+        """
+        Boxes for a large frame from overlapping tiles, plus one pass over the whole
+        frame so objects larger than a tile are still found. Tiles are views into the
+        frame and go through the model batch_size at a time, so work grows with the
+        area while peak memory stays at one batch of tiles. Stops with DeadlineExceeded
+        between batches once cancel_event is set.
+        """
+        height, width = frame.shape[:2]
+        corners = tile_grid(height, width, tile_size, overlap)
+        if len(corners) == 1:
+            return self._detect([frame], options)[0]
+
+        boxes, regions = [], []
+        for start in range(0, len(corners), self.batch_size):
+            if cancel_event is not None and cancel_event.is_set():
+                raise DeadlineExceeded()
+            batch = corners[start:start + self.batch_size]
+            tiles = [frame[y:y + tile_size, x:x + tile_size] for x, y in batch]
+            source = tiles[0] if len(tiles) == 1 else tiles
+            # Tiles bypass the frame cache: flat tiles (sky, water) hash alike without being alike
+            for (x, y), result in zip(batch, self._predict(source, options)):
+                region = (x, y, min(x + tile_size, width), min(y + tile_size, height))
+                for box in result.boxes:
+                    x1, y1, x2, y2 = box.xyxy[0].tolist()
+                    boxes.append((x1 + x, y1 + y, x2 + x, y2 + y, int(box.cls[0].item()), float(box.conf[0].item())))
+                    regions.append(region)
+
+        if cancel_event is not None and cancel_event.is_set():
+            raise DeadlineExceeded()
+        for result in self._predict(frame, options):
+            for box in result.boxes:
+                boxes.append((*box.xyxy[0].tolist(), int(box.cls[0].item()), float(box.conf[0].item())))
+                regions.append((0, 0, width, height))
+
+        iou = (options or {}).get('iou', PREDICT_DEFAULTS['iou'])
+        merged = merge_tile_boxes(boxes, regions, (height, width), iou)
+        max_det = (options or {}).get('max_det')
+        if max_det:
+            merged = sorted(merged, key=lambda box: box[5], reverse=True)[:max_det]
+        return merged
+
+    def get_object_positions_tiled(self, frame, options=None, tile_size=TILE_SIZE, overlap=TILE_OVERLAP,
+                                   cancel_event=None):
+        """
+        Process a large frame tile by tile (small objects keep their resolution) and return
+        detections (raises DeadlineExceeded if cancel_event is set before the last batch)
+        """
+        height, width = frame.shape[:2]
+        boxes = self._detect_tiled(frame, options, tile_size, overlap, cancel_event)
+        return self._group_detections(boxes, width, height)
+
+    def get_object_positions(self, frame, options=None, cache_stats=None, use_cache=False):
+        """Process a single frame and return detections (use_cache: reuse results of near-duplicate frames)"""
+        height, width = frame.shape[:2]
+        boxes = self._detect([frame], options, cache_stats, use_cache)[0]
+        return self._group_detections(boxes, width, height)
+
+    def get_object_positions_batch(self, frames, options=None, cache_stats=None, use_cache=False):
+        """Process several frames in one model call and return detections per frame"""
+        if not frames:
+            return []
+        boxes = self._detect(frames, options, cache_stats, use_cache)
+        return [
+            self._group_detections(frame_boxes, frame.shape[1], frame.shape[0])
+            for frame, frame_boxes in zip(frames, boxes)
+        ]
+
+    def _group_detections(self, boxes, width, height):
+        """Convert one frame's boxes into detections grouped by object type"""
         # Dictionary to keep track of object counts
         object_counts = {}
         detections = []
         
-        for result in results:
-            for box in result.boxes:
-                x1, y1, x2, y2 = box.xyxy[0].tolist()
-                cls = int(box.cls[0].item())
-                label = self.model.names[cls]
-                confidence = float(box.conf[0].item())
-                
-                # Update object count and get unique ID
-                object_counts[label] = object_counts.get(label, 0) + 1
-                object_id = f"{label}_{object_counts[label]}"
-                
-                # Calculate center points and determine position
-                x_center = (x1 + x2) / 2
-                y_center = (y1 + y2) / 2
-                position = self._determine_position(x_center, y_center, width, height)
-                
-                detections.append({
-                    'object_id': object_id,
-                    'object': label,
-                    'position': position,
-                    'confidence': round(confidence, 3)
-                })
+        for x1, y1, x2, y2, cls, confidence in boxes:
+            label = self.model.names[cls]
+            
+            # Update object count and get unique ID
+            object_counts[label] = object_counts.get(label, 0) + 1
+            object_id = f"{label}_{object_counts[label]}"
+            
+            # Calculate center points and determine position
+            x_center = (x1 + x2) / 2
+            y_center = (y1 + y2) / 2
+            position = self._determine_position(x_center, y_center, width, height)
+            
+            detections.append({
+                'object_id': object_id,
+                'object': label,
+                'position': position,
+                'confidence': round(confidence, 3)
+            })
         
         # Group detections by object type
         grouped_detections = {}
@@ -55,14 +310,89 @@ class ObjectDetector:
         
         return grouped_detections
 
-    def process_video(self, video_path: str, sample_rate=30):
-        """Process video and track objects"""
+    def _video_pipeline(self, cap, start_frame, sample_rate, options, cache_stats, use_cache=False):
+        """
+        Staged pipeline yielding (frame_number, boxes) for every sampled frame, in order:
+        decode (grab every frame, decode only sampled ones) -> preprocess (fingerprint and
+        letterbox) -> inference (whatever frames are ready, up to batch_size, minus frames
+        the cache answers from other videos) -> the caller's tracking loop.
+        Frames never reuse results from earlier frames of the same run: consecutive
+        frames look alike, and reusing them would hide whatever moves in between.
+        """
+        imgsz = (options or {}).get('imgsz', IMGSZ)
+        namespace = options_key(self.model_name, options)
+        cache = self.frame_cache if use_cache else None
+        run = object()  # Cache source tag of this run
+
+        def read_frames():
+            frame_number = start_frame
+            while True:
+                if frame_number % sample_rate == 0:
+                    ret, frame = cap.read()
+                    if not ret:
+                        return
+                    yield frame_number, frame
+                elif not cap.grab():
+                    return
+                frame_number += 1
+
+        def preprocess(item):
+            frame_number, frame = item
+            key = fingerprint(frame) if cache is not None else None
+            array, transform = letterbox(frame, imgsz)
+            return frame_number, frame.shape[:2], key, array, transform
+
+        def infer(batch):
+            boxes = [None] * len(batch)
+            pending = []
+            for i, (_, shape, key, _, _) in enumerate(batch):
+                if cache is not None:
+                    boxes[i] = self._cached_boxes(namespace, key, shape, source=run)
+                    if boxes[i] is not None:
+                        continue
+                pending.append(i)
+
+            if pending:
+                for i, result in zip(pending, self._predict_preprocessed([batch[i][3] for i in pending], options)):
+                    _, shape, key, _, transform = batch[i]
+                    boxes[i] = unletterbox_boxes(result, transform, shape)
+                    if cache is not None:
+                        self._cache_boxes(namespace, key, shape, boxes[i], source=run)
+
+            if cache_stats is not None:
+                cache_stats['hits'] = cache_stats.get('hits', 0) + len(batch) - len(pending)
+                cache_stats['misses'] = cache_stats.get('misses', 0) + len(pending)
+            return [(item[0], frame_boxes) for item, frame_boxes in zip(batch, boxes)]
+
+        return Pipeline("video", read_frames(), [
+            Stage("preprocess", preprocess),
+            Stage("inference", infer, batch_size=self.batch_size)
+        ], consumer_name="tracking")
+
+    def process_video(self, video_path: str, sample_rate=30, cancel_event=None, options=None, timeline=None,
+                      cache_stats=None, checkpoint=None, pipeline_stats=None, use_cache=False):
+        """
+        Process video and track objects (stops early once cancel_event is set).
+        Decoding, preprocessing, inference and tracking run as overlapping pipeline
+        stages; per-stage utilization is written into pipeline_stats if given.
+        With use_cache, frames matching frames of other videos reuse their results.
+        If a DetectionTimeline is given, every sampled detection is recorded in it.
+        With a VideoCheckpoint, progress is saved periodically and a saved run is
+        resumed by seeking to its frame; the checkpoint is kept when the run is
+        cancelled or fails (saving the progress up to the last completed frame)
+        and cleared once the video is done.
+        """
         cap = cv2.VideoCapture(video_path)
         if not cap.isOpened():
             raise ValueError("Could not open video file")
         
         width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
         height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+        fps = cap.get(cv2.CAP_PROP_FPS) or 30
+        
+        if timeline is not None:
+            timeline.names = dict(self.model.names)
+            timeline.fps = fps
         
         # Dictionary to track unique objects
         unique_objects = {}
@@ -70,20 +400,35 @@ class ObjectDetector:
         
         frame_number = 0
         
-        while cap.isOpened():
-            ret, frame = cap.read()
-            if not ret:
-                break
-                
-            if frame_number % sample_rate == 0:
-                results = self.model(frame)
-                
-                for result in results:
-                    for box in result.boxes:
-                        x1, y1, x2, y2 = box.xyxy[0].tolist()
-                        cls = int(box.cls[0].item())
+        state = checkpoint.load() if checkpoint is not None else None
+        if state is not None:
+            unique_objects = state['tracker']['unique_objects']
+            object_counts = state['tracker']['object_counts']
+            if timeline is not None and state['timeline'] is not None:
+                timeline.extend(state['timeline'])
+                timeline.track_names.update({int(k): v for k, v in state['tracker']['track_names'].items()})
+            frame_number = self._seek(cap, state['frame'])
+        
+        # Frame a resumed run would start at, and whether the tracker is mid-update
+        resume_at = saved_at = frame_number
+        in_frame = False
+        
+        pipeline = self._video_pipeline(cap, frame_number, sample_rate, options, cache_stats, use_cache)
+        try:
+            with pipeline:
+                for frame_number, boxes in pipeline:
+                    if cancel_event is not None and cancel_event.is_set():
+                        raise ProcessingCancelled("Video processing was cancelled")
+                    
+                    if checkpoint is not None and checkpoint.due():
+                        # Everything before this frame is done
+                        tracker = {'unique_objects': unique_objects, 'object_counts': object_counts}
+                        checkpoint.save(frame_number, tracker, timeline)
+                        saved_at = frame_number
+                    
+                    in_frame = True
+                    for x1, y1, x2, y2, cls, confidence in boxes:
                         label = self.model.names[cls]
-                        confidence = float(box.conf[0].item())
                         
                         x_center = (x1 + x2) / 2
                         y_center = (y1 + y2) / 2
@@ -91,12 +436,14 @@ class ObjectDetector:
                         
                         # Track unique objects
                         new_object = True
+                        track = None
                         for obj_key, obj_data in unique_objects.items():
                             if obj_data['object'] == label:
                                 stored_x = obj_data['center_x']
                                 stored_y = obj_data['center_y']
                                 if abs(stored_x - x_center) < width * 0.1 and abs(stored_y - y_center) < height * 0.1:
                                     new_object = False
+                                    track = obj_data
                                     if confidence > obj_data['confidence']:
                                         obj_data['position'] = position
                                         obj_data['confidence'] = confidence
@@ -107,18 +454,43 @@ class ObjectDetector:
                         if new_object:
                             object_counts[label] = object_counts.get(label, 0) + 1
                             object_id = f"{label}_{object_counts[label]}"
-                            unique_objects[object_id] = {
+                            track = unique_objects[object_id] = {
                                 'object': label,
                                 'object_id': object_id,
+                                'track_id': len(unique_objects) + 1,
                                 'position': position,
                                 'confidence': confidence,
                                 'center_x': x_center,
                                 'center_y': y_center
                             }
-            
-            frame_number += 1
+                            if timeline is not None:
+                                timeline.track_names[track['track_id']] = object_id
+                        
+                        if timeline is not None:
+                            timeline.append(
+                                frame_number, frame_number / fps, cls, track['track_id'],
+                                (x1, y1, x2, y2), confidence
+                            )
+                    in_frame = False
+                    resume_at = frame_number + 1
+        except BaseException:
+            # Keep the work done since the last periodic save for the retry. A frame
+            # interrupted halfway left the tracker inconsistent, so then the last
+            # periodic checkpoint stands.
+            if checkpoint is not None and not in_frame and resume_at > saved_at:
+                tracker = {'unique_objects': unique_objects, 'object_counts': object_counts}
+                try:
+                    checkpoint.save(resume_at, tracker, timeline)
+                except Exception as e:
+                    logger.warning("Could not save checkpoint at frame %d: %s", resume_at, e)
+            raise
+        finally:
+            cap.release()
+            if pipeline_stats is not None:
+                pipeline_stats.update(pipeline.stats())
         
-        cap.release()
+        if checkpoint is not None:
+            checkpoint.clear()
         
         # Group objects by type
         grouped_objects = {}
@@ -134,6 +506,18 @@ class ObjectDetector:
         
         return grouped_objects
 
+    def _seek(self, cap, frame_number):
+        """Move to frame_number; returns the frame actually reached"""
+        if frame_number and cap.set(cv2.CAP_PROP_POS_FRAMES, frame_number) \
+                and int(cap.get(cv2.CAP_PROP_POS_FRAMES)) == frame_number:
+            return frame_number
+        # Backend cannot seek exactly: skip ahead without decoding pixels
+        cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+        position = 0
+        while position < frame_number and cap.grab():
+            position += 1
+        return position
+
     def _determine_position(self, x_center, y_center, width, height):
         """Helper method to determine object position"""
         # Determine horizontal position
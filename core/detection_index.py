@@ -0,0 +1,209 @@
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+INDEX_PATH = os.environ.get("VIOR_INDEX_PATH", "detections.db")
+QUERY_LIMIT = 100
+MAX_QUERY_LIMIT = 1000
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS media (
+    id INTEGER PRIMARY KEY,
+    media_key TEXT NOT NULL UNIQUE,
+    name TEXT,
+    kind TEXT NOT NULL,
+    model TEXT,
+    created_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS detections (
+    media_id INTEGER NOT NULL REFERENCES media(id) ON DELETE CASCADE,
+    object_id TEXT NOT NULL,
+    object TEXT NOT NULL,
+    position TEXT NOT NULL,
+    confidence REAL NOT NULL,
+    start_time REAL,
+    end_time REAL
+);
+CREATE INDEX IF NOT EXISTS idx_detections_object_position ON detections(object, position, media_id);
+CREATE INDEX IF NOT EXISTS idx_detections_position ON detections(position, media_id);
+CREATE INDEX IF NOT EXISTS idx_detections_object_time ON detections(object, start_time);
+CREATE INDEX IF NOT EXISTS idx_detections_media ON detections(media_id);
+CREATE INDEX IF NOT EXISTS idx_media_kind_created ON media(kind, created_at);
+"""
+
+# group_by values accepted by counts() -> SQL expressions
+GROUP_COLUMNS = {
+    "object": "d.object",
+    "position": "d.position",
+    "kind": "m.kind",
+    "media": "m.media_key",
+}
+
+
+def file_digest(path, chunk_size=1024 * 1024):
+    """SHA-256 of a file's content (the media key of files processed from disk)"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def flatten_detections(grouped, times=None):
+    """
+    Turn the API's {object: [{object_id, position, confidence}]} into index rows.
+    times optionally maps object_id -> (first_seen, last_seen) seconds for videos.
+    """
+    times = times or {}
+    rows = []
+    for label, instances in grouped.items():
+        for det in instances:
+            start, end = times.get(det['object_id'], (None, None))
+            rows.append({
+                'object_id': det['object_id'],
+                'object': label,
+                'position': det['position'],
+                'confidence': det['confidence'],
+                'start_time': start,
+                'end_time': end
+            })
+    return rows
+
+
+class DetectionIndex:
+    """
+    Local SQLite store of every processed image and video and what was found in it,
+    indexed by class, position, media and time so questions like "which videos show
+    a bicycle bottom-left" are answered from the index instead of re-running inference.
+    Each thread gets its own connection; WAL mode lets readers run alongside a writer,
+    including writers in other worker processes.
+    """
+
+    def __init__(self, path=INDEX_PATH):
+        self.path = path
+        self._local = threading.local()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._connect() as conn:
+            conn.executescript(SCHEMA)
+
+    def _connect(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA foreign_keys=ON")
+            self._local.conn = conn
+        return conn
+
+    def add(self, media_key, name, kind, detections, model=None):
+        """
+        Record (or replace) the detections of one image or video; detections are
+        flatten_detections() rows. Indexing never fails the caller: errors are logged.
+        """
+        self.add_many([(media_key, name, kind, detections, model)])
+
+    def add_many(self, items):
+        """Record several (media_key, name, kind, detections, model) items in one transaction"""
+        now = time.time()
+        try:
+            with self._connect() as conn:
+                for media_key, name, kind, detections, model in items:
+                    conn.execute("DELETE FROM media WHERE media_key = ?", (media_key,))
+                    media_id = conn.execute(
+                        "INSERT INTO media (media_key, name, kind, model, created_at) VALUES (?, ?, ?, ?, ?)",
+                        (media_key, name, kind, model, now)
+                    ).lastrowid
+                    conn.executemany(
+                        "INSERT INTO detections (media_id, object_id, object, position, confidence, start_time, end_time)"
+                        " VALUES (?, ?, ?, ?, ?, ?, ?)",
+                        [
+                            (media_id, det['object_id'], det['object'], det['position'], det['confidence'],
+                             det.get('start_time'), det.get('end_time'))
+                            for det in detections
+                        ]
+                    )
+        except sqlite3.Error as e:
+            logger.warning("Could not index detections: %s", e)
+
+    def _where(self, object=None, position=None, kind=None, media_key=None, min_confidence=None,
+               start=None, end=None, since=None, until=None):
+        """WHERE clause and parameters shared by the queries"""
+        clauses, params = [], []
+        for column, value in (("d.object", object), ("d.position", position),
+                              ("m.kind", kind), ("m.media_key", media_key)):
+            if value is not None:
+                clauses.append(f"{column} = ?")
+                params.append(value)
+        if min_confidence is not None:
+            clauses.append("d.confidence >= ?")
+            params.append(min_confidence)
+        # Seconds into a video: the object's [first_seen, last_seen] overlaps [start, end]
+        if start is not None:
+            clauses.append("d.end_time >= ?")
+            params.append(start)
+        if end is not None:
+            clauses.append("d.start_time <= ?")
+            params.append(end)
+        # Wall-clock time the media was processed
+        if since is not None:
+            clauses.append("m.created_at >= ?")
+            params.append(since)
+        if until is not None:
+            clauses.append("m.created_at <= ?")
+            params.append(until)
+        return (" WHERE " + " AND ".join(clauses)) if clauses else "", params
+
+    def find_media(self, limit=QUERY_LIMIT, **filters):
+        """Media with matching detections, newest first, with match counts and time spans"""
+        where, params = self._where(**filters)
+        rows = self._connect().execute(
+            "SELECT m.media_key, m.name, m.kind, m.model, m.created_at,"
+            " COUNT(*) AS matches, MAX(d.confidence) AS best_confidence,"
+            " MIN(d.start_time) AS first_seen, MAX(d.end_time) AS last_seen"
+            " FROM detections d JOIN media m ON m.id = d.media_id"
+            f"{where} GROUP BY m.id ORDER BY m.created_at DESC LIMIT ?",
+            params + [min(limit, MAX_QUERY_LIMIT)]
+        ).fetchall()
+        return [dict(row) for row in rows]
+
+    def detections(self, media_key, **filters):
+        """Every indexed detection of one media item"""
+        where, params = self._where(media_key=media_key, **filters)
+        rows = self._connect().execute(
+            "SELECT d.object_id, d.object, d.position, d.confidence, d.start_time, d.end_time"
+            f" FROM detections d JOIN media m ON m.id = d.media_id{where} ORDER BY d.rowid",
+            params
+        ).fetchall()
+        return [dict(row) for row in rows]
+
+    def counts(self, group_by="object", limit=QUERY_LIMIT, **filters):
+        """Detections and distinct media per group, most frequent first"""
+        if group_by not in GROUP_COLUMNS:
+            raise ValueError(f"Cannot group by '{group_by}'. Supported: {', '.join(GROUP_COLUMNS)}")
+        column = GROUP_COLUMNS[group_by]
+        where, params = self._where(**filters)
+        rows = self._connect().execute(
+            f"SELECT {column} AS value, COUNT(*) AS detections, COUNT(DISTINCT d.media_id) AS media,"
+            " ROUND(AVG(d.confidence), 3) AS avg_confidence"
+            f" FROM detections d JOIN media m ON m.id = d.media_id{where}"
+            f" GROUP BY {column} ORDER BY detections DESC LIMIT ?",
+            params + [min(limit, MAX_QUERY_LIMIT)]
+        ).fetchall()
+        return [dict(row) for row in rows]
+
+    def stats(self):
+        """Indexed media and detection totals"""
+        conn = self._connect()
+        return {
+            "media": conn.execute("SELECT COUNT(*) FROM media").fetchone()[0],
+            "detections": conn.execute("SELECT COUNT(*) FROM detections").fetchone()[0]
+        }
@@ -0,0 +1,202 @@
+import numpy as np
+from starlette.responses import Response
+
+try:
+    import orjson
+except ImportError:  # orjson is optional; the standard library encoder is the fallback
+    orjson = None
+    import json
+
+try:
+    import msgpack
+except ImportError:  # Without msgpack only JSON is offered
+    msgpack = None
+
+JSON = "application/json"
+NDJSON = "application/x-ndjson"
+MSGPACK = "application/msgpack"
+COLUMNAR = "application/vnd.vior.columnar+msgpack"
+
+# Accept values mapped to the encoding they select
+MEDIA_TYPES = {
+    "application/json": JSON,
+    "application/x-ndjson": JSON,
+    "application/msgpack": MSGPACK,
+    "application/x-msgpack": MSGPACK,
+    "application/vnd.msgpack": MSGPACK,
+    COLUMNAR: COLUMNAR,
+}
+
+# Every value _determine_position() can return; columnar payloads send the index.
+# The table is fixed (and published in /vior-config), so it is not repeated per response
+POSITIONS = [
+    "centre", "centre-left", "centre-right", "top", "bottom",
+    "top-left", "top-right", "bottom-left", "bottom-right"
+]
+POSITION_CODES = {position: code for code, position in enumerate(POSITIONS)}
+
+CONFIDENCE_SCALE = 1000  # Confidences are rounded to 3 decimals, so they fit a uint16 exactly
+
+
+def _parse_accept(header):
+    """(media type, q) pairs from an Accept header, in header order"""
+    accepted = []
+    for part in header.split(','):
+        media_type, *params = part.strip().split(';')
+        media_type = media_type.strip().lower()
+        q = 1.0
+        for param in params:
+            name, _, value = param.strip().partition('=')
+            if name == 'q':
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        if media_type:
+            accepted.append((media_type, q))
+    return accepted
+
+
+def negotiate(accept):
+    """
+    Pick JSON, MSGPACK or COLUMNAR from an Accept header. Browsers (and anything
+    sending */* or nothing) get JSON, as does a binary request when msgpack is missing.
+    """
+    best, best_q = JSON, 0.0
+    for media_type, q in _parse_accept(accept or ''):
+        encoding = MEDIA_TYPES.get(media_type)
+        if encoding is None or q <= best_q:
+            continue
+        if encoding != JSON and msgpack is None:
+            continue
+        best, best_q = encoding, q
+    return best
+
+
+def _default(value):
+    """NumPy values the encoders do not know natively"""
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    raise TypeError(f"Object of type {type(value).__name__} is not serializable")
+
+
+def dumps_json(content):
+    """JSON bytes: orjson when installed, same output schema either way"""
+    if orjson is not None:
+        return orjson.dumps(content, default=_default, option=orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY)
+    return json.dumps(content, default=_default).encode('utf-8')
+
+
+class _Interner:
+    """Assigns small integer codes to class labels in order of first appearance"""
+
+    def __init__(self):
+        self.labels = []
+        self.codes = {}
+
+    def __call__(self, label):
+        code = self.codes.get(label)
+        if code is None:
+            code = self.codes[label] = len(self.labels)
+            self.labels.append(label)
+        return code
+
+
+def _columnar_detections(grouped, classes):
+    """
+    {object: [{object_id, position, confidence}]} as little-endian column buffers.
+    object_id is "<object>_<instance>", so only the instance number is sent.
+    """
+    class_codes, instances, positions, confidences = [], [], [], []
+    for label, instances_of_label in grouped.items():
+        code = classes(label)
+        for det in instances_of_label:
+            class_codes.append(code)
+            instances.append(int(det['object_id'].rsplit('_', 1)[1]))
+            positions.append(POSITION_CODES[det['position']])
+            confidences.append(round(det['confidence'] * CONFIDENCE_SCALE))
+    return {
+        "count": len(class_codes),
+        "class": np.array(class_codes, dtype='<u2').tobytes(),
+        "instance": np.array(instances, dtype='<u4').tobytes(),
+        "position": np.array(positions, dtype='u1').tobytes(),
+        "confidence": np.array(confidences, dtype='<u2').tobytes()
+    }
+
+
+def _columnar_tracks(tracks, classes):
+    """Timeline track summaries as column buffers; times in milliseconds"""
+    def column(key, dtype, scale=1):
+        return np.array([round(track[key] * scale) for track in tracks], dtype=dtype).tobytes()
+
+    return {
+        "count": len(tracks),
+        "track_id": column('track_id', '<u4'),
+        "class": np.array([classes(track['object']) for track in tracks], dtype='<u2').tobytes(),
+        "instance": np.array(
+            [int(track['object_id'].rsplit('_', 1)[1]) if track['object_id'] else 0 for track in tracks],
+            dtype='<u4'
+        ).tobytes(),
+        "first_seen_ms": column('first_seen', '<u4', 1000),
+        "last_seen_ms": column('last_seen', '<u4', 1000),
+        "sightings": column('sightings', '<u4')
+    }
+
+
+def to_columnar(content):
+    """
+    Columnar form of a detection response: "detections" (and the video "timeline")
+    become typed column buffers, with class labels interned as codes into a top-level
+    "classes" list and positions as codes into POSITIONS. Everything else is unchanged.
+    """
+    if 'detections' not in content:
+        return content
+    classes = _Interner()
+    columnar = dict(content)
+    columnar['detections'] = _columnar_detections(content['detections'], classes)
+    timeline = content.get('timeline')
+    if timeline is not None:
+        columnar['timeline'] = {
+            "tracks": _columnar_tracks(timeline['tracks'], classes),
+            "class_counts_per_second": {
+                label: np.array(counts, dtype='<u4').tobytes()
+                for label, counts in timeline['class_counts_per_second'].items()
+            }
+        }
+    columnar['classes'] = classes.labels
+    return columnar
+
+
+def encode(content, encoding):
+    """Serialize a response body for an encoding chosen by negotiate()"""
+    if encoding == JSON:
+        return dumps_json(content)
+    if encoding == COLUMNAR:
+        content = to_columnar(content)
+    return msgpack.packb(content, default=_default, use_bin_type=True)
+
+
+def encode_line(content, encoding):
+    """One record of a streamed response: a JSON line, or a self-delimiting msgpack object"""
+    if encoding == JSON:
+        return dumps_json(content) + b'\n'
+    return encode(content, encoding)
+
+
+class NegotiatedResponse(Response):
+    """Response encoded as JSON, MessagePack or columnar MessagePack"""
+
+    def __init__(self, content, encoding=JSON, status_code=200, headers=None):
+        self.encoding = encoding
+        super().__init__(content, status_code=status_code, headers=headers, media_type=encoding)
+        self.headers["Vary"] = "Accept"
+
+    def render(self, content):
+        return encode(content, self.encoding)
+
+
+def stream_media_type(encoding):
+    """Content type of a streamed response: NDJSON for JSON, else the msgpack type"""
+    return NDJSON if encoding == JSON else encoding
@@ -0,0 +1,211 @@
+import csv
+import os
+import sqlite3
+from collections import defaultdict
+from itertools import groupby
+from operator import itemgetter
+
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Font, PatternFill
+from openpyxl.utils import get_column_letter
+
+IMAGE_COLUMNS = [
+    'image_name', 'object_id', 'object', 'position', 'confidence',
+    'bbox_x1', 'bbox_y1', 'bbox_x2', 'bbox_y2'
+]
+VIDEO_COLUMNS = ['object_id', 'object', 'position', 'confidence', 'start_time', 'end_time']
+TABLE_COLUMNS = ['object_id', 'position', 'confidence']  # Per-group table in Excel reports
+
+# Parquet column types (pyarrow aliases); declared up front because a chunk in which
+# a column is entirely empty says nothing about its type
+COLUMN_TYPES = {
+    'image_name': 'string',
+    'object_id': 'string',
+    'object': 'string',
+    'position': 'string',
+    'confidence': 'float64',
+    'bbox_x1': 'float64',
+    'bbox_y1': 'float64',
+    'bbox_x2': 'float64',
+    'bbox_y2': 'float64',
+    'start_time': 'float64',
+    'end_time': 'float64',
+    'track_id': 'int64',
+    'timestamp': 'float64',
+}
+
+CHUNK_SIZE = 65536  # Rows buffered per Parquet row group
+
+HEADER_FONT = Font(bold=True, size=12)
+HEADER_FILL = PatternFill(start_color='E0E0E0', end_color='E0E0E0', fill_type='solid')
+TABLE_HEADER_FONT = Font(bold=True)
+
+
+class DetectionWriter:
+    """
+    Streams detection rows to CSV or Parquet (picked from the file extension).
+    Rows are written as they arrive; Parquet buffers at most chunk_size rows per
+    row group, so memory stays flat however many detections go through. Parquet
+    column types come from COLUMN_TYPES, overridable per column through types.
+    """
+
+    def __init__(self, path, columns, fmt=None, chunk_size=CHUNK_SIZE, types=None):
+        self.path = path
+        self.columns = columns
+        self.fmt = fmt or os.path.splitext(path)[1].lstrip('.').lower()
+        self.chunk_size = chunk_size
+        self.rows_written = 0
+
+        if self.fmt == 'csv':
+            self._file = open(path, 'w', newline='', encoding='utf-8')
+            self._csv = csv.DictWriter(self._file, fieldnames=columns, extrasaction='ignore')
+            self._csv.writeheader()
+        elif self.fmt == 'parquet':
+            try:
+                import pyarrow as pa  # Imported here so the API does not pay for it
+            except ImportError:
+                raise ImportError("Parquet export requires pyarrow (pip install pyarrow)")
+            types = {**COLUMN_TYPES, **(types or {})}
+            unknown = [column for column in columns if column not in types]
+            if unknown:
+                raise ValueError(f"No Parquet type for columns: {', '.join(unknown)}")
+            self._schema = pa.schema([(column, pa.type_for_alias(types[column])) for column in columns])
+            self._parquet = None
+            self._buffer = {column: [] for column in columns}
+            self._buffered = 0
+        else:
+            raise ValueError(f"Unsupported export format: {self.fmt}. Supported formats: csv, parquet")
+
+    def write(self, rows):
+        """Append an iterable of detection dicts"""
+        if self.fmt == 'csv':
+            for row in rows:
+                self._csv.writerow(row)
+                self.rows_written += 1
+            return
+
+        for row in rows:
+            for column in self.columns:
+                self._buffer[column].append(row.get(column))
+            self._buffered += 1
+            if self._buffered >= self.chunk_size:
+                self._flush()
+
+    def _flush(self):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        if not self._buffered:
+            return
+        table = pa.table(self._buffer, schema=self._schema)
+        if self._parquet is None:
+            self._parquet = pq.ParquetWriter(self.path, self._schema)
+        self._parquet.write_table(table)
+        self.rows_written += self._buffered
+        self._buffer = {column: [] for column in self.columns}
+        self._buffered = 0
+
+    def close(self):
+        if self.fmt == 'csv':
+            self._file.close()
+            return
+        self._flush()
+        if self._parquet is None:
+            # No rows at all: still leave a readable, empty file behind
+            import pyarrow.parquet as pq
+            self._parquet = pq.ParquetWriter(self.path, self._schema)
+        self._parquet.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+def write_detections(rows, path, columns):
+    """Stream rows to a CSV or Parquet file in one call; returns the row count"""
+    with DetectionWriter(path, columns) as writer:
+        writer.write(rows)
+    return writer.rows_written
+
+
+def _spill(detections, video_mode, track):
+    """
+    Copy rows into a private temporary SQLite database (on disk beyond SQLite's page
+    cache) so they can be read back grouped and sorted without holding them in memory
+    """
+    conn = sqlite3.connect('')
+    conn.execute(
+        "CREATE TABLE rows (section TEXT NOT NULL, object TEXT NOT NULL,"
+        " object_id, position, confidence)"
+    )
+
+    def rows():
+        for det in detections:
+            section = '' if video_mode else det['image_name']
+            if not video_mode:
+                track([f'Image: {section}'])
+            track([f'Object Type: {det["object"]}'])
+            values = [det[column] for column in TABLE_COLUMNS]
+            track(values)
+            yield (section, det['object'], *values)
+
+    conn.executemany("INSERT INTO rows VALUES (?, ?, ?, ?, ?)", rows())
+    return conn
+
+
+def write_excel(detections, output_path='object_detections.xlsx', video_mode=False):
+    """
+    Write the grouped Excel report with openpyxl's write-only mode.
+    The layout matches the old pandas report: an "Image:" header per image (image
+    mode), an "Object Type:" header per object, then a table of instances sorted by
+    object_id. Rows are grouped through a temporary on-disk SQLite table and column
+    widths are tracked while it is filled (write-only sheets need them before the
+    first row), so memory does not grow with the number of detections.
+    """
+    widths = defaultdict(int)
+
+    def track(values):
+        for index, value in enumerate(values, start=1):
+            if value is not None and value != '':
+                widths[index] = max(widths[index], len(str(value)))
+
+    track(TABLE_COLUMNS)
+    conn = _spill(detections, video_mode, track)
+
+    workbook = Workbook(write_only=True)
+    worksheet = workbook.create_sheet('Sheet1')
+    for index, length in widths.items():
+        worksheet.column_dimensions[get_column_letter(index)].width = length + 2
+
+    def styled(values, font, fill=None):
+        cells = []
+        for value in values:
+            cell = WriteOnlyCell(worksheet, value=value)
+            cell.font = font
+            if fill:
+                cell.fill = fill
+            cells.append(cell)
+        return cells
+
+    try:
+        rows = conn.execute("SELECT * FROM rows ORDER BY section, object, object_id, rowid")
+        for section, section_rows in groupby(rows, key=itemgetter(0)):
+            if not video_mode:
+                worksheet.append(styled([f'Image: {section}'], HEADER_FONT, HEADER_FILL))
+                worksheet.append([])
+            for obj_type, group in groupby(section_rows, key=itemgetter(1)):
+                worksheet.append(styled([f'Object Type: {obj_type}'], HEADER_FONT, HEADER_FILL))
+                worksheet.append(styled(TABLE_COLUMNS, TABLE_HEADER_FONT))
+                for row in group:
+                    worksheet.append(list(row[2:]))
+                worksheet.append([])
+            if not video_mode:
+                worksheet.append([])
+                worksheet.append([])
+    finally:
+        conn.close()
+
+    workbook.save(output_path)
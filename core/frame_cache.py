@@ -0,0 +1,139 @@
+import threading
+from collections import OrderedDict
+
+import cv2
+import numpy as np
+
+HASH_SIZE = 16
+HASH_BITS = HASH_SIZE * HASH_SIZE
+MAX_ENTRIES = 4096
+TOLERANCE = 6  # Max Hamming distance between hashes considered for a match
+THUMBNAIL_SIZE = 64  # Edge of the grayscale thumbnail kept per entry (4KB)
+MAX_PIXEL_DIFF = 12  # Max per-pixel difference between thumbnails of the same frame
+
+
+def dhash(frame, hash_size=HASH_SIZE):
+    """Difference hash of a BGR frame, hash_size^2 bits (robust to rescaling and re-encoding)"""
+    gray = cv2.cvtColor(cv2.resize(frame, (hash_size + 1, hash_size), interpolation=cv2.INTER_AREA), cv2.COLOR_BGR2GRAY)
+    bits = gray[:, 1:] > gray[:, :-1]
+    return int.from_bytes(np.packbits(bits).tobytes(), 'big')
+
+
+def thumbnail(frame, size=THUMBNAIL_SIZE):
+    """Small grayscale copy of a frame, used to confirm a hash match pixel by pixel"""
+    return cv2.cvtColor(cv2.resize(frame, (size, size), interpolation=cv2.INTER_AREA), cv2.COLOR_BGR2GRAY)
+
+
+def fingerprint(frame):
+    """(hash, thumbnail) cache key of a frame"""
+    return dhash(frame), thumbnail(frame)
+
+
+def options_key(model_name, options):
+    """Hashable key for the model and inference options that produced a result"""
+    items = []
+    for key, value in sorted((options or {}).items()):
+        if isinstance(value, list):
+            value = tuple(value)
+        items.append((key, value))
+    return model_name, tuple(items)
+
+
+class FrameCache:
+    """
+    Near-duplicate frame cache keyed by perceptual hash.
+    Lookups use multi-index hashing: each hash is split into tolerance + 1
+    segments, and by the pigeonhole principle any hash within `tolerance` bits
+    shares at least one segment exactly, so only those candidates are compared.
+    A hash match alone is not trusted - a small object entering a static scene
+    barely changes the hash - so a candidate is only a hit if its thumbnail
+    differs from the frame's by at most max_pixel_diff at every pixel.
+    Entries are evicted least-recently-used beyond max_entries. Results from
+    different models / options live in separate namespaces.
+    """
+
+    def __init__(self, max_entries=MAX_ENTRIES, tolerance=TOLERANCE, max_pixel_diff=MAX_PIXEL_DIFF):
+        self.max_entries = max_entries
+        self.tolerance = tolerance
+        self.max_pixel_diff = max_pixel_diff
+        segments = tolerance + 1
+        bounds = [round(i * HASH_BITS / segments) for i in range(segments + 1)]
+        self._segments = [(lo, (1 << (hi - lo)) - 1) for lo, hi in zip(bounds, bounds[1:])]
+
+        self._entries = OrderedDict()  # (namespace, hash) -> (value, thumbnail, source), in LRU order
+        self._index = {}  # (namespace, segment, segment value) -> set of hashes
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _segment_keys(self, namespace, value):
+        for i, (shift, mask) in enumerate(self._segments):
+            yield namespace, i, (value >> shift) & mask
+
+    def _matches(self, entry, thumb, source):
+        _, stored_thumb, stored_source = entry
+        if source is not None and stored_source == source:
+            return False
+        return int(np.abs(stored_thumb.astype(np.int16) - thumb).max()) <= self.max_pixel_diff
+
+    def get(self, namespace, key, source=None):
+        """
+        Return the stored result of the closest verified match for a fingerprint()
+        key, or None. Entries stored with the same source (e.g. earlier frames of the
+        video being processed) are never returned.
+        """
+        value, thumb = key
+        thumb = thumb.astype(np.int16)
+        with self._lock:
+            candidates = set()
+            for segment_key in self._segment_keys(namespace, value):
+                candidates.update(self._index.get(segment_key, ()))
+            ranked = []
+            for candidate in candidates:
+                distance = bin(candidate ^ value).count('1')
+                if distance <= self.tolerance:
+                    ranked.append((distance, candidate))
+            for _, candidate in sorted(ranked):
+                entry = self._entries[(namespace, candidate)]
+                if self._matches(entry, thumb, source):
+                    self.hits += 1
+                    self._entries.move_to_end((namespace, candidate))
+                    return entry[0]
+            self.misses += 1
+            return None
+
+    def put(self, namespace, key, result, source=None):
+        """Store a result under a fingerprint() key, evicting the least recently used entries if full"""
+        value, thumb = key
+        with self._lock:
+            if (namespace, value) in self._entries:
+                self._entries.move_to_end((namespace, value))
+                self._entries[(namespace, value)] = (result, thumb, source)
+                return
+            self._entries[(namespace, value)] = (result, thumb, source)
+            for segment_key in self._segment_keys(namespace, value):
+                self._index.setdefault(segment_key, set()).add(value)
+
+            while len(self._entries) > self.max_entries:
+                (old_namespace, old_value), _ = self._entries.popitem(last=False)
+                for segment_key in self._segment_keys(old_namespace, old_value):
+                    bucket = self._index.get(segment_key)
+                    if bucket is not None:
+                        bucket.discard(old_value)
+                        if not bucket:
+                            del self._index[segment_key]
+
+    def stats(self):
+        """Size and lifetime hit rate"""
+        total = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0
+        }
+
+
+# Shared by every detector so repeated footage hits across requests, images and videos.
+# Reuse changes results slightly, so only requests that opt in (frame_cache=true) use it
+shared_frame_cache = FrameCache()
@@ -0,0 +1,70 @@
+# Server-side class allowlist: None allows every class the model knows,
+# otherwise only these labels may be requested (and are the default)
+ALLOWED_CLASSES = None
+
+MAX_DET_LIMIT = 300
+IMGSZ_MIN = 128
+IMGSZ_MAX = 1280
+IMGSZ_STRIDE = 32  # YOLOv8 needs multiples of the model stride
+
+# Ultralytics keeps predict kwargs between calls on the same model (only conf is reset),
+# so every call passes all of them; these are its defaults
+PREDICT_DEFAULTS = {"classes": None, "conf": 0.25, "iou": 0.7, "max_det": 300, "imgsz": 640}
+
+
+class InvalidOptions(ValueError):
+    """Raised when per-request inference options fail validation"""
+
+
+def parse_inference_options(names, classes=None, conf=None, iou=None, max_det=None,
+                            imgsz=None, allowed_classes=ALLOWED_CLASSES):
+    """
+    Validate per-request inference options and turn them into ultralytics predict kwargs
+    Args:
+        names: Model class names ({id: label})
+        classes: Labels to detect, as a list or a comma-separated string
+        conf, iou: Thresholds between 0 and 1
+        max_det: Maximum detections per image
+        imgsz: Inference size, rounded to the model stride
+        allowed_classes: Labels this server allows (None for all)
+    Returns:
+        Dictionary with only the options that were set
+    """
+    label_to_id = {label: cls for cls, label in names.items()}
+    options = {}
+
+    if isinstance(classes, str):
+        classes = [c.strip() for c in classes.split(',') if c.strip()]
+    if not classes and allowed_classes is not None:
+        classes = list(allowed_classes)
+    if classes:
+        unknown = [c for c in classes if c not in label_to_id]
+        if unknown:
+            raise InvalidOptions(f"Unknown classes: {', '.join(unknown)}")
+        if allowed_classes is not None:
+            blocked = [c for c in classes if c not in allowed_classes]
+            if blocked:
+                raise InvalidOptions(f"Classes not allowed: {', '.join(blocked)}")
+        options['classes'] = sorted({label_to_id[c] for c in classes})
+
+    if conf is not None:
+        if not 0.0 <= conf <= 1.0:
+            raise InvalidOptions("conf must be between 0 and 1")
+        options['conf'] = conf
+
+    if iou is not None:
+        if not 0.0 <= iou <= 1.0:
+            raise InvalidOptions("iou must be between 0 and 1")
+        options['iou'] = iou
+
+    if max_det is not None:
+        if not 1 <= max_det <= MAX_DET_LIMIT:
+            raise InvalidOptions(f"max_det must be between 1 and {MAX_DET_LIMIT}")
+        options['max_det'] = max_det
+
+    if imgsz is not None:
+        if not IMGSZ_MIN <= imgsz <= IMGSZ_MAX:
+            raise InvalidOptions(f"imgsz must be between {IMGSZ_MIN} and {IMGSZ_MAX}")
+        options['imgsz'] = -(-imgsz // IMGSZ_STRIDE) * IMGSZ_STRIDE
+
+    return options
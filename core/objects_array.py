@@ -1,12 +1,18 @@
 import cv2
 from ultralytics import YOLO
-import pandas as pd
 import os
 from glob import glob
-from openpyxl.styles import Font, PatternFill
-from openpyxl.utils import get_column_letter
 from collections import defaultdict
 import time
+from core.export import DetectionWriter, IMAGE_COLUMNS, VIDEO_COLUMNS, write_excel
+from core.detection_index import DetectionIndex, file_digest
+
+# Report format: "xlsx" for the grouped Excel report, or "csv" / "parquet" to
+# stream flat rows to disk as each file is processed (for very large runs)
+REPORT_FORMAT = "xlsx"
+
+MODEL_PATH = "models/yolov8l.pt"
+MODEL_NAME = os.path.splitext(os.path.basename(MODEL_PATH))[0]
 
 def print_menu():
     """Display the main menu options"""
@@ -17,7 +23,7 @@ def print_menu():
     print("4. Exit")
     return input("\nSelect an option (1-4): ")
 
-def get_object_positions(image_path, model_path="models/yolov8l.pt"):
+def get_object_positions(image_path, model_path=MODEL_PATH):
     """
     Process an image and return dictionary of detected objects with their positions
     Args:
@@ -102,7 +108,7 @@ def get_object_positions(image_path, model_path="models/yolov8l.pt"):
     
     return detections
 
-def process_video(video_path, model_path="models/yolov8l.pt", sample_rate=1):
+def process_video(video_path, model_path=MODEL_PATH, sample_rate=1):
     """
     Process a video and track unique object instances with their positions
     """
@@ -187,6 +193,7 @@ def process_video(video_path, model_path="models/yolov8l.pt", sample_rate=1):
                             if abs(stored_x - x_center) < width * 0.1 and abs(stored_y - y_center) < height * 0.1:
                                 new_object = False
                                 # Update position if confidence is higher
+                                obj_data['last_seen'] = frame_number / (fps or 30)
                                 if confidence > obj_data['confidence']:
                                     obj_data['position'] = position
                                     obj_data['confidence'] = confidence
@@ -204,7 +211,9 @@ def process_video(video_path, model_path="models/yolov8l.pt", sample_rate=1):
                             'position': position,
                             'confidence': confidence,
                             'center_x': x_center,
-                            'center_y': y_center
+                            'center_y': y_center,
+                            'first_seen': frame_number / (fps or 30),
+                            'last_seen': frame_number / (fps or 30)
                         }
             
             # Print progress
@@ -223,7 +232,9 @@ def process_video(video_path, model_path="models/yolov8l.pt", sample_rate=1):
             'object_id': obj_id,
             'object': data['object'],
             'position': data['position'],
-            'confidence': round(data['confidence'], 3)
+            'confidence': round(data['confidence'], 3),
+            'start_time': round(data['first_seen'], 3),
+            'end_time': round(data['last_seen'], 3)
         })
     
     return tracked_objects
@@ -232,77 +243,7 @@ def save_to_excel(detections, output_path='object_detections.xlsx', video_mode=F
     """
     Save detections to Excel with proper formatting
     """
-    with pd.ExcelWriter(output_path, engine='openpyxl') as writer:
-        if video_mode:
-            # Create DataFrame for video tracking data
-            df = pd.DataFrame(detections)
-            
-            # Group objects by type
-            object_groups = df.groupby('object')
-            
-            current_row = 0
-            
-            for obj_type, group in object_groups:
-                # Write object type header
-                header_df = pd.DataFrame([[f'Object Type: {obj_type}']], columns=[''])
-                header_df.to_excel(writer, startrow=current_row, index=False, header=False)
-                
-                # Write object instances
-                group = group.sort_values('object_id')
-                group = group[['object_id', 'position', 'confidence']]
-                group.to_excel(writer, startrow=current_row + 1, index=False)
-                
-                current_row += len(group) + 3
-        else:
-            # Original image processing logic
-            current_row = 0
-            for img_group in pd.DataFrame(detections).groupby('image_name'):
-                image_name, img_data = img_group
-                
-                # Write image header
-                header_df = pd.DataFrame([['Image: ' + image_name]], columns=[''])
-                header_df.to_excel(writer, startrow=current_row, index=False, header=False)
-                
-                # Group objects by type within each image
-                object_groups = img_data.groupby('object')
-                current_row += 2
-                
-                for obj_type, group in object_groups:
-                    # Write object type subheader
-                    subheader_df = pd.DataFrame([[f'Object Type: {obj_type}']], columns=[''])
-                    subheader_df.to_excel(writer, startrow=current_row, index=False, header=False)
-                    
-                    # Write object instances
-                    group = group.sort_values('object_id')
-                    group = group[['object_id', 'position', 'confidence']]
-                    group.to_excel(writer, startrow=current_row + 1, index=False)
-                    
-                    current_row += len(group) + 3
-                
-                current_row += 2
-        
-        # Apply formatting
-        workbook = writer.book
-        worksheet = writer.sheets['Sheet1']
-        
-        # Format headers and adjust column widths
-        for col in worksheet.columns:
-            max_length = 0
-            column = get_column_letter(col[0].column)
-            
-            for cell in col:
-                if cell.value:
-                    max_length = max(max_length, len(str(cell.value)))
-                    
-                    # Format headers
-                    if isinstance(cell.value, str) and ('Image:' in cell.value or 'Object Type:' in cell.value):
-                        cell.font = Font(bold=True, size=12)
-                        cell.fill = PatternFill(start_color='E0E0E0',
-                                              end_color='E0E0E0',
-                                              fill_type='solid')
-            
-            adjusted_width = (max_length + 2)
-            worksheet.column_dimensions[column].width = adjusted_width
+    write_excel(detections, output_path, video_mode=video_mode)
 
 def process_all_images():
     """Process all images in the images folder"""
@@ -313,21 +254,41 @@ def process_all_images():
     if not image_paths:
         print("No images found in the 'images' folder!")
         return False
+    
+    # Results are also recorded in the detection index for later queries
+    index = DetectionIndex()
+    
+    # Flat formats are written as we go instead of being collected in memory
+    writer = None
+    output_path = f'image_detections.{REPORT_FORMAT}'
+    if REPORT_FORMAT != 'xlsx':
+        writer = DetectionWriter(output_path, IMAGE_COLUMNS)
         
     print("\nProcessing images...")
-    for img_path in image_paths:
-        print(f"\nProcessing {img_path}:")
-        try:
-            detections = get_object_positions(img_path)
-            if detections:
-                all_image_detections.extend(detections)
-                print(f"Found {len(detections)} objects")
-        except Exception as e:
-            print(f"Error processing {img_path}: {str(e)}")
+    try:
+        for img_path in image_paths:
+            print(f"\nProcessing {img_path}:")
+            try:
+                detections = get_object_positions(img_path)
+                index.add(file_digest(img_path), os.path.basename(img_path), "image", detections, MODEL_NAME)
+                if detections:
+                    if writer:
+                        writer.write(detections)
+                    else:
+                        all_image_detections.extend(detections)
+                    print(f"Found {len(detections)} objects")
+            except Exception as e:
+                print(f"Error processing {img_path}: {str(e)}")
+    finally:
+        if writer:
+            writer.close()
     
+    if writer and writer.rows_written:
+        print(f"\nImage results saved to {output_path}")
+        return True
     if all_image_detections:
-        save_to_excel(all_image_detections, 'image_detections.xlsx', video_mode=False)
-        print("\nImage results saved to image_detections.xlsx")
+        save_to_excel(all_image_detections, output_path, video_mode=False)
+        print(f"\nImage results saved to {output_path}")
         return True
     return False
 
@@ -340,16 +301,22 @@ def process_all_videos():
         print("No videos found in the 'videos' folder!")
         return False
         
+    index = DetectionIndex()
     print("\nProcessing videos...")
     success = False
     for video_path in video_paths:
         try:
             print(f"\nProcessing {video_path}")
             video_detections = process_video(video_path, sample_rate=30)  # 1 frame per second for 30fps video
+            index.add(file_digest(video_path), os.path.basename(video_path), "video", video_detections, MODEL_NAME)
             
             if video_detections:
-                output_path = f'video_detections_{os.path.splitext(os.path.basename(video_path))[0]}.xlsx'
-                save_to_excel(video_detections, output_path, video_mode=True)
+                output_path = f'video_detections_{os.path.splitext(os.path.basename(video_path))[0]}.{REPORT_FORMAT}'
+                if REPORT_FORMAT == 'xlsx':
+                    save_to_excel(video_detections, output_path, video_mode=True)
+                else:
+                    with DetectionWriter(output_path, VIDEO_COLUMNS) as writer:
+                        writer.write(video_detections)
                 print(f"Results saved to {output_path}")
                 success = True
             
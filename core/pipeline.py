@@ -0,0 +1,273 @@
+import itertools
+import os
+import queue
+import threading
+import time
+
+QUEUE_SIZE = 16  # Items buffered between two stages
+
+_END = object()  # Marks the end of the stream between stages
+
+
+def _cpu_count():
+    if hasattr(os, 'sched_getaffinity'):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+# Stage statistics of the most recent run of each named pipeline, for monitoring
+_recent_stats = {}
+_stats_lock = threading.Lock()
+
+
+def recent_pipeline_stats():
+    """Copy of the latest statistics per pipeline name, safe to serialize while runs finish"""
+    with _stats_lock:
+        return dict(_recent_stats)
+
+
+class PipelineClosed(Exception):
+    """Raised inside a stage when the pipeline is shut down early"""
+
+
+class Stage:
+    """
+    One pipeline step running on its own thread. Utilization is the share of the
+    pipeline's lifetime the step spent working, as opposed to waiting for input
+    (starved) or for room downstream (blocked); the busiest stage is the bottleneck.
+    """
+
+    def __init__(self, name, func, batch_size=None):
+        self.name = name
+        self.func = func
+        self.batch_size = batch_size  # If set, func gets a list of whatever is ready, up to this many
+        self.items = 0
+        self.busy = 0.0
+        self.starved = 0.0
+        self.blocked = 0.0
+
+    def stats(self, elapsed):
+        return {
+            "items": self.items,
+            "utilization": round(self.busy / elapsed, 3) if elapsed else 0.0,
+            "busy_s": round(self.busy, 3),
+            "starved_s": round(self.starved, 3),
+            "blocked_s": round(self.blocked, 3)
+        }
+
+
+class Pipeline:
+    """
+    Runs a source iterator and a chain of stages on separate threads connected by
+    bounded queues, so decoding, preprocessing, inference and post-processing of
+    different frames overlap. Each stage is a single thread and queues are FIFO, so
+    results come out in source order. Iterate over the pipeline to consume results
+    (the consumer is the last stage); an exception in any stage is re-raised there.
+
+    Stage functions take one item and return one item; batching stages take a list
+    and return a list of the same length. Use it as a context manager so the stage
+    threads stop right away when the consumer leaves the loop early.
+
+    With a single usable core nothing can overlap, and threads only add switching
+    overhead, so the stages then run inline in the consumer's thread (batching
+    stages take batch_size items at a time); results and statistics are the same.
+    """
+
+    def __init__(self, name, source, stages, source_name="decode", consumer_name="postprocess",
+                 queue_size=QUEUE_SIZE, threaded=None):
+        self.name = name
+        self.threaded = _cpu_count() > 1 if threaded is None else threaded
+        self.source = source
+        self.stages = [Stage(source_name, None)] + stages
+        self.queues = [queue.Queue(maxsize=queue_size) for _ in self.stages]
+        self._closed = threading.Event()
+        self._error = None
+        self._threads = []
+        self._started = None
+        self._finished = None
+        self.consumer = Stage(consumer_name, None)  # Time the caller spends on each result
+
+    def _put(self, stage, q, item):
+        started = time.monotonic()
+        while not self._closed.is_set():
+            try:
+                q.put(item, timeout=0.1)
+                stage.blocked += time.monotonic() - started
+                return
+            except queue.Full:
+                continue
+        raise PipelineClosed()
+
+    def _get(self, stage, q):
+        started = time.monotonic()
+        while not self._closed.is_set():
+            try:
+                item = q.get(timeout=0.1)
+                stage.starved += time.monotonic() - started
+                return item
+            except queue.Empty:
+                continue
+        raise PipelineClosed()
+
+    def _fail(self, error):
+        if self._error is None:
+            self._error = error
+        self._closed.set()
+
+    def _run_source(self):
+        stage, out = self.stages[0], self.queues[0]
+        try:
+            iterator = iter(self.source)
+            while True:
+                started = time.monotonic()
+                item = next(iterator, _END)
+                if item is _END:
+                    break
+                stage.busy += time.monotonic() - started
+                stage.items += 1
+                self._put(stage, out, item)
+            self._put(stage, out, _END)
+        except PipelineClosed:
+            pass
+        except BaseException as e:
+            self._fail(e)
+
+    def _run_stage(self, index):
+        stage = self.stages[index]
+        inbox, out = self.queues[index - 1], self.queues[index]
+        try:
+            while True:
+                item = self._get(stage, inbox)
+                if item is _END:
+                    self._put(stage, out, _END)
+                    return
+
+                if stage.batch_size is not None:
+                    # Take whatever else is already waiting, without waiting for a full batch
+                    batch, end = [item], False
+                    while len(batch) < stage.batch_size:
+                        try:
+                            extra = inbox.get_nowait()
+                        except queue.Empty:
+                            break
+                        if extra is _END:
+                            end = True
+                            break
+                        batch.append(extra)
+                    started = time.monotonic()
+                    results = stage.func(batch)
+                    stage.busy += time.monotonic() - started
+                    stage.items += len(batch)
+                    for result in results:
+                        self._put(stage, out, result)
+                    if end:
+                        self._put(stage, out, _END)
+                        return
+                else:
+                    started = time.monotonic()
+                    result = stage.func(item)
+                    stage.busy += time.monotonic() - started
+                    stage.items += 1
+                    self._put(stage, out, result)
+        except PipelineClosed:
+            pass
+        except BaseException as e:
+            self._fail(e)
+
+    def _run_inline(self):
+        """Generator chaining the stages in the calling thread"""
+        def read():
+            stage, iterator = self.stages[0], iter(self.source)
+            while True:
+                started = time.monotonic()
+                item = next(iterator, _END)
+                if item is _END:
+                    return
+                stage.busy += time.monotonic() - started
+                stage.items += 1
+                yield item
+
+        def run(stage, upstream):
+            while True:
+                batch = list(itertools.islice(upstream, stage.batch_size or 1))
+                if not batch:
+                    return
+                started = time.monotonic()
+                results = stage.func(batch) if stage.batch_size is not None else [stage.func(batch[0])]
+                stage.busy += time.monotonic() - started
+                stage.items += len(batch)
+                yield from results
+
+        items = read()
+        for stage in self.stages[1:]:
+            items = run(stage, items)
+        return items
+
+    def start(self):
+        self._started = time.monotonic()
+        if not self.threaded:
+            self._inline = self._run_inline()
+            return self
+        self._threads = [threading.Thread(
+            target=self._run_source, name=f"{self.name}-{self.stages[0].name}", daemon=True
+        )]
+        for index in range(1, len(self.stages)):
+            self._threads.append(threading.Thread(
+                target=self._run_stage, args=(index,), name=f"{self.name}-{self.stages[index].name}", daemon=True
+            ))
+        for thread in self._threads:
+            thread.start()
+        return self
+
+    def __iter__(self):
+        if self._started is None:
+            self.start()
+        try:
+            while True:
+                if not self.threaded:
+                    item = next(self._inline, _END)
+                else:
+                    try:
+                        item = self._get(self.consumer, self.queues[-1])
+                    except PipelineClosed:
+                        break
+                if item is _END:
+                    break
+                started = time.monotonic()
+                yield item
+                self.consumer.busy += time.monotonic() - started
+                self.consumer.items += 1
+        finally:
+            self.close()
+        if self._error is not None:
+            raise self._error
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def close(self):
+        """
+        Stop all stages (also used to abandon a run early) and record its statistics.
+        Waits for every stage thread to exit - a stage in the middle of a model call
+        finishes it first - so the caller may release what the source reads from.
+        """
+        self._closed.set()
+        if not self.threaded and self._started is not None:
+            self._inline.close()
+        for thread in self._threads:
+            if thread is not threading.current_thread():
+                thread.join()
+        if self._finished is None and self._started is not None:
+            self._finished = time.monotonic()
+            with _stats_lock:
+                _recent_stats[self.name] = self.stats()
+
+    def stats(self):
+        """Per-stage utilization; the stage closest to 1.0 limits throughput"""
+        end = self._finished or time.monotonic()
+        elapsed = end - self._started if self._started else 0.0
+        stages = {stage.name: stage.stats(elapsed) for stage in self.stages + [self.consumer]}
+        busiest = max(stages, key=lambda name: stages[name]["utilization"]) if elapsed else None
+        return {"elapsed_s": round(elapsed, 3), "bottleneck": busiest, "stages": stages}
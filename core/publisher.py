@@ -0,0 +1,169 @@
+import logging
+import random
+import threading
+import time
+from collections import OrderedDict
+
+import requests
+from requests.adapters import HTTPAdapter
+
+logger = logging.getLogger(__name__)
+
+CONNECT_TIMEOUT = 3.05
+READ_TIMEOUT = 5
+MAX_PENDING = 1000  # Sources with an unsent update
+MAX_RETRIES = 5
+BACKOFF_BASE = 0.5  # Seconds, doubled per failed attempt
+MAX_BACKOFF = 30
+
+
+class EventPublisher:
+    """
+    Background sender for detection change notifications.
+    publish() never touches the network: it records the newest payload per source in
+    a bounded queue, replacing any older unsent update for that source. A sender
+    thread POSTs them over a pooled keep-alive session with timeouts, retrying
+    failures with exponential backoff; a retry is abandoned as soon as a newer
+    update for the same source supersedes it.
+    """
+
+    def __init__(self, url, max_pending=MAX_PENDING, max_retries=MAX_RETRIES,
+                 timeout=(CONNECT_TIMEOUT, READ_TIMEOUT), headers=None, session=None):
+        self.url = url
+        self.max_pending = max_pending
+        self.max_retries = max_retries
+        self.timeout = timeout
+
+        self.session = session or requests.Session()
+        self.session.mount("http://", HTTPAdapter(pool_connections=1, pool_maxsize=4))
+        self.session.mount("https://", HTTPAdapter(pool_connections=1, pool_maxsize=4))
+        self.session.headers.update(headers or {"Content-Type": "application/json"})
+
+        self._pending = OrderedDict()
+        self._inflight = None  # Source whose update is being sent or waiting to be retried
+        self._cond = threading.Condition()
+        self._stop = False
+        self._thread = threading.Thread(target=self._run, name="event-publisher", daemon=True)
+
+        self.published = 0
+        self.sent = 0
+        self.coalesced = 0
+        self.dropped = 0
+        self.failed = 0
+        self.retries = 0
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def _request_timeout(self):
+        """Longest a single POST can take"""
+        return sum(self.timeout) if isinstance(self.timeout, tuple) else self.timeout
+
+    def stop(self, flush=True, timeout=10):
+        """
+        Stop the sender. With flush, queued updates and the one being sent or retried
+        get up to timeout seconds to be delivered; whatever is still unsent after that
+        is dropped (and counted in dropped). Then waits for an in-progress POST to finish.
+        Safe to call on a publisher that was never started.
+        """
+        deadline = time.monotonic() + timeout
+        # Nothing will be sent without a running sender, so there is nothing to wait for
+        flush = flush and self._thread.is_alive()
+        with self._cond:
+            while flush and (self._pending or self._inflight is not None) and time.monotonic() < deadline:
+                self._cond.wait(0.05)
+            unsent = len(self._pending) + (self._inflight is not None)
+            if unsent:
+                logger.warning("Dropping %d unsent update(s) on shutdown", unsent)
+                self.dropped += len(self._pending)  # The in-flight one is counted by _deliver
+                self._pending.clear()
+            self._stop = True
+            self._cond.notify_all()
+        if self._thread.is_alive():
+            self._thread.join(timeout=self._request_timeout() + 1)
+        self.session.close()
+
+    def publish(self, source, payload):
+        """Queue the latest payload for a source without blocking"""
+        with self._cond:
+            self.published += 1
+            if source in self._pending:
+                self.coalesced += 1
+                del self._pending[source]
+            elif len(self._pending) >= self.max_pending:
+                # Full: the oldest source's update is the least valuable
+                self._pending.popitem(last=False)
+                self.dropped += 1
+            self._pending[source] = payload
+            self._cond.notify()
+
+    def _next(self):
+        with self._cond:
+            while not self._pending and not self._stop:
+                self._cond.wait()
+            if self._stop:
+                return None
+            item = self._pending.popitem(last=False)
+            self._inflight = item[0]
+            return item
+
+    def _superseded(self, source):
+        with self._cond:
+            return source in self._pending
+
+    def _run(self):
+        while True:
+            item = self._next()
+            if item is None:
+                return
+            self._deliver(*item)
+            with self._cond:
+                self._inflight = None
+                self._cond.notify_all()  # Wake stop() waiting for the queue to drain
+
+    def _deliver(self, source, payload):
+        for attempt in range(self.max_retries + 1):
+            if attempt:
+                self.retries += 1
+                delay = min(MAX_BACKOFF, BACKOFF_BASE * 2 ** (attempt - 1))
+                with self._cond:
+                    self._cond.wait_for(lambda: self._stop, timeout=delay * random.uniform(0.5, 1.0))
+                    if self._stop:
+                        # stop() gave up on flushing
+                        self.dropped += 1
+                        return
+                if self._superseded(source):
+                    self.coalesced += 1
+                    return
+
+            try:
+                response = self.session.post(self.url, json=payload, timeout=self.timeout)
+            except requests.exceptions.RequestException as e:
+                logger.warning("Publish for %s failed: %s", source, e)
+                continue
+
+            if response.status_code < 400:
+                self.sent += 1
+                return
+            if response.status_code != 429 and response.status_code < 500:
+                # The receiver rejected the payload; retrying will not help
+                logger.error("Publish for %s rejected: %s %s", source, response.status_code, response.text)
+                break
+            logger.warning("Publish for %s got %s, retrying", source, response.status_code)
+
+        self.failed += 1
+
+    def stats(self):
+        """Queue and delivery counters"""
+        with self._cond:
+            pending = len(self._pending)
+        return {
+            "pending": pending,
+            "published": self.published,
+            "sent": self.sent,
+            "coalesced": self.coalesced,
+            "dropped": self.dropped,
+            "failed": self.failed,
+            "retries": self.retries
+        }
@@ -0,0 +1,308 @@
+import glob
+import hashlib
+import logging
+import os
+import tempfile
+
+try:
+    import fcntl
+except ImportError:  # Windows: no flock, workers fall back to pid-based slots
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+# Instruction sets that change which inference kernels torch / OpenCV can use
+ISA_FLAGS = ['sse4_2', 'avx', 'avx2', 'fma', 'avx512f', 'avx512_vnni', 'avx512_bf16', 'amx_tile', 'asimd', 'sve']
+
+# Environment overrides
+WORKERS_ENV = "VIOR_WORKERS"  # Worker processes sharing this machine (defaults to WEB_CONCURRENCY, then 1)
+THREADS_ENV = "VIOR_THREADS"  # Intra-op threads per worker (defaults to its share of physical cores)
+INTEROP_THREADS_ENV = "VIOR_INTEROP_THREADS"
+PIN_ENV = "VIOR_PIN_WORKERS"  # "1" pins each worker to its own disjoint set of cores
+RUNTIME_DIR_ENV = "VIOR_RUNTIME_DIR"  # Directory for the worker-slot lock files of one deployment
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def parse_cpu_list(text):
+    """'0-3,8,10-11' -> [0, 1, 2, 3, 8, 10, 11]"""
+    cpus = []
+    for part in text.strip().split(','):
+        if not part:
+            continue
+        lo, _, hi = part.partition('-')
+        cpus.extend(range(int(lo), int(hi or lo) + 1))
+    return cpus
+
+
+def _read(path):
+    try:
+        with open(path) as f:
+            return f.read().strip()
+    except OSError:
+        return None
+
+
+def _allowed_cpus():
+    """Logical CPUs this process may run on (respects taskset / container cpusets)"""
+    if hasattr(os, 'sched_getaffinity'):
+        return sorted(os.sched_getaffinity(0))
+    return list(range(os.cpu_count() or 1))
+
+
+def _cgroup_cpu_limit():
+    """CPU quota of the container in cores (cgroup v2, then v1), or None if unlimited"""
+    quota = _read('/sys/fs/cgroup/cpu.max')
+    if quota:
+        limit, _, period = quota.partition(' ')
+        if limit != 'max':
+            return int(limit) / int(period)
+        return None
+    limit = _read('/sys/fs/cgroup/cpu/cpu.cfs_quota_us')
+    period = _read('/sys/fs/cgroup/cpu/cpu.cfs_period_us')
+    if limit and period and int(limit) > 0:
+        return int(limit) / int(period)
+    return None
+
+
+def _physical_cores(cpus):
+    """Group logical CPUs into physical cores: [[0, 8], [1, 9], ...] (SMT siblings together)"""
+    cores = {}
+    for cpu in cpus:
+        package = _read(f'/sys/devices/system/cpu/cpu{cpu}/topology/physical_package_id')
+        core = _read(f'/sys/devices/system/cpu/cpu{cpu}/topology/core_id')
+        # Without topology info every logical CPU counts as its own core
+        key = (package, core) if core is not None else ('cpu', cpu)
+        cores.setdefault(key, []).append(cpu)
+    return sorted(cores.values())
+
+
+def _numa_nodes(cpus):
+    """Allowed logical CPUs per NUMA node: {node: [cpus]}"""
+    allowed = set(cpus)
+    nodes = {}
+    for path in glob.glob('/sys/devices/system/node/node[0-9]*/cpulist'):
+        node = int(os.path.basename(os.path.dirname(path))[4:])
+        node_cpus = [cpu for cpu in parse_cpu_list(_read(path) or '') if cpu in allowed]
+        if node_cpus:
+            nodes[node] = node_cpus
+    return nodes or {0: list(cpus)}
+
+
+def _cpu_flags():
+    """Supported instruction-set extensions of interest"""
+    info = _read('/proc/cpuinfo') or ''
+    flags = set()
+    for line in info.splitlines():
+        key, _, value = line.partition(':')
+        if key.strip() in ('flags', 'Features'):
+            flags.update(value.split())
+            break
+    return [flag for flag in ISA_FLAGS if flag in flags]
+
+
+def _cpu_model():
+    info = _read('/proc/cpuinfo') or ''
+    for line in info.splitlines():
+        key, _, value = line.partition(':')
+        if key.strip() in ('model name', 'Model', 'Hardware'):
+            return value.strip()
+    return None
+
+
+class CpuTopology:
+    """Snapshot of the CPUs available to this process"""
+
+    def __init__(self):
+        self.cpus = _allowed_cpus()
+        self.cores = _physical_cores(self.cpus)
+        self.numa_nodes = _numa_nodes(self.cpus)
+        self.cgroup_limit = _cgroup_cpu_limit()
+        self.isa = _cpu_flags()
+        self.model = _cpu_model()
+
+    @property
+    def usable_cores(self):
+        """Physical cores actually usable, capped by the container quota"""
+        cores = len(self.cores)
+        if self.cgroup_limit is not None:
+            cores = min(cores, max(1, int(self.cgroup_limit)))
+        return max(1, cores)
+
+    def cores_by_node(self):
+        """Physical cores ordered NUMA node by node, so contiguous slices stay node-local"""
+        node_of = {cpu: node for node, cpus in self.numa_nodes.items() for cpu in cpus}
+        return sorted(self.cores, key=lambda core: (node_of.get(core[0], 0), core[0]))
+
+    def as_dict(self):
+        return {
+            "model": self.model,
+            "logical_cpus": len(self.cpus),
+            "physical_cores": len(self.cores),
+            "numa_nodes": {str(node): len(cpus) for node, cpus in self.numa_nodes.items()},
+            "cgroup_cpu_limit": self.cgroup_limit,
+            "isa": self.isa
+        }
+
+
+def _env_int(name, default=None):
+    value = os.environ.get(name)
+    if value is None or value == '':
+        return default
+    try:
+        return max(1, int(value))
+    except ValueError:
+        logger.warning("Ignoring %s=%r: not an integer", name, value)
+        return default
+
+
+_worker_lock = None  # Held open for the life of the process
+
+
+def _lock_path(index):
+    """
+    Lock file of worker slot `index`. Without VIOR_RUNTIME_DIR the locks go to the shared
+    temp directory, named after this checkout and user so other deployments on the same
+    host do not take each other's slots; two instances of one checkout need their own dir.
+    """
+    directory = os.environ.get(RUNTIME_DIR_ENV)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+        return os.path.join(directory, f'vior-worker-{index}.lock')
+    key = hashlib.sha1(f'{APP_DIR}:{os.getuid()}'.encode()).hexdigest()[:12]
+    return os.path.join(tempfile.gettempdir(), f'vior-{key}-worker-{index}.lock')
+
+
+def _claim_worker_slot(workers):
+    """
+    Claim a worker index in [0, workers) with an exclusive file lock.
+    uvicorn does not tell workers their index; the lock is released by the OS when
+    the worker exits, so a restarted worker takes over the slot it left behind.
+    """
+    global _worker_lock
+    if workers <= 1:
+        return 0
+    if fcntl is None:
+        return os.getpid() % workers
+    for index in range(workers):
+        handle = open(_lock_path(index), 'w')
+        try:
+            fcntl.flock(handle, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            handle.close()
+            continue
+        _worker_lock = handle
+        return index
+    # More processes than declared workers: share slot by pid
+    return os.getpid() % workers
+
+
+def plan_worker(topology, workers, index, threads=None, interop_threads=None, pin=False):
+    """
+    Split the machine between workers: each gets an equal share of physical cores as
+    intra-op threads and, when pinned, a disjoint slice of those cores (node-local
+    where the worker count allows it)
+    """
+    share = max(1, topology.usable_cores // workers)
+    plan = {
+        "worker": index,
+        "workers": workers,
+        "threads": threads or share,
+        "interop_threads": interop_threads or 1,
+        "cpus": None
+    }
+
+    if pin:
+        cores = topology.cores_by_node()
+        if len(cores) >= workers:
+            per_worker = len(cores) // workers
+            mine = cores[index * per_worker:(index + 1) * per_worker]
+            # SMT siblings go along so the OS can still place helper threads
+            plan["cpus"] = sorted(cpu for core in mine for cpu in core)
+        else:
+            logger.warning("Not pinning: %d workers but only %d physical cores", workers, len(cores))
+    return plan
+
+
+def _apply(plan):
+    """Apply a worker plan to this process: affinity, then torch and OpenCV thread pools"""
+    if plan["cpus"] and hasattr(os, 'sched_setaffinity'):
+        os.sched_setaffinity(0, plan["cpus"])
+
+    # Read by OpenMP / MKL when torch initializes, if it has not been imported yet
+    os.environ.setdefault("OMP_NUM_THREADS", str(plan["threads"]))
+    os.environ.setdefault("MKL_NUM_THREADS", str(plan["threads"]))
+
+    import cv2
+    cv2.setNumThreads(plan["threads"])
+
+    try:
+        import torch
+    except ImportError:
+        return
+    torch.set_num_threads(plan["threads"])
+    try:
+        torch.set_num_interop_threads(plan["interop_threads"])
+    except RuntimeError:
+        # Only allowed before torch runs any parallel work
+        plan["interop_threads"] = torch.get_num_interop_threads()
+
+
+def _accelerator():
+    """CUDA device info, or None on CPU-only machines (never raises)"""
+    try:
+        import torch
+    except ImportError:
+        return None
+    if not torch.cuda.is_available():
+        return None
+    return {
+        "device_count": torch.cuda.device_count(),
+        "name": torch.cuda.get_device_name(0),
+        "cuda_version": torch.version.cuda,
+        "cudnn": torch.backends.cudnn.enabled
+    }
+
+
+runtime_info = {}
+
+
+def configure_runtime(workers=None, threads=None, interop_threads=None, pin=None):
+    """
+    Probe the hardware and size this worker's thread pools; call once per process
+    before the model is loaded. Arguments default to the VIOR_* environment variables.
+    Returns (and keeps in runtime_info) the topology and the plan that was applied.
+    """
+    topology = CpuTopology()
+    workers = workers or _env_int(WORKERS_ENV) or _env_int("WEB_CONCURRENCY", 1)
+    if pin is None:
+        pin = os.environ.get(PIN_ENV, '') in ('1', 'true', 'yes')
+
+    index = _claim_worker_slot(workers)
+    plan = plan_worker(
+        topology, workers, index,
+        threads=threads or _env_int(THREADS_ENV),
+        interop_threads=interop_threads or _env_int(INTEROP_THREADS_ENV),
+        pin=pin
+    )
+    _apply(plan)
+
+    runtime_info.clear()
+    runtime_info.update({"topology": topology.as_dict(), "worker": plan, "accelerator": _accelerator()})
+    logger.info(
+        "Runtime: %s | %d logical / %d physical cores, NUMA %s, quota %s, ISA %s | "
+        "worker %d/%d: %d threads, %d interop, cpus %s | accelerator %s",
+        topology.model, len(topology.cpus), len(topology.cores), runtime_info["topology"]["numa_nodes"],
+        topology.cgroup_limit, ','.join(topology.isa) or '-',
+        plan["worker"] + 1, plan["workers"], plan["threads"], plan["interop_threads"],
+        plan["cpus"] or 'unpinned', runtime_info["accelerator"] or 'cpu only'
+    )
+    return runtime_info
+
+
+if __name__ == "__main__":
+    # Hardware report (replaces the old CUDA-only check script)
+    import json
+    logging.basicConfig(level=logging.INFO)
+    topology = CpuTopology()
+    print(json.dumps({"topology": topology.as_dict(), "accelerator": _accelerator()}, indent=2))
@@ -0,0 +1,317 @@
+import logging
+import sys
+import threading
+import time
+
+import cv2
+
+from core.detection import ObjectDetector
+from core.runtime import configure_runtime
+
+logger = logging.getLogger(__name__)
+
+# Same debounce rules as the single-camera loop in core/basic.py
+STABILITY_THRESHOLD = 2  # Seconds before confirming a change
+COOLDOWN_TIME = 2  # Min time between notifications
+
+RECONNECT_DELAY = 1.0  # Seconds before the first reopen attempt
+MAX_RECONNECT_DELAY = 30.0
+
+
+def parse_source(source):
+    """Turn "0" into a device index; leave file paths and RTSP/HTTP URLs as strings"""
+    if isinstance(source, str) and source.isdigit():
+        return int(source)
+    return source
+
+
+class StreamReader:
+    """
+    Capture thread for one source that always holds the most recent frame.
+    Older frames are overwritten rather than queued, so a slow consumer sees fresh
+    frames instead of a growing backlog. File sources are paced at their own FPS
+    (and optionally looped) so they can stand in for live cameras in tests.
+    """
+
+    def __init__(self, stream_id, source, loop_files=True):
+        self.stream_id = stream_id
+        self.source = parse_source(source)
+        self.loop_files = loop_files
+        self.is_file = isinstance(self.source, str) and "://" not in self.source
+
+        self._frame = None
+        self._frame_seq = 0
+        self._frame_time = 0.0
+        self._consumed_seq = 0
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name=f"capture-{stream_id}", daemon=True)
+
+        self.frames_read = 0
+        self.frames_dropped = 0  # Overwritten before inference picked them up
+        self.reconnects = 0
+        self.finished = False
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join(timeout=5)
+
+    def latest(self, after_seq=0):
+        """Return (seq, frame, timestamp) if a frame newer than after_seq exists, else None"""
+        with self._lock:
+            if self._frame is None or self._frame_seq <= after_seq:
+                return None
+            return self._frame_seq, self._frame, self._frame_time
+
+    def _open(self):
+        cap = cv2.VideoCapture(self.source)
+        if self.is_file and not cap.isOpened():
+            raise ValueError(f"Could not open video at {self.source}")
+        # Keep the driver-side buffer short so reads return live frames
+        cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+        return cap
+
+    def _run(self):
+        delay = RECONNECT_DELAY
+        while not self._stop.is_set():
+            try:
+                cap = self._open()
+            except ValueError as e:
+                logger.error("Stream %s: %s", self.stream_id, e)
+                self.finished = True
+                return
+
+            fps = cap.get(cv2.CAP_PROP_FPS) or 30
+            frame_interval = 1.0 / fps if self.is_file else 0.0
+            next_frame_at = time.monotonic()
+
+            while cap.isOpened() and not self._stop.is_set():
+                ret, frame = cap.read()
+                if not ret:
+                    break
+                delay = RECONNECT_DELAY
+                with self._lock:
+                    if self._frame is not None and self._consumed_seq < self._frame_seq:
+                        self.frames_dropped += 1
+                    self._frame = frame
+                    self._frame_seq += 1
+                    self._frame_time = time.time()
+                self.frames_read += 1
+
+                if frame_interval:
+                    next_frame_at += frame_interval
+                    pause = next_frame_at - time.monotonic()
+                    if pause > 0:
+                        self._stop.wait(pause)
+            cap.release()
+
+            if self.is_file and not self.loop_files:
+                self.finished = True
+                return
+            if not self.is_file:
+                # Live source dropped: back off before reconnecting
+                self.reconnects += 1
+                logger.warning("Stream %s lost, reconnecting in %.1fs", self.stream_id, delay)
+                self._stop.wait(delay)
+                delay = min(delay * 2, MAX_RECONNECT_DELAY)
+
+    def mark_consumed(self, seq):
+        """Record that inference picked up frame seq (for drop accounting)"""
+        with self._lock:
+            self._consumed_seq = max(self._consumed_seq, seq)
+
+
+class StabilityDebouncer:
+    """
+    Per-stream change detection: a new set of objects is reported only after it has
+    held for STABILITY_THRESHOLD seconds and COOLDOWN_TIME has passed
+    """
+
+    def __init__(self, stability_threshold=STABILITY_THRESHOLD, cooldown_time=COOLDOWN_TIME):
+        self.stability_threshold = stability_threshold
+        self.cooldown_time = cooldown_time
+        self.previous_objects = {}
+        self.last_stable_objects = {}
+        self.last_update_time = 0
+
+    def update(self, detected_objects, now=None):
+        """Feed the latest detections; returns True when they should be reported"""
+        now = time.time() if now is None else now
+
+        # Check if detections are stable for STABILITY_THRESHOLD seconds
+        if detected_objects != self.last_stable_objects:
+            self.last_update_time = now
+            self.last_stable_objects = detected_objects.copy()
+
+        # Report only if objects are stable & changed
+        if (
+            detected_objects != self.previous_objects and
+            (now - self.last_update_time) > self.stability_threshold and
+            (now - self.last_update_time) > self.cooldown_time
+        ):
+            self.previous_objects = detected_objects.copy()
+            return True
+        return False
+
+
+def summarize_detections(grouped_detections):
+    """Reduce grouped detections to {object: sorted positions} for change comparison"""
+    return {
+        obj_type: sorted(det['position'] for det in dets)
+        for obj_type, dets in grouped_detections.items()
+    }
+
+
+class StreamIngestService:
+    """
+    Ingests many camera/file/RTSP sources into one shared model.
+    Each source has a StreamReader thread; a single inference thread gathers the
+    newest frame from every stream that has one, runs them through the model in
+    batches of up to batch_size, and passes debounced changes to on_change.
+    """
+
+    def __init__(self, sources, detector=None, model_path="models/yolov8l.pt",
+                 batch_size=None, options=None, on_change=None, publisher=None, loop_files=True,
+                 idle_wait=0.005, batch_window=0.01):
+        self.detector = detector or ObjectDetector(model_path)
+        self.batch_size = batch_size or self.detector.batch_size
+        self.options = options
+        self.publisher = publisher
+        self.on_change = on_change or (self._publish_change if publisher else self._print_change)
+        self.idle_wait = idle_wait
+        self.batch_window = batch_window  # How long to wait for more streams to fill a batch
+
+        if isinstance(sources, dict):
+            items = sources.items()
+        else:
+            items = ((str(i), source) for i, source in enumerate(sources))
+        self.readers = {
+            stream_id: StreamReader(stream_id, source, loop_files=loop_files)
+            for stream_id, source in items
+        }
+        self.debouncers = {stream_id: StabilityDebouncer() for stream_id in self.readers}
+        self.latest_detections = {}
+
+        self._last_seq = {stream_id: 0 for stream_id in self.readers}
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._inference_loop, name="stream-inference", daemon=True)
+
+        self.batches = 0
+        self.frames_inferred = 0
+        self.errors = 0  # Batches dropped because inference failed
+        self.inference_time = 0.0
+        self.started_at = None
+
+    def start(self):
+        self.started_at = time.monotonic()
+        for reader in self.readers.values():
+            reader.start()
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join(timeout=10)
+        for reader in self.readers.values():
+            reader.stop()
+
+    def _collect_frames(self):
+        """Take the newest unseen frame from every stream"""
+        pending = []
+        for stream_id, reader in self.readers.items():
+            latest = reader.latest(self._last_seq[stream_id])
+            if latest is None:
+                continue
+            seq, frame, timestamp = latest
+            self._last_seq[stream_id] = seq
+            reader.mark_consumed(seq)
+            pending.append((stream_id, frame, timestamp))
+        return pending
+
+    def _inference_loop(self):
+        while not self._stop.is_set():
+            pending = self._collect_frames()
+            if not pending:
+                if all(reader.finished for reader in self.readers.values()):
+                    return
+                self._stop.wait(self.idle_wait)
+                continue
+
+            # Give other streams a moment to deliver so the model sees fuller batches
+            if len(pending) < min(self.batch_size, len(self.readers)) and self.batch_window:
+                self._stop.wait(self.batch_window)
+                pending.extend(self._collect_frames())
+
+            for start in range(0, len(pending), self.batch_size):
+                batch = pending[start:start + self.batch_size]
+                started = time.monotonic()
+                try:
+                    results = self.detector.get_object_positions_batch(
+                        [frame for _, frame, _ in batch], options=self.options
+                    )
+                except Exception:
+                    # Drop the batch: the readers already hold newer frames to try next
+                    self.errors += 1
+                    logger.exception("Inference failed for streams %s", ", ".join(stream_id for stream_id, _, _ in batch))
+                    continue
+                finally:
+                    self.inference_time += time.monotonic() - started
+                self.batches += 1
+                self.frames_inferred += len(batch)
+
+                for (stream_id, _, timestamp), detections in zip(batch, results):
+                    self._handle_detections(stream_id, detections, timestamp)
+
+    def _handle_detections(self, stream_id, detections, timestamp):
+        self.latest_detections[stream_id] = detections
+        summary = summarize_detections(detections)
+        if self.debouncers[stream_id].update(summary, timestamp):
+            try:
+                self.on_change(stream_id, summary)
+            except Exception as e:
+                logger.error("Change handler failed for stream %s: %s", stream_id, e)
+
+    def _publish_change(self, stream_id, objects):
+        self.publisher.publish(stream_id, {"source": stream_id, "objects": objects})
+
+    @staticmethod
+    def _print_change(stream_id, objects):
+        print(f"[{stream_id}] Objects changed: {objects}")
+
+    def stats(self):
+        """Throughput and per-stream capture counters"""
+        elapsed = time.monotonic() - self.started_at if self.started_at else 0.0
+        return {
+            "batches": self.batches,
+            "frames_inferred": self.frames_inferred,
+            "avg_batch_size": round(self.frames_inferred / self.batches, 2) if self.batches else 0,
+            "errors": self.errors,
+            "inference_fps": round(self.frames_inferred / elapsed, 2) if elapsed else 0,
+            "model_busy": round(self.inference_time / elapsed, 3) if elapsed else 0,
+            "streams": {
+                stream_id: {
+                    "frames_read": reader.frames_read,
+                    "frames_dropped": reader.frames_dropped,
+                    "reconnects": reader.reconnects,
+                    "finished": reader.finished
+                }
+                for stream_id, reader in self.readers.items()
+            }
+        }
+
+
+if __name__ == "__main__":
+    # Usage: python -m core.streams 0 rtsp://camera/stream videos/1.mp4
+    logging.basicConfig(level=logging.INFO)
+    configure_runtime()
+    service = StreamIngestService(sys.argv[1:] or ["0"]).start()
+    try:
+        while True:
+            time.sleep(10)
+            print(service.stats())
+    except KeyboardInterrupt:
+        service.stop()
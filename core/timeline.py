@@ -0,0 +1,152 @@
+import json
+
+import numpy as np
+
+# One row per sampled detection
+DETECTION_DTYPE = np.dtype([
+    ('frame', '<u4'),
+    ('timestamp', '<f4'),
+    ('class_id', '<u2'),
+    ('track_id', '<u4'),
+    ('x1', '<f4'),
+    ('y1', '<f4'),
+    ('x2', '<f4'),
+    ('y2', '<f4'),
+    ('confidence', '<f4'),
+])
+
+CHUNK_ROWS = 4096  # Rows per preallocated chunk
+
+
+class DetectionTimeline:
+    """
+    Every sampled detection of a video, stored as rows of a NumPy structured array.
+    Rows go into fixed-size preallocated chunks (34 bytes per detection), so
+    appending never copies what is already stored; queries work on one
+    concatenated view that is rebuilt only after new rows arrive.
+    """
+
+    def __init__(self, names=None, fps=None, chunk_rows=CHUNK_ROWS):
+        self.names = dict(names or {})  # class_id -> label
+        self.track_names = {}  # track_id -> object_id, e.g. "person_2"
+        self.fps = fps
+        self.chunk_rows = chunk_rows
+        self._chunks = []
+        self._used = 0  # Rows used in the last chunk
+        self._rows = None
+
+    def __len__(self):
+        if not self._chunks:
+            return 0
+        return sum(len(chunk) for chunk in self._chunks[:-1]) + self._used
+
+    def append(self, frame, timestamp, class_id, track_id, bbox, confidence):
+        """Add one detection; bbox is (x1, y1, x2, y2)"""
+        if not self._chunks or self._used == len(self._chunks[-1]):
+            self._chunks.append(np.zeros(self.chunk_rows, dtype=DETECTION_DTYPE))
+            self._used = 0
+        x1, y1, x2, y2 = bbox
+        self._chunks[-1][self._used] = (frame, timestamp, class_id, track_id, x1, y1, x2, y2, confidence)
+        self._used += 1
+        self._rows = None
+
+    def extend(self, rows):
+        """Add many detections at once from a DETECTION_DTYPE array (e.g. restored from a checkpoint)"""
+        if not len(rows):
+            return
+        if self._chunks:
+            # Seal the partly used chunk; new appends start a fresh one
+            self._chunks[-1] = self._chunks[-1][:self._used]
+        self._chunks.append(np.asarray(rows, dtype=DETECTION_DTYPE).copy())
+        self._used = len(rows)
+        self._rows = None
+
+    @property
+    def rows(self):
+        """All detections as one structured array, in insertion (frame) order"""
+        if self._rows is None:
+            if not self._chunks:
+                self._rows = np.zeros(0, dtype=DETECTION_DTYPE)
+            else:
+                parts = self._chunks[:-1] + [self._chunks[-1][:self._used]]
+                self._rows = np.concatenate(parts)
+        return self._rows
+
+    def for_track(self, track_id):
+        """Rows belonging to one track"""
+        rows = self.rows
+        return rows[rows['track_id'] == track_id]
+
+    def first_seen(self, track_id):
+        """Timestamp of the first sighting of a track (None if unknown)"""
+        rows = self.for_track(track_id)
+        return float(rows['timestamp'][0]) if len(rows) else None
+
+    def last_seen(self, track_id):
+        """Timestamp of the last sighting of a track (None if unknown)"""
+        rows = self.for_track(track_id)
+        return float(rows['timestamp'][-1]) if len(rows) else None
+
+    def track_summary(self):
+        """First/last seen, dwell time and sighting count for every track"""
+        rows = self.rows
+        if not len(rows):
+            return []
+        track_ids, first_index, counts = np.unique(rows['track_id'], return_index=True, return_counts=True)
+        # Rows are in frame order, so the first/last index of a track are its first/last sightings
+        last_index = len(rows) - 1 - np.unique(rows['track_id'][::-1], return_index=True)[1]
+
+        summary = []
+        for track_id, first, last, count in zip(track_ids, first_index, last_index, counts):
+            first_time = float(rows['timestamp'][first])
+            last_time = float(rows['timestamp'][last])
+            class_id = int(rows['class_id'][first])
+            summary.append({
+                'track_id': int(track_id),
+                'object_id': self.track_names.get(int(track_id)),
+                'object': self.names.get(class_id, str(class_id)),
+                'first_seen': round(first_time, 3),
+                'last_seen': round(last_time, 3),
+                'dwell_time': round(last_time - first_time, 3),
+                'sightings': int(count)
+            })
+        return summary
+
+    def class_counts_over_time(self, bin_seconds=1.0):
+        """Distinct tracks per class in each time bin: {label: [count per bin]}"""
+        rows = self.rows
+        if not len(rows):
+            return {}
+        bins = (rows['timestamp'] // bin_seconds).astype(np.int64)
+        n_bins = int(bins.max()) + 1
+        # Count each (bin, class, track) once
+        keys = np.unique(np.stack([bins, rows['class_id'].astype(np.int64), rows['track_id'].astype(np.int64)], axis=1), axis=0)
+
+        counts = {}
+        for class_id in np.unique(keys[:, 1]):
+            per_class = keys[keys[:, 1] == class_id]
+            label = self.names.get(int(class_id), str(class_id))
+            counts[label] = np.bincount(per_class[:, 0], minlength=n_bins).tolist()
+        return counts
+
+    def save(self, path):
+        """Write rows plus metadata to a compressed .npz file"""
+        meta = {
+            'names': {str(k): v for k, v in self.names.items()},
+            'track_names': {str(k): v for k, v in self.track_names.items()},
+            'fps': self.fps
+        }
+        np.savez_compressed(path, rows=self.rows, meta=np.array(json.dumps(meta)))
+
+    @classmethod
+    def load(cls, path):
+        """Read a timeline written by save()"""
+        with np.load(path, allow_pickle=False) as data:
+            meta = json.loads(str(data['meta']))
+            rows = data['rows']
+        timeline = cls(names={int(k): v for k, v in meta['names'].items()}, fps=meta['fps'])
+        timeline.track_names = {int(k): v for k, v in meta['track_names'].items()}
+        if len(rows):
+            timeline._chunks = [rows.astype(DETECTION_DTYPE)]
+            timeline._used = len(rows)
+        return timeline
@@ -0,0 +1,202 @@
+import mimetypes
+import os
+import tarfile
+import threading
+import zipfile
+import zlib
+from contextlib import contextmanager
+
+import cv2
+import numpy as np
+
+READ_CHUNK_SIZE = 1024 * 1024  # 1MB chunks
+MAX_RETAINED_SIZE = 8 * 1024 * 1024  # Larger buffers are dropped instead of going back to the pool
+
+# Older Pythons do not map .webp
+mimetypes.add_type("image/webp", ".webp")
+
+
+class UploadTooLarge(ValueError):
+    """Raised when an upload grows past the configured byte limit"""
+
+
+class BufferPool:
+    """
+    Pool of reusable bytearrays for reading uploads without per-request allocations.
+    Buffers grow on demand and keep their capacity when returned, so steady-state
+    traffic reuses the same few blocks of memory. A buffer that grew past
+    max_retained_size (one unusually large upload) is replaced by a fresh
+    initial_size one, so the pool never pins more than max_buffers * max_retained_size.
+    """
+
+    def __init__(self, max_buffers=4, initial_size=READ_CHUNK_SIZE, max_retained_size=MAX_RETAINED_SIZE):
+        self.max_buffers = max_buffers
+        self.initial_size = initial_size
+        self.max_retained_size = max(max_retained_size, initial_size)
+        self._free = [bytearray(initial_size) for _ in range(max_buffers)]
+        self._lock = threading.Lock()
+        self.dropped = 0
+
+    @contextmanager
+    def borrow(self):
+        """Lend a buffer for the duration of the block"""
+        with self._lock:
+            buffer = self._free.pop() if self._free else None
+        pooled = buffer is not None
+        if buffer is None:
+            # Pool exhausted: serve this request from a transient buffer
+            buffer = bytearray(self.initial_size)
+        try:
+            yield buffer
+        finally:
+            if pooled:
+                if len(buffer) > self.max_retained_size:
+                    buffer = bytearray(self.initial_size)
+                    self.dropped += 1
+                with self._lock:
+                    self._free.append(buffer)
+
+
+def _grow(buffer, needed, max_size):
+    """Grow buffer in place to hold at least `needed` bytes"""
+    new_size = max(needed, len(buffer) * 2)
+    if max_size is not None:
+        new_size = min(new_size, max_size)
+    buffer.extend(bytes(new_size - len(buffer)))
+
+
+def read_into_buffer(fileobj, buffer, limit):
+    """
+    Read a file object into buffer, growing it as needed, and return the byte count.
+    Raises UploadTooLarge as soon as more than `limit` bytes have been seen, so
+    oversized uploads are rejected without reading them to the end.
+    """
+    readinto = getattr(fileobj, "readinto", None)
+    total = 0
+    while True:
+        # Always leave room for one byte past the limit to detect oversized files
+        if total >= len(buffer):
+            if total > limit:
+                raise UploadTooLarge(f"Upload exceeds {limit} bytes")
+            _grow(buffer, total + READ_CHUNK_SIZE, limit + 1)
+        with memoryview(buffer) as whole, whole[total:total + READ_CHUNK_SIZE] as view:
+            if readinto is not None:
+                count = readinto(view)
+            else:
+                chunk = fileobj.read(len(view))
+                count = len(chunk)
+                view[:count] = chunk
+        if not count:
+            break
+        total += count
+        if total > limit:
+            raise UploadTooLarge(f"Upload exceeds {limit} bytes")
+    return total
+
+
+def decode_image(buffer, length):
+    """Decode the first `length` bytes of buffer as a BGR image (None if undecodable)"""
+    if length == 0:
+        return None
+    encoded = np.frombuffer(buffer, dtype=np.uint8, count=length)
+    try:
+        return cv2.imdecode(encoded, cv2.IMREAD_COLOR)
+    finally:
+        # Drop the buffer export so the pool can resize it later
+        del encoded
+
+
+def read_image_upload(pool, fileobj, limit, digest=None):
+    """
+    Read a spooled upload through the buffer pool and decode it straight from there.
+    A hashlib object passed as digest is fed the raw bytes on the way.
+    """
+    with pool.borrow() as buffer:
+        length = read_into_buffer(fileobj, buffer, limit)
+        if digest is not None:
+            with memoryview(buffer) as view, view[:length] as data:
+                digest.update(data)
+        return decode_image(buffer, length)
+
+
+def decode_image_bytes(data):
+    """Decode an in-memory encoded image (None if undecodable)"""
+    if not data:
+        return None
+    return cv2.imdecode(np.frombuffer(data, dtype=np.uint8), cv2.IMREAD_COLOR)
+
+
+def guess_image_type(filename):
+    """Guess an image content type from a file name"""
+    return mimetypes.guess_type(filename)[0]
+
+
+class InvalidArchive(ValueError):
+    """Raised when an uploaded archive cannot be opened or has too many entries"""
+
+
+class ImageArchive:
+    """
+    A ZIP or TAR archive of images, opened and listed up front so a corrupt or
+    oversized archive is rejected before any results are streamed. Entries are
+    only extracted while iterating over images().
+    """
+
+    def __init__(self, path, max_entries=None):
+        try:
+            if zipfile.is_zipfile(path):
+                self._archive = zipfile.ZipFile(path)
+                self._entries = [
+                    (info.filename, info.file_size, info)
+                    for info in self._archive.infolist() if not info.is_dir()
+                ]
+            elif tarfile.is_tarfile(path):
+                self._archive = tarfile.open(path)
+                self._entries = [
+                    (member.name, member.size, member)
+                    for member in self._archive.getmembers() if member.isfile()
+                ]
+            else:
+                raise InvalidArchive("Unsupported archive format. Supported formats: ZIP, TAR")
+        except (zipfile.BadZipFile, tarfile.TarError, EOFError, OSError, zlib.error) as e:
+            raise InvalidArchive(f"Could not read archive: {e}")
+
+        if max_entries is not None and len(self._entries) > max_entries:
+            self.close()
+            raise InvalidArchive(f"Too many files. Maximum is {max_entries} per request")
+
+    def __len__(self):
+        return len(self._entries)
+
+    def images(self, allowed_types, limit):
+        """
+        Yield (name, data, error) for each file entry. Entries are validated by
+        extension against allowed_types and by their declared uncompressed size
+        against limit before anything is extracted.
+        """
+        for name, size, entry in self._entries:
+            error = _check_entry(name, size, allowed_types, limit)
+            if error:
+                yield name, None, error
+                continue
+            try:
+                if isinstance(self._archive, zipfile.ZipFile):
+                    data = self._archive.read(entry)
+                else:
+                    data = self._archive.extractfile(entry).read()
+            except (zipfile.BadZipFile, tarfile.TarError, EOFError, OSError, zlib.error):
+                yield name, None, "Could not read archive entry"
+                continue
+            yield name, data, None
+
+    def close(self):
+        self._archive.close()
+
+
+def _check_entry(name, size, allowed_types, limit):
+    """Return an error message if an archive entry should be skipped"""
+    if guess_image_type(os.path.basename(name)) not in allowed_types:
+        return "Invalid file type. Supported formats: JPG, JPEG, PNG, WebP"
+    if size > limit:
+        return "File size too large. Maximum size is 50MB"
+    return None
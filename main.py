@@ -1,19 +1,26 @@
 import logging
 from fastapi import FastAPI, Request
-from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
-from routes.detection_routes import router as detection_router
+from core.assets import AssetFiles
+from core.runtime import configure_runtime
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Size this worker's torch / OpenCV thread pools (and optionally pin it) before the model loads
+configure_runtime()
+
+from routes.detection_routes import router as detection_router  # noqa: E402 - loads the model
+
 # Create FastAPI app instance
 app = FastAPI(title="VIOR API", description="Video and Image Object Recognition API")
 
-# Mount static files
-app.mount("/static", StaticFiles(directory="static"), name="static")
+# Mount static files (precompressed text assets, ETags, fingerprinted URLs, Range support)
+assets = AssetFiles("static", prefix="/static")
+app.mount("/static", assets, name="static")
 templates = Jinja2Templates(directory="templates")
+templates.env.globals["asset_url"] = assets.url
 
 # Include routers
 app.include_router(detection_router)
@@ -1,12 +1,32 @@
-from fastapi import APIRouter, UploadFile, File, Request, HTTPException
-from fastapi.responses import JSONResponse
+from fastapi import APIRouter, UploadFile, File, Form, Query, Depends, Request, HTTPException
+from fastapi.responses import JSONResponse, StreamingResponse
+from starlette.concurrency import run_in_threadpool
+from concurrent.futures import ThreadPoolExecutor
+from core.admission import AdmissionController, Overloaded, DeadlineExceeded, ClientDisconnected
+from core.adaptive import AdaptiveDetector
+from core.checkpoints import CheckpointStore
 from core.detection import ObjectDetector
-import cv2
-import numpy as np
+from core.encoding import (
+    COLUMNAR, CONFIDENCE_SCALE, POSITIONS,
+    NegotiatedResponse, encode_line, negotiate, stream_media_type
+)
+from core.detection_index import DetectionIndex, flatten_detections, QUERY_LIMIT, MAX_QUERY_LIMIT
+from core.frame_cache import shared_frame_cache
+from core.pipeline import Pipeline, Stage, recent_pipeline_stats
+from core.inference_options import InvalidOptions, parse_inference_options
+from core.runtime import runtime_info
+from core.timeline import DetectionTimeline
+from core.uploads import (
+    BufferPool, UploadTooLarge, read_image_upload,
+    decode_image_bytes, ImageArchive, InvalidArchive
+)
+import anyio
+import asyncio
 import tempfile
+import hashlib
+import threading
 import os
-import shutil
-from typing import List
+from typing import List, Optional
 
 router = APIRouter()
 detector = ObjectDetector()
@@ -15,12 +35,217 @@ ALLOWED_IMAGE_TYPES = ['image/jpeg', 'image/jpg', 'image/png', 'image/webp']
 ALLOWED_VIDEO_TYPES = ['video/mp4', 'video/avi', 'video/quicktime', 'video/x-matroska']
 MAX_FILE_SIZE = 50 * 1024 * 1024  # 50MB
 
+ALLOWED_ARCHIVE_TYPES = [
+    'application/zip', 'application/x-zip-compressed', 'application/x-tar',
+    'application/gzip', 'application/x-gzip', 'application/x-gtar'
+]
+ARCHIVE_EXTENSIONS = ('.zip', '.tar', '.tar.gz', '.tgz')
+MAX_BATCH_FILES = 5000
+MAX_BATCH_SIZE = 500 * 1024 * 1024  # 500MB per batch request
+
+# Admission control: concurrent requests per route, bounded wait queue, and deadlines
+image_admission = AdmissionController("vior-image", max_concurrent=4, max_queue=16, queue_timeout=10)
+video_admission = AdmissionController("vior-video", max_concurrent=2, max_queue=4, queue_timeout=30)
+batch_admission = AdmissionController("vior-images", max_concurrent=1, max_queue=2, queue_timeout=30)
+IMAGE_DEADLINE = 30  # seconds
+VIDEO_DEADLINE = 600  # seconds
+BATCH_DEADLINE = 900  # seconds for a whole /vior-images stream
+
+# Steps model size / imgsz / video sampling down when the queues grow, and back up when they drain
+adaptive_detector = AdaptiveDetector(
+    base_detector=detector,
+    queue_depth=lambda: image_admission.waiting + video_admission.waiting + batch_admission.waiting
+)
+
+# Video progress is checkpointed by content hash, so a retried upload resumes instead of restarting
+video_checkpoints = CheckpointStore()
+
+# Every image and video processed with the default settings is recorded here for /vior-index queries
+detection_index = DetectionIndex()
+
+# Reusable read buffers for image uploads (grow as needed; oversized ones are not kept)
+upload_buffers = BufferPool(max_buffers=4)
+
+# Browser uploads are downscaled to the largest input size any quality level feeds the model;
+# positions are relative to the frame, so a proportional resize does not change them
+UPLOAD_TARGET_SIZE = max(level["imgsz"] for level in adaptive_detector.levels)
+UPLOAD_FORMAT = "image/jpeg"
+UPLOAD_QUALITY = 0.9
+
+# Decoding releases the GIL, so batch entries are decoded on a shared thread pool sized to this worker's cores
+decode_executor = ThreadPoolExecutor(max_workers=runtime_info.get("worker", {}).get("threads") or os.cpu_count() or 4)
+
+def _admission_error(e):
+    """Map admission and deadline failures to HTTP responses"""
+    if isinstance(e, Overloaded):
+        return JSONResponse(
+            status_code=429,
+            content={"error": str(e)},
+            headers={"Retry-After": str(e.retry_after)}
+        )
+    if isinstance(e, DeadlineExceeded):
+        return JSONResponse(
+            status_code=504,
+            content={"error": "Processing took too long"}
+        )
+    # Client is gone; nobody will read this
+    return JSONResponse(
+        status_code=499,
+        content={"error": "Client disconnected"}
+    )
+
+def inference_params(
+    classes: Optional[str] = Form(None),
+    conf: Optional[float] = Form(None),
+    iou: Optional[float] = Form(None),
+    max_det: Optional[int] = Form(None),
+    imgsz: Optional[int] = Form(None)
+):
+    """Collect optional per-request inference options from the form"""
+    return {"classes": classes, "conf": conf, "iou": iou, "max_det": max_det, "imgsz": imgsz}
+
+def _parse_options(params):
+    """Validate inference options against the model and the server allowlist"""
+    try:
+        return parse_inference_options(detector.model.names, **params)
+    except InvalidOptions as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+def _indexable(options, inference):
+    """
+    Whether a run's detections may replace the media's index entry (keyed by content
+    alone): only runs with the default options, at the top quality level, without
+    tiling and without frame cache reuse - filtered or degraded results would hide
+    objects from later searches
+    """
+    return (
+        options == parse_inference_options(detector.model.names)
+        and inference["quality_level"] == 0
+        and "tiles" not in inference
+        and not inference["frame_cache"]["hits"]
+    )
+
+@router.get("/vior-config")
+async def upload_config():
+    """
+    Tell clients how to prepare uploads: images are resized so their longest side is at
+    most target_size and re-encoded before sending. "columnar" holds the fixed code
+    tables of the columnar response encoding.
+    """
+    return JSONResponse(
+        content={
+            "image": {
+                "target_size": UPLOAD_TARGET_SIZE,
+                "format": UPLOAD_FORMAT,
+                "quality": UPLOAD_QUALITY,
+                "max_file_size": MAX_FILE_SIZE,
+                "allowed_types": ALLOWED_IMAGE_TYPES
+            },
+            "columnar": {
+                "media_type": COLUMNAR,
+                "positions": POSITIONS,
+                "confidence_scale": CONFIDENCE_SCALE
+            }
+        },
+        headers={"Cache-Control": "public, max-age=300"}
+    )
+
+@router.get("/vior-stats")
+async def admission_stats():
+    """
+    Report queue depth, in-flight work and shed counts for each detection route
+    """
+    stats = {
+        controller.name: controller.stats()
+        for controller in (image_admission, video_admission, batch_admission)
+    }
+    stats["quality"] = adaptive_detector.stats()
+    stats["frame_cache"] = shared_frame_cache.stats()
+    stats["runtime"] = runtime_info
+    stats["pipelines"] = recent_pipeline_stats()
+    stats["index"] = await run_in_threadpool(detection_index.stats)
+    return JSONResponse(content=stats)
+
+def index_filters(
+    object: Optional[str] = Query(None),
+    position: Optional[str] = Query(None),
+    kind: Optional[str] = Query(None),
+    min_confidence: Optional[float] = Query(None, ge=0, le=1),
+    start: Optional[float] = Query(None),
+    end: Optional[float] = Query(None),
+    since: Optional[float] = Query(None),
+    until: Optional[float] = Query(None)
+):
+    """
+    Detection index filters: class, position, media kind (image/video), minimum confidence,
+    seconds into a video (start/end) and processing time as Unix timestamps (since/until)
+    """
+    return {
+        "object": object, "position": position, "kind": kind, "min_confidence": min_confidence,
+        "start": start, "end": end, "since": since, "until": until
+    }
+
+@router.get("/vior-index/media")
+async def search_media(
+    filters: dict = Depends(index_filters),
+    limit: int = Query(QUERY_LIMIT, ge=1, le=MAX_QUERY_LIMIT)
+):
+    """
+    List processed images and videos with matching detections, e.g.
+    ?object=bicycle&position=bottom-left&kind=video
+    """
+    media = await run_in_threadpool(lambda: detection_index.find_media(limit=limit, **filters))
+    return JSONResponse(content={"media": media})
+
+@router.get("/vior-index/media/{media_key}")
+async def media_detections(media_key: str, filters: dict = Depends(index_filters)):
+    """
+    Return the indexed detections of one image or video
+    """
+    detections = await run_in_threadpool(lambda: detection_index.detections(media_key, **filters))
+    if not detections:
+        return JSONResponse(
+            status_code=404,
+            content={"error": "No indexed detections match this media"}
+        )
+    return JSONResponse(content={"media_key": media_key, "detections": detections})
+
+@router.get("/vior-index/counts")
+async def detection_counts(
+    group_by: str = Query("object"),
+    filters: dict = Depends(index_filters),
+    limit: int = Query(QUERY_LIMIT, ge=1, le=MAX_QUERY_LIMIT)
+):
+    """
+    Aggregate indexed detections by object, position, kind or media
+    """
+    try:
+        counts = await run_in_threadpool(lambda: detection_index.counts(group_by, limit=limit, **filters))
+    except ValueError as e:
+        return JSONResponse(
+            status_code=400,
+            content={"error": str(e)}
+        )
+    return JSONResponse(content={"group_by": group_by, "counts": counts})
+
 @router.post("/vior-image")
-async def process_image(file: UploadFile = File(...)):
+async def process_image(
+    request: Request,
+    file: UploadFile = File(...),
+    params: dict = Depends(inference_params),
+    tiled: bool = Form(False),
+    frame_cache: bool = Form(False)
+):
     """
-    Process an uploaded image and return detected objects with positions
+    Process an uploaded image and return detected objects with positions.
+    Optional form fields classes, conf, iou, max_det and imgsz are passed to the model;
+    tiled=true detects on overlapping tiles, for large aerial / panorama images with small objects;
+    frame_cache=true reuses the detections of a near-identical image seen before.
+    The response is JSON unless the Accept header asks for MessagePack or the columnar encoding.
     """
     try:
+        options = _parse_options(params)
+
         # Validate file type
         if file.content_type not in ALLOWED_IMAGE_TYPES:
             raise HTTPException(
@@ -28,38 +253,59 @@ async def process_image(file: UploadFile = File(...)):
                 detail="Invalid file type. Supported formats: JPG, JPEG, PNG, WebP"
             )
 
-        # Read file content and reset pointer for potential reuse
-        contents = await file.read()
-        await file.seek(0)
-        
-        # Validate file size
-        if len(contents) > MAX_FILE_SIZE:
+        # Reject early when the client declared an oversized body
+        if file.size is not None and file.size > MAX_FILE_SIZE:
             raise HTTPException(
                 status_code=400,
                 detail="File size too large. Maximum size is 50MB"
             )
 
-        # Convert to image
-        nparr = np.frombuffer(contents, np.uint8)
-        image = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
-        
-        if image is None:
-            raise HTTPException(
-                status_code=400,
-                detail="Could not decode image file"
+        async with image_admission.admit():
+            # Read the spooled upload into a pooled buffer and decode straight from it
+            digest = hashlib.sha256()  # Content hash is the image's key in the detection index
+            try:
+                image = await run_in_threadpool(read_image_upload, upload_buffers, file.file, MAX_FILE_SIZE, digest)
+            except UploadTooLarge:
+                raise HTTPException(
+                    status_code=400,
+                    detail="File size too large. Maximum size is 50MB"
+                )
+            
+            if image is None:
+                raise HTTPException(
+                    status_code=400,
+                    detail="Could not decode image file"
+                )
+            
+            # Process the image; tiled runs stop between tile batches if the client leaves or the deadline passes
+            cancel_event = threading.Event()
+            results, inference = await image_admission.run(
+                request,
+                lambda: adaptive_detector.get_object_positions(
+                    image, options, tiled, frame_cache, cancel_event=cancel_event
+                ),
+                IMAGE_DEADLINE,
+                cancel_event
             )
         
-        # Process the image
-        results = detector.get_object_positions(image)
+        if _indexable(options, inference):
+            await run_in_threadpool(
+                detection_index.add, digest.hexdigest(), file.filename, "image",
+                flatten_detections(results), inference["model"]
+            )
         
-        return JSONResponse(
+        return NegotiatedResponse(
             content={
                 "status": "success",
                 "filename": file.filename,
-                "detections": results
-            }
+                "detections": results,
+                "inference": inference
+            },
+            encoding=negotiate(request.headers.get("accept"))
         )
     
+    except (Overloaded, DeadlineExceeded, ClientDisconnected) as e:
+        return _admission_error(e)
     except HTTPException as he:
         return JSONResponse(
             status_code=he.status_code,
@@ -73,12 +319,24 @@ async def process_image(file: UploadFile = File(...)):
         )
 
 @router.post("/vior-video")
-async def process_video_file(file: UploadFile = File(...)):
+async def process_video_file(
+    request: Request,
+    file: UploadFile = File(...),
+    params: dict = Depends(inference_params),
+    timeline: bool = Form(False),
+    frame_cache: bool = Form(False)
+):
     """
-    Process an uploaded video and return tracked objects with positions
+    Process an uploaded video and return tracked objects with positions.
+    Optional form fields classes, conf, iou, max_det and imgsz are passed to the model;
+    timeline=true adds per-track first/last seen and dwell times plus per-second class counts;
+    frame_cache=true lets frames reuse detections of near-identical frames from other videos.
+    The response is JSON unless the Accept header asks for MessagePack or the columnar encoding.
     """
     temp_file = None
     try:
+        options = _parse_options(params)
+
         # Validate file type
         if file.content_type not in ALLOWED_VIDEO_TYPES:
             raise HTTPException(
@@ -86,41 +344,70 @@ async def process_video_file(file: UploadFile = File(...)):
                 detail="Invalid file type. Supported formats: MP4, AVI, MOV, MKV"
             )
 
-        # Create temp file
-        suffix = os.path.splitext(file.filename)[1]
-        with tempfile.NamedTemporaryFile(delete=False, suffix=suffix) as temp:
-            temp_file = temp.name
-            
-            # Read and write in chunks to handle large files
-            chunk_size = 1024 * 1024  # 1MB chunks
-            file_size = 0
+        async with video_admission.admit():
+            # Create temp file
+            suffix = os.path.splitext(file.filename)[1]
+            with tempfile.NamedTemporaryFile(delete=False, suffix=suffix) as temp:
+                temp_file = temp.name
+                
+                # Read and write in chunks to handle large files
+                chunk_size = 1024 * 1024  # 1MB chunks
+                file_size = 0
+                digest = hashlib.sha256()  # Content hash keys the checkpoints
+                
+                while True:
+                    chunk = await file.read(chunk_size)
+                    if not chunk:
+                        break
+                    file_size += len(chunk)
+                    if file_size > MAX_FILE_SIZE:
+                        raise HTTPException(
+                            status_code=400,
+                            detail="File size too large. Maximum size is 50MB"
+                        )
+                    temp.write(chunk)
+                    digest.update(chunk)
+
+                # Ensure all data is written
+                temp.flush()
             
-            while True:
-                chunk = await file.read(chunk_size)
-                if not chunk:
-                    break
-                file_size += len(chunk)
-                if file_size > MAX_FILE_SIZE:
-                    raise HTTPException(
-                        status_code=400,
-                        detail="File size too large. Maximum size is 50MB"
-                    )
-                temp.write(chunk)
-
-            # Ensure all data is written
-            temp.flush()
+            # Process the video; cancelled if the client leaves or the deadline passes
+            cancel_event = threading.Event()
+            # Always recorded: the index stores first/last seen times even if the client did not ask for them
+            video_timeline = DetectionTimeline()
+            results, inference = await video_admission.run(
+                request,
+                lambda: adaptive_detector.process_video(
+                    temp_file, cancel_event=cancel_event, options=options, timeline=video_timeline,
+                    checkpoints=video_checkpoints, content_hash=digest.hexdigest(), use_cache=frame_cache
+                ),
+                VIDEO_DEADLINE,
+                cancel_event
+            )
         
-        # Process the video
-        results = detector.process_video(temp_file)
+        tracks = video_timeline.track_summary()
+        if _indexable(options, inference):
+            times = {track["object_id"]: (track["first_seen"], track["last_seen"]) for track in tracks}
+            await run_in_threadpool(
+                detection_index.add, digest.hexdigest(), file.filename, "video",
+                flatten_detections(results, times), inference["model"]
+            )
         
-        return JSONResponse(
-            content={
-                "status": "success",
-                "filename": file.filename,
-                "detections": results
+        content = {
+            "status": "success",
+            "filename": file.filename,
+            "detections": results,
+            "inference": inference
+        }
+        if timeline:
+            content["timeline"] = {
+                "tracks": tracks,
+                "class_counts_per_second": video_timeline.class_counts_over_time(1.0)
             }
-        )
+        return NegotiatedResponse(content=content, encoding=negotiate(request.headers.get("accept")))
     
+    except (Overloaded, DeadlineExceeded, ClientDisconnected) as e:
+        return _admission_error(e)
     except HTTPException as he:
         return JSONResponse(
             status_code=he.status_code,
@@ -139,4 +426,245 @@ async def process_video_file(file: UploadFile = File(...)):
             try:
                 os.unlink(temp_file)
             except Exception as e:
-                print(f"Error cleaning up temp file: {str(e)}")  # Add logging for cleanup errors
\ No newline at end of file
+                print(f"Error cleaning up temp file: {str(e)}")  # Add logging for cleanup errors
+
+def _is_archive(file: UploadFile):
+    """Check whether an upload is a ZIP/TAR archive rather than an image"""
+    name = (file.filename or '').lower()
+    return file.content_type in ALLOWED_ARCHIVE_TYPES or name.endswith(ARCHIVE_EXTENSIONS)
+
+def _decode_entry(entry):
+    """Decode one (name, data, error) batch entry into (name, image, error, content hash)"""
+    name, data, error = entry
+    if error:
+        return name, None, error, None
+    image = decode_image_bytes(data)
+    if image is None:
+        return name, None, "Could not decode image file", None
+    return name, image, None, hashlib.sha256(data).hexdigest()
+
+def _chunks(entries, size):
+    """Group entries into lists of up to size"""
+    batch = []
+    for entry in entries:
+        batch.append(entry)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+def _stream_batch_results(entries, options, encoding, use_cache=False):
+    """
+    Run model-sized batches through overlapping stages - read (archive extraction),
+    parallel decode, inference - and yield one encoded record per file in upload order
+    """
+    pipeline = Pipeline("batch", _chunks(entries, detector.batch_size), [
+        Stage("decode", lambda batch: list(decode_executor.map(_decode_entry, batch))),
+        Stage("inference", lambda decoded: _process_batch(decoded, options, use_cache))
+    ], source_name="read", consumer_name="respond")
+    try:
+        with pipeline:
+            for lines in pipeline:
+                for line in lines:
+                    yield encode_line(line, encoding)
+    except Exception as e:
+        print(f"Error processing batch: {str(e)}")  # Add logging
+        yield encode_line({"error": str(e)}, encoding)
+
+class BatchStream(StreamingResponse):
+    """
+    Streams the records of a blocking batch generator. The batch deadline and the client
+    are checked between records; when either trips the generator is closed, which stops
+    its pipeline. The batch slot is released and cleanup (temp files, archives) runs
+    however the response ends - including a client that leaves before the first record,
+    when Starlette never starts the body and skips background tasks.
+    """
+
+    def __init__(self, request, results, encoding, cleanup=()):
+        self.request = request
+        self.results = results
+        self.encoding = encoding
+        self.cleanup = list(cleanup)
+        self._finished = False
+        super().__init__(self._records(), media_type=stream_media_type(encoding), headers={"Vary": "Accept"})
+
+    async def _records(self):
+        started = asyncio.get_running_loop().time()
+        try:
+            while True:
+                record = await run_in_threadpool(next, self.results, None)
+                if record is None:
+                    return
+                yield record
+                await batch_admission.check(self.request, started, BATCH_DEADLINE)
+        except DeadlineExceeded:
+            yield encode_line({"error": "Processing took too long"}, self.encoding)
+        except ClientDisconnected:
+            return
+        except asyncio.CancelledError:
+            # Starlette cancels the stream when the client disconnects
+            batch_admission.cancelled += 1
+            raise
+        finally:
+            await self._finish()
+
+    def _close(self):
+        self.results.close()
+        for func in self.cleanup:
+            func()
+
+    async def _finish(self):
+        if self._finished:
+            return
+        self._finished = True
+        try:
+            # Shielded: this also runs while the stream is being cancelled
+            with anyio.CancelScope(shield=True):
+                await run_in_threadpool(self._close)
+        finally:
+            batch_admission.release()
+
+    async def __call__(self, scope, receive, send):
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            await self._finish()
+
+def _remove_file(path):
+    """Delete a temp file, logging instead of raising on failure"""
+    try:
+        if os.path.exists(path):
+            os.unlink(path)
+    except Exception as e:
+        print(f"Error cleaning up temp file: {str(e)}")  # Add logging for cleanup errors
+
+def _process_batch(decoded, options, use_cache=False):
+    """Run one decoded batch through inference; returns one result record per entry"""
+    valid = [index for index, (_, _, error, _) in enumerate(decoded) if error is None]
+    detections, inference = adaptive_detector.get_object_positions_batch([decoded[i][1] for i in valid], options, use_cache)
+    results = dict(zip(valid, detections))
+    if _indexable(options, inference):
+        detection_index.add_many([
+            (decoded[i][3], decoded[i][0], "image", flatten_detections(results[i]), inference["model"])
+            for i in valid
+        ])
+    
+    lines = []
+    for index, (name, _, error, _) in enumerate(decoded):
+        if error:
+            line = {"filename": name, "error": error}
+        else:
+            line = {"filename": name, "status": "success", "detections": results[index], "inference": inference}
+        lines.append(line)
+    return lines
+
+@router.post("/vior-images")
+async def process_images(
+    request: Request,
+    files: List[UploadFile] = File(...),
+    params: dict = Depends(inference_params),
+    frame_cache: bool = Form(False)
+):
+    """
+    Process many uploaded images (or one ZIP/TAR archive of images) and stream
+    back detections per file as newline-delimited JSON (or a sequence of
+    MessagePack objects when the Accept header asks for it). A stream that runs past
+    BATCH_DEADLINE ends with an error record; one whose client leaves is stopped.
+    frame_cache=true reuses the detections of near-identical images seen before.
+    """
+    temp_file = None
+    admitted = False
+    try:
+        options = _parse_options(params)
+        encoding = negotiate(request.headers.get("accept"))
+
+        if len(files) > MAX_BATCH_FILES:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Too many files. Maximum is {MAX_BATCH_FILES} per request"
+            )
+
+        # The slot is held until the stream ends, then released by BatchStream
+        await batch_admission.acquire()
+        admitted = True
+
+        if len(files) == 1 and _is_archive(files[0]):
+            archive = files[0]
+            
+            # Spool the archive to our own temp file; the upload is closed once we return
+            suffix = ''.join(os.path.splitext(archive.filename or '')[1:]) or '.archive'
+            with tempfile.NamedTemporaryFile(delete=False, suffix=suffix) as temp:
+                temp_file = temp.name
+                file_size = 0
+                while True:
+                    chunk = await archive.read(1024 * 1024)
+                    if not chunk:
+                        break
+                    file_size += len(chunk)
+                    if file_size > MAX_BATCH_SIZE:
+                        raise HTTPException(
+                            status_code=400,
+                            detail="Archive too large. Maximum size is 500MB"
+                        )
+                    temp.write(chunk)
+            
+            # Open and list the archive now, so a corrupt one is a 400 rather than an error line
+            try:
+                image_archive = await run_in_threadpool(ImageArchive, temp_file, MAX_BATCH_FILES)
+            except InvalidArchive as e:
+                raise HTTPException(status_code=400, detail=str(e))
+            entries = image_archive.images(ALLOWED_IMAGE_TYPES, MAX_FILE_SIZE)
+            response = BatchStream(
+                request, _stream_batch_results(entries, options, encoding, frame_cache), encoding,
+                cleanup=[image_archive.close, lambda path=temp_file: _remove_file(path)]
+            )
+            temp_file = None  # Ownership moves to the response stream
+            admitted = False
+            return response
+
+        # Plain multi-file upload: validate each file and keep its encoded bytes
+        entries = []
+        total_size = 0
+        for file in files:
+            if file.content_type not in ALLOWED_IMAGE_TYPES:
+                entries.append((file.filename, None, "Invalid file type. Supported formats: JPG, JPEG, PNG, WebP"))
+                continue
+            if file.size is not None and file.size > MAX_FILE_SIZE:
+                entries.append((file.filename, None, "File size too large. Maximum size is 50MB"))
+                continue
+            contents = await file.read()
+            if len(contents) > MAX_FILE_SIZE:
+                entries.append((file.filename, None, "File size too large. Maximum size is 50MB"))
+                continue
+            total_size += len(contents)
+            if total_size > MAX_BATCH_SIZE:
+                raise HTTPException(
+                    status_code=400,
+                    detail="Batch too large. Maximum size is 500MB"
+                )
+            entries.append((file.filename, contents, None))
+        
+        admitted = False
+        return BatchStream(request, _stream_batch_results(entries, options, encoding, frame_cache), encoding)
+    
+    except Overloaded as e:
+        return _admission_error(e)
+    except HTTPException as he:
+        return JSONResponse(
+            status_code=he.status_code,
+            content={"error": he.detail}
+        )
+    except Exception as e:
+        print(f"Error processing images: {str(e)}")  # Add logging
+        return JSONResponse(
+            status_code=500,
+            content={"error": str(e)}
+        )
+    
+    finally:
+        # Release the slot and clean up if we failed before handing off to the stream
+        if admitted:
+            batch_admission.release()
+        if temp_file:
+            _remove_file(temp_file)
@@ -1,3 +1,76 @@
+// Upload preparation: images are downscaled in the browser to the size the model
+// actually uses, so mobile users do not upload (and the server does not decode) full-size photos
+const DEFAULT_UPLOAD_CONFIG = { target_size: 640, format: 'image/jpeg', quality: 0.9 };
+let uploadConfigPromise = null;
+
+function getUploadConfig() {
+    if (!uploadConfigPromise) {
+        uploadConfigPromise = fetch('/vior-config')
+            .then(response => response.ok ? response.json() : null)
+            .then(config => ({ ...DEFAULT_UPLOAD_CONFIG, ...(config && config.image) }))
+            .catch(() => DEFAULT_UPLOAD_CONFIG);
+    }
+    return uploadConfigPromise;
+}
+
+// Fetch early so the first upload does not wait on it
+getUploadConfig();
+
+async function encodeBitmap(bitmap, width, height, format, quality) {
+    // OffscreenCanvas keeps the encode off the DOM; fall back to a regular canvas
+    const canvas = typeof OffscreenCanvas !== 'undefined'
+        ? new OffscreenCanvas(width, height)
+        : Object.assign(document.createElement('canvas'), { width, height });
+    const ctx = canvas.getContext('2d');
+
+    // JPEG has no alpha: paint transparent PNG/WebP areas white instead of black
+    ctx.fillStyle = '#fff';
+    ctx.fillRect(0, 0, width, height);
+    ctx.drawImage(bitmap, 0, 0, width, height);
+
+    if (canvas.convertToBlob) {
+        return canvas.convertToBlob({ type: format, quality });
+    }
+    return new Promise(resolve => canvas.toBlob(resolve, format, quality));
+}
+
+async function prepareImageUpload(file) {
+    if (typeof createImageBitmap === 'undefined') return file;
+
+    try {
+        const config = await getUploadConfig();
+        // EXIF orientation is applied here, matching what the server's decoder does
+        const source = await createImageBitmap(file, { imageOrientation: 'from-image' });
+        const scale = Math.min(1, config.target_size / Math.max(source.width, source.height));
+        const width = Math.max(1, Math.round(source.width * scale));
+        const height = Math.max(1, Math.round(source.height * scale));
+
+        // Small images only get re-encoded when that actually saves bytes
+        let bitmap = source;
+        if (scale < 1) {
+            // Proportional resize keeps relative object positions unchanged
+            bitmap = await createImageBitmap(source, {
+                resizeWidth: width,
+                resizeHeight: height,
+                resizeQuality: 'high'
+            });
+            source.close();
+        }
+
+        const blob = await encodeBitmap(bitmap, width, height, config.format, config.quality);
+        bitmap.close();
+        if (!blob || blob.size >= file.size) return file;
+
+        const extension = config.format === 'image/webp' ? 'webp' : 'jpg';
+        const name = file.name.replace(/\.[^.]+$/, '') + '.' + extension;
+        return new File([blob], name, { type: config.format });
+    } catch (error) {
+        // Anything the browser cannot decode still goes up untouched for the server to judge
+        console.warn('Image downscaling skipped:', error);
+        return file;
+    }
+}
+
 async function processFile() {
     if (!state.currentFile || state.isProcessing) return;
 
@@ -32,8 +105,12 @@ async function processFile() {
     }
 
     try {
+        const upload = state.currentTab === 'image'
+            ? await prepareImageUpload(state.currentFile)
+            : state.currentFile;
+
         const formData = new FormData();
-        formData.append('file', state.currentFile);
+        formData.append('file', upload);
 
         const response = await fetch(`/vior-${state.currentTab}`, {
             method: 'POST',
@@ -0,0 +1,100 @@
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pytest
+
+# Tests import the app's packages (core, routes) from the repository root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Keep the detection index and checkpoints out of the working tree
+_state_dir = tempfile.mkdtemp(prefix="vior-tests-")
+os.environ.setdefault("VIOR_INDEX_PATH", os.path.join(_state_dir, "detections.db"))
+os.environ.setdefault("VIOR_CHECKPOINT_DIR", os.path.join(_state_dir, "checkpoints"))
+
+
+class FakeBox:
+    def __init__(self, x1, y1, x2, y2, cls, conf):
+        self.xyxy = np.array([[x1, y1, x2, y2]], dtype=np.float32)
+        self.cls = np.array([cls])
+        self.conf = np.array([conf])
+
+
+class FakeResult:
+    def __init__(self, boxes):
+        self.boxes = boxes
+
+
+class FakeYOLO:
+    """
+    Stand-in for ultralytics.YOLO that returns fixed boxes. Like the real predictor
+    it keeps predict kwargs between calls and resets only conf, so a caller that
+    does not pass every option inherits the previous request's settings.
+    """
+
+    names = {0: "person", 1: "bicycle", 2: "car"}
+    boxes = [(10, 10, 60, 120, 0, 0.9), (300, 380, 420, 470, 1, 0.6), (500, 20, 620, 90, 2, 0.3)]
+    delay = 0.0
+    calls = []
+
+    def __init__(self, model_path="yolov8l.pt"):
+        self.model_path = model_path
+        self.args = {"classes": None, "iou": 0.7, "max_det": 300, "imgsz": 640}
+
+    def __call__(self, source, **kwargs):
+        FakeYOLO.calls.append(kwargs)
+        self.args.update({key: value for key, value in kwargs.items() if key != "conf"})
+        conf = kwargs.get("conf", 0.25)
+        if FakeYOLO.delay:
+            time.sleep(FakeYOLO.delay)
+
+        if isinstance(source, list):
+            count = len(source)
+        else:
+            count = source.shape[0] if getattr(source, "ndim", 0) == 4 else 1
+        boxes = [
+            box for box in FakeYOLO.boxes
+            if box[5] >= conf and (self.args["classes"] is None or box[4] in self.args["classes"])
+        ][:self.args["max_det"]]
+        return [FakeResult([FakeBox(*box) for box in boxes]) for _ in range(count)]
+
+
+@pytest.fixture
+def fake_yolo(monkeypatch):
+    """Patch the model class used by ObjectDetector; returns it for tuning boxes / delay"""
+    import core.detection
+    monkeypatch.setattr(core.detection, "YOLO", FakeYOLO)
+    monkeypatch.setattr(FakeYOLO, "calls", [])
+    monkeypatch.setattr(FakeYOLO, "delay", 0.0)
+    return FakeYOLO
+
+
+@pytest.fixture
+def routes(fake_yolo):
+    """The detection routes module, imported with the fake model"""
+    import routes.detection_routes as routes
+    return routes
+
+
+@pytest.fixture
+def client(routes):
+    from fastapi import FastAPI
+    from fastapi.testclient import TestClient
+
+    app = FastAPI()
+    app.include_router(routes.router)
+    with TestClient(app) as client:
+        yield client
+
+
+def random_jpeg(height=480, width=640):
+    import cv2
+    ok, encoded = cv2.imencode(".jpg", np.random.randint(0, 255, (height, width, 3), np.uint8))
+    return encoded.tobytes()
+
+
+@pytest.fixture
+def jpeg():
+    return random_jpeg()
@@ -0,0 +1,61 @@
+import time
+
+import numpy as np
+import pytest
+
+from core.adaptive import AdaptiveDetector
+
+LEVELS = [
+    {"model": "models/large.pt", "imgsz": 640, "sample_rate": 30},
+    {"model": "models/small.pt", "imgsz": 320, "sample_rate": 60},
+]
+
+
+@pytest.fixture
+def adaptive(fake_yolo):
+    depth = {"value": 0}
+    detector = AdaptiveDetector(levels=LEVELS, queue_depth=lambda: depth["value"], min_dwell=0, warmup=3)
+    detector.depth = depth
+    return detector
+
+
+def test_ladder_is_loaded_up_front(adaptive):
+    assert set(adaptive._detectors) == {"models/large.pt", "models/small.pt"}
+
+
+def test_latency_needs_warmup_before_it_counts(adaptive):
+    adaptive.record_latency(5.0)
+    adaptive.record_latency(5.0)
+    assert adaptive.current_level() == 0
+    adaptive.record_latency(5.0)
+    assert adaptive.current_level() == 1
+
+
+def test_reset_latency_does_not_step_back_up(adaptive):
+    adaptive.depth["value"] = 10
+    assert adaptive.current_level() == 1
+    adaptive.depth["value"] = 0
+    # No samples yet at the new level: an empty queue alone is not enough
+    assert adaptive.current_level() == 1
+    for _ in range(3):
+        adaptive.record_latency(0.1, level=1)
+    assert adaptive.current_level() == 0
+
+
+def test_samples_from_another_level_are_ignored(adaptive):
+    adaptive.record_latency(5.0, frames=10, level=1)
+    assert adaptive.latency is None
+
+
+def test_tiled_latency_counts_the_whole_frame_pass(adaptive, fake_yolo, monkeypatch):
+    recorded = []
+    monkeypatch.setattr(adaptive, "record_latency", lambda seconds, frames=1, level=None: recorded.append(seconds))
+    monkeypatch.setattr(fake_yolo, "delay", 0.1)
+    frame = np.zeros((1280, 1280, 3), np.uint8)
+
+    started = time.monotonic()
+    _, info = adaptive.get_object_positions(frame, tiled=True)
+    elapsed = time.monotonic() - started
+    # 9 tiles plus the whole frame
+    assert info["tiles"] == 9
+    assert recorded[0] == pytest.approx(elapsed / 10, rel=0.1)
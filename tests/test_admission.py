@@ -0,0 +1,127 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from conftest import random_jpeg
+from core.admission import AdmissionController, DeadlineExceeded, Overloaded
+
+
+class ConnectedRequest:
+    async def is_disconnected(self):
+        return False
+
+
+def test_acquire_sheds_when_queue_is_full():
+    async def scenario():
+        controller = AdmissionController("test", max_concurrent=1, max_queue=0, queue_timeout=1)
+        await controller.acquire()
+        with pytest.raises(Overloaded) as info:
+            await controller.acquire()
+        assert info.value.retry_after == 1
+        assert controller.stats()["shed"] == 1
+
+    asyncio.run(scenario())
+
+
+def test_run_enforces_deadline_and_keeps_slot_until_worker_finishes():
+    finished = threading.Event()
+
+    def slow():
+        time.sleep(1.0)
+        finished.set()
+
+    async def scenario():
+        controller = AdmissionController("test", max_concurrent=1, max_queue=0)
+        started = time.monotonic()
+        with pytest.raises(DeadlineExceeded):
+            async with controller.admit():
+                await controller.run(ConnectedRequest(), slow, deadline=0.2)
+        assert time.monotonic() - started < 0.6
+        assert not finished.is_set()
+        # The worker still runs, so its slot is still taken
+        assert controller.in_flight == 1
+        with pytest.raises(Overloaded):
+            await controller.acquire()
+
+        while controller.in_flight:
+            await asyncio.sleep(0.05)
+        assert finished.is_set()
+        assert controller.stats()["timed_out"] == 1
+
+    asyncio.run(scenario())
+
+
+def test_image_route_returns_429_with_retry_after(routes, client, jpeg, monkeypatch):
+    controller = AdmissionController("vior-image", max_concurrent=1, max_queue=0, queue_timeout=3)
+    monkeypatch.setattr(routes, "image_admission", controller)
+    client.portal.call(controller.acquire)
+
+    response = client.post("/vior-image", files={"file": ("a.jpg", jpeg, "image/jpeg")})
+    assert response.status_code == 429
+    assert response.headers["retry-after"] == "3"
+
+
+def test_image_route_returns_504_at_the_deadline(routes, client, fake_yolo, jpeg, monkeypatch):
+    controller = AdmissionController("vior-image", max_concurrent=1, max_queue=0)
+    monkeypatch.setattr(routes, "image_admission", controller)
+    monkeypatch.setattr(routes, "IMAGE_DEADLINE", 0.2)
+    fake_yolo.delay = 1.0
+
+    started = time.monotonic()
+    response = client.post("/vior-image", files={"file": ("a.jpg", jpeg, "image/jpeg")})
+    assert response.status_code == 504
+    assert time.monotonic() - started < 0.9
+
+    deadline = time.monotonic() + 5
+    while controller.in_flight and time.monotonic() < deadline:
+        time.sleep(0.05)
+    assert controller.in_flight == 0
+
+
+def test_tiled_image_stops_at_the_deadline(routes, client, fake_yolo, monkeypatch):
+    controller = AdmissionController("vior-image", max_concurrent=1, max_queue=0)
+    monkeypatch.setattr(routes, "image_admission", controller)
+    monkeypatch.setattr(routes, "IMAGE_DEADLINE", 0.3)
+    monkeypatch.setattr(routes.detector, "batch_size", 1)
+    fake_yolo.delay = 0.2
+
+    started = time.monotonic()
+    response = client.post(
+        "/vior-image", files={"file": ("a.jpg", random_jpeg(1280, 1280), "image/jpeg")}, data={"tiled": "true"}
+    )
+    assert response.status_code == 504
+
+    # Nine tiles and the whole-frame pass would hold the slot for 2s
+    while controller.in_flight and time.monotonic() - started < 5:
+        time.sleep(0.02)
+    assert controller.in_flight == 0
+    assert time.monotonic() - started < 1.2
+    assert len(fake_yolo.calls) < 5
+
+
+def test_batch_route_releases_slot_after_stream(routes, client, jpeg, monkeypatch):
+    controller = AdmissionController("vior-images", max_concurrent=1, max_queue=0)
+    monkeypatch.setattr(routes, "batch_admission", controller)
+
+    files = [("files", (f"{i}.jpg", jpeg, "image/jpeg")) for i in range(3)]
+    response = client.post("/vior-images", files=files)
+    assert response.status_code == 200
+    assert len(response.text.splitlines()) == 3
+    assert controller.in_flight == 0
+
+
+def test_batch_route_stops_at_the_deadline(routes, client, fake_yolo, monkeypatch):
+    controller = AdmissionController("vior-images", max_concurrent=1, max_queue=0)
+    monkeypatch.setattr(routes, "batch_admission", controller)
+    monkeypatch.setattr(routes, "BATCH_DEADLINE", 0.3)
+    monkeypatch.setattr(routes.detector, "batch_size", 1)
+    fake_yolo.delay = 0.2
+
+    files = [("files", (f"{i}.jpg", random_jpeg(), "image/jpeg")) for i in range(10)]
+    lines = client.post("/vior-images", files=files).text.splitlines()
+    assert len(lines) < 10
+    assert "took too long" in lines[-1]
+    assert controller.in_flight == 0
+    assert controller.stats()["timed_out"] == 1
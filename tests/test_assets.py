@@ -0,0 +1,150 @@
+import gzip
+import os
+
+import pytest
+
+from core.assets import IMMUTABLE_CACHE, REVALIDATE_CACHE, AssetFiles
+
+CSS = b"body { color: #333; }\n" * 100  # Large enough to be compressed
+VIDEO = bytes(range(256)) * 40
+
+
+@pytest.fixture
+def assets(tmp_path):
+    (tmp_path / "css").mkdir()
+    (tmp_path / "css" / "style.css").write_bytes(CSS)
+    (tmp_path / "demo.mp4").write_bytes(VIDEO)
+    (tmp_path.parent / "secret.txt").write_bytes(b"not public")
+    return AssetFiles(str(tmp_path), prefix="/static")
+
+
+@pytest.fixture
+def static(assets):
+    from fastapi import FastAPI
+    from fastapi.testclient import TestClient
+
+    app = FastAPI()
+    app.mount("/static", assets, name="static")
+    with TestClient(app) as client:
+        yield client
+
+
+def get(client, path, **headers):
+    # The test client would otherwise ask for (and transparently decode) compressed bodies
+    headers.setdefault("Accept-Encoding", "identity")
+    return client.get(path, headers=headers)
+
+
+def test_text_asset_picks_the_best_accepted_encoding(static):
+    pytest.importorskip("brotli")
+    br = static.get("/static/css/style.css", headers={"Accept-Encoding": "gzip, br"})
+    assert br.headers["content-encoding"] == "br"
+    assert br.headers["vary"] == "Accept-Encoding"
+
+    gzipped = static.get("/static/css/style.css", headers={"Accept-Encoding": "gzip, br;q=0"})
+    assert gzipped.headers["content-encoding"] == "gzip"
+    assert gzipped.headers["etag"] != br.headers["etag"]
+
+    plain = get(static, "/static/css/style.css")
+    assert "content-encoding" not in plain.headers
+    assert plain.content == CSS
+    assert plain.headers["content-type"] == "text/css; charset=utf-8"
+
+
+def test_compressed_bodies_decode_to_the_file(assets):
+    asset = assets._lookup("css/style.css")
+    response = assets._response(asset, False, {"accept-encoding": "gzip"}, head=False)
+    assert response.headers["content-encoding"] == "gzip"
+    assert gzip.decompress(response.body) == CSS
+
+    brotli = pytest.importorskip("brotli")
+    response = assets._response(asset, False, {"accept-encoding": "br"}, head=False)
+    assert brotli.decompress(response.body) == CSS
+
+
+def test_matching_etag_gets_304(static):
+    first = get(static, "/static/css/style.css")
+    again = get(static, "/static/css/style.css", **{"If-None-Match": first.headers["etag"]})
+    assert again.status_code == 304
+    assert again.content == b""
+    assert again.headers["etag"] == first.headers["etag"]
+
+    changed = get(static, "/static/css/style.css", **{"If-None-Match": '"something-else"'})
+    assert changed.status_code == 200
+
+
+def test_range_requests(static):
+    partial = get(static, "/static/demo.mp4", Range="bytes=100-199")
+    assert partial.status_code == 206
+    assert partial.content == VIDEO[100:200]
+    assert partial.headers["content-range"] == f"bytes 100-199/{len(VIDEO)}"
+
+    etag = get(static, "/static/demo.mp4").headers["etag"]
+    current = get(static, "/static/demo.mp4", Range="bytes=0-9", **{"If-Range": etag})
+    assert current.status_code == 206 and current.content == VIDEO[:10]
+    # A validator for another version of the file gets the whole file instead
+    outdated = get(static, "/static/demo.mp4", Range="bytes=0-9", **{"If-Range": '"0123456789"'})
+    assert outdated.status_code == 200 and outdated.content == VIDEO
+
+
+def test_head_has_headers_but_no_body(static):
+    response = static.head("/static/css/style.css", headers={"Accept-Encoding": "identity"})
+    assert response.status_code == 200
+    assert response.content == b""
+    assert response.headers["content-length"] == str(len(CSS))
+    assert static.post("/static/css/style.css").status_code == 405
+
+
+def call(app, path):
+    """Status of a GET sent straight to the ASGI app (HTTP clients normalize away "..")"""
+    import anyio
+
+    messages = []
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        messages.append(message)
+
+    scope = {"type": "http", "method": "GET", "path": path, "root_path": "", "headers": [], "query_string": b""}
+    anyio.run(app, scope, receive, send)
+    return messages[0]["status"]
+
+
+@pytest.mark.parametrize("path", ["/../secret.txt", "/css/../../secret.txt", "/css/../style.css"])
+def test_traversal_is_404(assets, path):
+    assert call(assets, path) == 404
+    assert call(assets, "/css/style.css") == 200
+
+
+def test_lookup_stays_inside_the_directory(assets):
+    assert assets._lookup("../secret.txt") is None
+    assert assets._lookup("css/../../secret.txt") is None
+
+
+def test_missing_file_is_404(static):
+    assert get(static, "/static/missing.css").status_code == 404
+
+
+def test_fingerprinted_urls(static, assets):
+    url = assets.url("css/style.css")
+    assert url != "/static/css/style.css" and url.endswith(".css")
+    current = get(static, url)
+    assert current.status_code == 200
+    assert current.headers["cache-control"] == IMMUTABLE_CACHE
+    assert current.content == CSS
+
+    stale = get(static, "/static/css/style.0123456789.css")
+    assert stale.status_code == 200
+    assert stale.headers["cache-control"] == REVALIDATE_CACHE
+
+    assert get(static, "/static/css/style.css").headers["cache-control"] == REVALIDATE_CACHE
+
+
+def test_edited_file_gets_a_new_fingerprint(assets, tmp_path):
+    old = assets.url("css/style.css")
+    path = tmp_path / "css" / "style.css"
+    path.write_bytes(CSS + b"a { color: red; }\n")
+    os.utime(path, (1, 1))
+    assert assets.url("css/style.css") != old
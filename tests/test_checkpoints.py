@@ -0,0 +1,66 @@
+import threading
+
+import cv2
+import numpy as np
+import pytest
+
+from core.checkpoints import CheckpointStore
+from core.detection import ObjectDetector, ProcessingCancelled
+
+FRAMES = 12
+
+
+@pytest.fixture
+def video(tmp_path):
+    path = str(tmp_path / "clip.avi")
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"MJPG"), 10, (320, 240))
+    for i in range(FRAMES):
+        writer.write(np.full((240, 320, 3), i * 20, np.uint8))
+    writer.release()
+    return path
+
+
+@pytest.fixture
+def checkpoint(tmp_path):
+    return CheckpointStore(str(tmp_path / "checkpoints")).open("clip", "test", 1)
+
+
+def failing_after(fake_yolo, monkeypatch, calls, error=None, event=None):
+    """Make the model raise (or set event) once it has answered `calls` frames"""
+    original = fake_yolo.__call__
+
+    def call(self, source, **kwargs):
+        if len(fake_yolo.calls) >= calls:
+            if event is None:
+                raise error
+            event.set()
+        return original(self, source, **kwargs)
+
+    monkeypatch.setattr(fake_yolo, "__call__", call)
+
+
+def test_error_saves_progress_before_raising(fake_yolo, monkeypatch, video, checkpoint):
+    detector = ObjectDetector("models/test.pt", batch_size=1, frame_cache=None)
+    failing_after(fake_yolo, monkeypatch, 3, RuntimeError("model crashed"))
+
+    with pytest.raises(RuntimeError):
+        detector.process_video(video, sample_rate=1, checkpoint=checkpoint)
+    assert checkpoint.load()["frame"] == 3
+
+
+def test_cancelled_run_saves_progress_and_resumes(fake_yolo, monkeypatch, video, checkpoint):
+    detector = ObjectDetector("models/test.pt", batch_size=1, frame_cache=None)
+    expected = detector.process_video(video, sample_rate=1)
+
+    cancel_event = threading.Event()
+    failing_after(fake_yolo, monkeypatch, len(fake_yolo.calls) + 2, event=cancel_event)
+    with pytest.raises(ProcessingCancelled):
+        detector.process_video(video, sample_rate=1, cancel_event=cancel_event, checkpoint=checkpoint)
+    saved = checkpoint.load()["frame"]
+    assert 0 < saved < FRAMES
+
+    monkeypatch.undo()
+    fake_yolo.calls.clear()
+    assert detector.process_video(video, sample_rate=1, checkpoint=checkpoint) == expected
+    assert checkpoint.resumed_from == saved
+    assert len(fake_yolo.calls) == FRAMES - saved
@@ -0,0 +1,30 @@
+import hashlib
+
+
+def post_image(client, jpeg, **form):
+    response = client.post("/vior-image", files={"file": ("scene.jpg", jpeg, "image/jpeg")}, data=form)
+    assert response.status_code == 200
+    return response.json()
+
+
+def indexed_objects(routes, jpeg):
+    return sorted(row["object"] for row in routes.detection_index.detections(hashlib.sha256(jpeg).hexdigest()))
+
+
+def test_default_run_is_indexed(client, routes, jpeg):
+    post_image(client, jpeg)
+    assert indexed_objects(routes, jpeg) == ["bicycle", "car", "person"]
+
+
+def test_filtered_and_tiled_runs_do_not_replace_the_entry(client, routes, jpeg):
+    post_image(client, jpeg)
+    assert set(post_image(client, jpeg, classes="person")["detections"]) == {"person"}
+    post_image(client, jpeg, conf="0.5")
+    post_image(client, jpeg, tiled="true")
+    assert indexed_objects(routes, jpeg) == ["bicycle", "car", "person"]
+
+
+def test_degraded_run_is_not_indexed(client, routes, jpeg, monkeypatch):
+    monkeypatch.setattr(routes.adaptive_detector, "level", len(routes.adaptive_detector.levels) - 1)
+    assert post_image(client, jpeg)["inference"]["quality_level"] > 0
+    assert indexed_objects(routes, jpeg) == []
@@ -0,0 +1,137 @@
+import json
+
+import msgpack
+import numpy as np
+import pytest
+
+from core import encoding
+from core.encoding import COLUMNAR, CONFIDENCE_SCALE, JSON, MSGPACK, POSITIONS, encode, encode_line, negotiate
+
+from conftest import random_jpeg
+
+CONTENT = {
+    "status": "success",
+    "filename": "street.mp4",
+    "detections": {
+        "person": [
+            {"object_id": "person_1", "position": "top-left", "confidence": 0.912},
+            {"object_id": "person_2", "position": "bottom-right", "confidence": 0.5}
+        ],
+        "car": [{"object_id": "car_1", "position": "centre", "confidence": 0.333}]
+    },
+    "timeline": {
+        "tracks": [
+            {"track_id": 1, "object_id": "person_1", "object": "person", "first_seen": 0.5,
+             "last_seen": 2.25, "dwell_time": 1.75, "sightings": 3},
+            {"track_id": 2, "object_id": "car_1", "object": "car", "first_seen": 1.0,
+             "last_seen": 1.0, "dwell_time": 0.0, "sightings": 1}
+        ],
+        "class_counts_per_second": {"person": [1, 2, 1], "car": [0, 1, 0]}
+    }
+}
+
+
+@pytest.mark.parametrize("accept, expected", [
+    (None, JSON),
+    ("*/*", JSON),
+    ("text/html,application/xhtml+xml,*/*;q=0.8", JSON),
+    ("application/msgpack", MSGPACK),
+    ("application/x-msgpack", MSGPACK),
+    ("application/json, application/msgpack;q=0.5", JSON),
+    ("application/json;q=0.1, application/msgpack", MSGPACK),
+    (COLUMNAR, COLUMNAR),
+    ("application/msgpack;q=0.9, " + COLUMNAR, COLUMNAR),
+])
+def test_negotiate(accept, expected):
+    assert negotiate(accept) == expected
+
+
+def test_negotiate_falls_back_to_json_without_msgpack(monkeypatch):
+    monkeypatch.setattr(encoding, "msgpack", None)
+    assert negotiate("application/msgpack") == JSON
+    assert negotiate(COLUMNAR) == JSON
+
+
+def test_json_and_msgpack_carry_the_same_content():
+    with_numpy = dict(CONTENT, score=np.float32(0.5), counts=np.array([1, 2]))
+    expected = dict(CONTENT, score=0.5, counts=[1, 2])
+    assert json.loads(encode(with_numpy, JSON)) == expected
+    assert msgpack.unpackb(encode(with_numpy, MSGPACK)) == expected
+
+
+def test_columnar_round_trip():
+    decoded = msgpack.unpackb(encode(CONTENT, COLUMNAR))
+    classes = decoded["classes"]
+    assert decoded["filename"] == "street.mp4"
+
+    detections = decoded["detections"]
+    assert detections["count"] == 3
+    rows = zip(
+        np.frombuffer(detections["class"], "<u2"),
+        np.frombuffer(detections["instance"], "<u4"),
+        np.frombuffer(detections["position"], "u1"),
+        np.frombuffer(detections["confidence"], "<u2")
+    )
+    rebuilt = {}
+    for cls, instance, position, confidence in rows:
+        label = classes[cls]
+        rebuilt.setdefault(label, []).append({
+            "object_id": f"{label}_{instance}",
+            "position": POSITIONS[position],
+            "confidence": confidence / CONFIDENCE_SCALE
+        })
+    assert rebuilt == CONTENT["detections"]
+
+    tracks = decoded["timeline"]["tracks"]
+    assert tracks["count"] == 2
+    assert [classes[c] for c in np.frombuffer(tracks["class"], "<u2")] == ["person", "car"]
+    assert np.frombuffer(tracks["track_id"], "<u4").tolist() == [1, 2]
+    assert np.frombuffer(tracks["instance"], "<u4").tolist() == [1, 1]
+    assert np.frombuffer(tracks["first_seen_ms"], "<u4").tolist() == [500, 1000]
+    assert np.frombuffer(tracks["last_seen_ms"], "<u4").tolist() == [2250, 1000]
+    assert np.frombuffer(tracks["sightings"], "<u4").tolist() == [3, 1]
+    counts = decoded["timeline"]["class_counts_per_second"]
+    assert {label: np.frombuffer(column, "<u4").tolist() for label, column in counts.items()} == \
+        CONTENT["timeline"]["class_counts_per_second"]
+
+
+def test_stream_records_are_self_delimiting():
+    records = [{"filename": "a.jpg", "error": "Could not decode image file"}, CONTENT]
+    lines = b"".join(encode_line(record, JSON) for record in records).splitlines()
+    assert [json.loads(line) for line in lines] == records
+    unpacker = msgpack.Unpacker()
+    unpacker.feed(b"".join(encode_line(record, MSGPACK) for record in records))
+    assert list(unpacker) == records
+
+
+def post_image(client, jpeg, accept):
+    return client.post("/vior-image", files={"file": ("a.jpg", jpeg, "image/jpeg")}, headers={"Accept": accept})
+
+
+def test_image_route_negotiates(client, jpeg):
+    as_json = post_image(client, jpeg, "application/json")
+    assert as_json.headers["content-type"] == JSON
+    assert as_json.headers["vary"] == "Accept"
+
+    as_msgpack = post_image(client, jpeg, MSGPACK)
+    assert as_msgpack.headers["content-type"] == MSGPACK
+    assert msgpack.unpackb(as_msgpack.content)["detections"] == as_json.json()["detections"]
+
+    columnar = msgpack.unpackb(post_image(client, jpeg, COLUMNAR).content)
+    assert columnar["detections"]["count"] == 3
+    assert sorted(columnar["classes"]) == sorted(as_json.json()["detections"])
+
+
+def test_batch_route_streams_msgpack(client):
+    files = [("files", (f"{i}.jpg", random_jpeg(), "image/jpeg")) for i in range(3)]
+    files.append(("files", ("notes.txt", b"text", "text/plain")))
+    response = client.post("/vior-images", files=files, headers={"Accept": MSGPACK})
+    assert response.status_code == 200
+    assert response.headers["content-type"] == MSGPACK
+
+    unpacker = msgpack.Unpacker()
+    unpacker.feed(response.content)
+    records = list(unpacker)
+    assert [record["filename"] for record in records] == ["0.jpg", "1.jpg", "2.jpg", "notes.txt"]
+    assert all(record["status"] == "success" for record in records[:3])
+    assert "error" in records[3]
@@ -0,0 +1,109 @@
+import csv
+
+import pytest
+from openpyxl import load_workbook
+
+from core.export import IMAGE_COLUMNS, TABLE_COLUMNS, VIDEO_COLUMNS, DetectionWriter, write_excel
+
+
+def video_rows(count=10):
+    """Tracks of a video; the first ones are still open, so their times are unknown"""
+    return [
+        {
+            'object_id': f'person_{i}',
+            'object': 'person' if i % 3 else 'car',
+            'position': 'centre',
+            'confidence': round(0.5 + i / 100, 3),
+            'start_time': None if i < 4 else i * 0.5,
+            'end_time': None if i < 4 else i * 0.5 + 1.25
+        }
+        for i in range(count)
+    ]
+
+
+def write(path, rows, columns, **kwargs):
+    with DetectionWriter(str(path), columns, chunk_size=3, **kwargs) as writer:
+        writer.write(iter(rows))
+    return writer
+
+
+def test_csv_round_trip(tmp_path):
+    rows = video_rows()
+    path = tmp_path / 'video.csv'
+    assert write(path, rows, VIDEO_COLUMNS).rows_written == len(rows)
+
+    with open(path, newline='', encoding='utf-8') as f:
+        read = list(csv.DictReader(f))
+    assert list(read[0]) == VIDEO_COLUMNS
+    assert [row['object_id'] for row in read] == [row['object_id'] for row in rows]
+    assert read[0]['start_time'] == '' and float(read[-1]['end_time']) == rows[-1]['end_time']
+
+
+def test_parquet_round_trip_with_empty_leading_chunks(tmp_path):
+    pq = pytest.importorskip('pyarrow.parquet')
+    rows = video_rows()
+    path = tmp_path / 'video.parquet'
+    assert write(path, rows, VIDEO_COLUMNS).rows_written == len(rows)
+
+    table = pq.read_table(str(path))
+    assert table.column_names == VIDEO_COLUMNS
+    assert str(table.schema.field('start_time').type) == 'double'
+    assert table.to_pylist() == rows
+
+
+def test_parquet_needs_a_type_for_every_column(tmp_path):
+    pytest.importorskip('pyarrow')
+    with pytest.raises(ValueError):
+        DetectionWriter(str(tmp_path / 'x.parquet'), ['object', 'colour'])
+    writer = write(tmp_path / 'x.parquet', [{'object': 'car', 'colour': 'red'}], ['object', 'colour'],
+                   types={'colour': 'string'})
+    assert writer.rows_written == 1
+
+
+def test_empty_parquet_keeps_the_schema(tmp_path):
+    pq = pytest.importorskip('pyarrow.parquet')
+    path = tmp_path / 'empty.parquet'
+    write(path, [], IMAGE_COLUMNS)
+    table = pq.read_table(str(path))
+    assert table.num_rows == 0 and table.column_names == IMAGE_COLUMNS
+
+
+def sheet_values(path):
+    return [[cell.value for cell in row] for row in load_workbook(path).active.iter_rows()]
+
+
+def test_excel_groups_images_and_objects(tmp_path):
+    rows = [
+        {'image_name': 'b.jpg', 'object_id': 'person_2', 'object': 'person', 'position': 'top', 'confidence': 0.7},
+        {'image_name': 'a.jpg', 'object_id': 'car_1', 'object': 'car', 'position': 'centre', 'confidence': 0.9},
+        {'image_name': 'b.jpg', 'object_id': 'person_1', 'object': 'person', 'position': 'bottom', 'confidence': 0.8},
+    ]
+    path = str(tmp_path / 'images.xlsx')
+    write_excel(iter(rows), path)
+
+    values = [row for row in sheet_values(path) if any(value is not None for value in row)]
+    assert [row[:3] for row in values] == [
+        ['Image: a.jpg', None, None],
+        ['Object Type: car', None, None],
+        TABLE_COLUMNS,
+        ['car_1', 'centre', 0.9],
+        ['Image: b.jpg', None, None],
+        ['Object Type: person', None, None],
+        TABLE_COLUMNS,
+        ['person_1', 'bottom', 0.8],
+        ['person_2', 'top', 0.7],
+    ]
+
+
+def test_excel_video_report(tmp_path):
+    rows = video_rows(300)
+    path = str(tmp_path / 'video.xlsx')
+    write_excel(iter(rows), path, video_mode=True)
+
+    values = sheet_values(path)
+    headers = [row[0] for row in values if row and str(row[0]).startswith('Object Type:')]
+    assert headers == ['Object Type: car', 'Object Type: person']
+    instances = [row for row in values if row and str(row[0]).startswith(('car_', 'person_'))]
+    assert len(instances) == len(rows)
+    cars = [row[0] for row in instances[:100]]
+    assert cars == sorted(cars)
@@ -0,0 +1,64 @@
+import cv2
+import numpy as np
+
+from core.detection import ObjectDetector
+from core.frame_cache import FrameCache, fingerprint
+
+NAMESPACE = ("test", ())
+
+
+def scene(seed=0):
+    """A smooth, textured 480x640 frame, like a static camera view"""
+    noise = np.random.default_rng(seed).integers(0, 255, (48, 64, 3), dtype=np.uint8)
+    return cv2.GaussianBlur(cv2.resize(noise, (640, 480), interpolation=cv2.INTER_CUBIC), (0, 0), 3)
+
+
+def reencoded(frame, quality=80):
+    ok, encoded = cv2.imencode(".jpg", frame, [cv2.IMWRITE_JPEG_QUALITY, quality])
+    return cv2.imdecode(encoded, cv2.IMREAD_COLOR)
+
+
+def test_reencoded_frame_hits():
+    cache = FrameCache()
+    frame = scene()
+    cache.put(NAMESPACE, fingerprint(frame), "boxes")
+    assert cache.get(NAMESPACE, fingerprint(reencoded(frame))) == "boxes"
+    assert cache.get(NAMESPACE, fingerprint(cv2.resize(frame, (320, 240)))) == "boxes"
+
+
+def test_object_entering_static_scene_misses():
+    cache = FrameCache()
+    frame = scene()
+    cache.put(NAMESPACE, fingerprint(frame), "empty scene")
+
+    # A person-sized object a little brighter than the background barely moves the hash
+    entered = frame.copy()
+    entered[200:320, 300:350] = np.clip(entered[200:320, 300:350].astype(np.int16) + 30, 0, 255)
+    assert cache.get(NAMESPACE, fingerprint(entered)) is None
+    assert cache.get(NAMESPACE, fingerprint(scene(seed=1))) is None
+
+
+def test_entries_of_the_same_source_are_not_returned():
+    cache = FrameCache()
+    frame = scene()
+    video, other_video = object(), object()
+    cache.put(NAMESPACE, fingerprint(frame), "frame 1", source=video)
+    assert cache.get(NAMESPACE, fingerprint(frame), source=video) is None
+    assert cache.get(NAMESPACE, fingerprint(frame), source=other_video) == "frame 1"
+
+
+def test_detector_uses_cache_only_when_asked(fake_yolo):
+    cache = FrameCache()
+    detector = ObjectDetector("models/test.pt", frame_cache=cache)
+    frame = scene()
+
+    detector.get_object_positions(frame)
+    detector.get_object_positions(frame)
+    assert len(fake_yolo.calls) == 2 and cache.stats()["entries"] == 0
+
+    stats = {}
+    detector.get_object_positions(frame, use_cache=True, cache_stats=stats)
+    cached = detector.get_object_positions(frame, use_cache=True, cache_stats=stats)
+    assert len(fake_yolo.calls) == 3
+    assert stats == {"hits": 1, "misses": 1}
+    assert set(cached) == {"person", "bicycle", "car"}
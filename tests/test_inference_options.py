@@ -0,0 +1,53 @@
+import threading
+import time
+
+import numpy as np
+import pytest
+
+from core.detection import ObjectDetector
+from core.inference_options import PREDICT_DEFAULTS, InvalidOptions, parse_inference_options
+
+NAMES = {0: "person", 1: "bicycle", 2: "car"}
+FRAME = np.zeros((480, 640, 3), np.uint8)
+
+
+def test_parse_validates_and_maps_classes():
+    options = parse_inference_options(NAMES, classes="car, person", conf=0.5, imgsz=500)
+    assert options == {"classes": [0, 2], "conf": 0.5, "imgsz": 512}
+    with pytest.raises(InvalidOptions):
+        parse_inference_options(NAMES, classes="dog")
+    with pytest.raises(InvalidOptions):
+        parse_inference_options(NAMES, classes="car", allowed_classes=["person"])
+
+
+def test_options_do_not_leak_into_later_calls(fake_yolo):
+    detector = ObjectDetector("models/test.pt", frame_cache=None)
+
+    filtered = detector.get_object_positions(FRAME, {"classes": [0], "max_det": 1, "conf": 0.5})
+    assert set(filtered) == {"person"}
+
+    unfiltered = detector.get_object_positions(FRAME)
+    assert set(unfiltered) == {"person", "bicycle", "car"}
+    # Every call spells out all predict options, so nothing is inherited
+    assert fake_yolo.calls[-1] == PREDICT_DEFAULTS
+
+
+def test_model_calls_are_serialized(fake_yolo, monkeypatch):
+    detector = ObjectDetector("models/test.pt", frame_cache=None)
+    active, overlapped = [0], []
+    original = fake_yolo.__call__
+
+    def tracking_call(self, source, **kwargs):
+        active[0] += 1
+        overlapped.append(active[0] > 1)
+        time.sleep(0.02)
+        active[0] -= 1
+        return original(self, source, **kwargs)
+
+    monkeypatch.setattr(fake_yolo, "__call__", tracking_call)
+    threads = [threading.Thread(target=detector.get_object_positions, args=(FRAME,)) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(overlapped) == 4 and not any(overlapped)
@@ -0,0 +1,48 @@
+import time
+
+import pytest
+
+from core.pipeline import Pipeline, Stage, recent_pipeline_stats
+
+
+@pytest.mark.parametrize("threaded", [True, False])
+@pytest.mark.parametrize("batch_size", [1, 3])
+def test_batching_stage_always_gets_lists(threaded, batch_size):
+    batches = []
+
+    def double(batch):
+        batches.append(batch)
+        return [item * 2 for item in batch]
+
+    pipeline = Pipeline("test", iter(range(7)), [
+        Stage("plain", lambda item: item + 1),
+        Stage("batched", double, batch_size=batch_size)
+    ], threaded=threaded)
+    with pipeline:
+        assert list(pipeline) == [(i + 1) * 2 for i in range(7)]
+    assert all(isinstance(batch, list) and 0 < len(batch) <= batch_size for batch in batches)
+
+
+def test_close_waits_for_a_busy_stage():
+    finished = []
+
+    def slow(item):
+        time.sleep(0.3)
+        finished.append(item)
+        return item
+
+    pipeline = Pipeline("slow", iter(range(100)), [Stage("slow", slow)], threaded=True)
+    with pipeline:
+        next(iter(pipeline))
+    done = len(finished)
+    assert not any(thread.is_alive() for thread in pipeline._threads)
+    time.sleep(0.4)
+    assert len(finished) == done
+
+
+def test_recent_stats_are_copied():
+    with Pipeline("copied", iter(range(3)), [Stage("plain", lambda item: item)]) as pipeline:
+        list(pipeline)
+    stats = recent_pipeline_stats()
+    stats.clear()
+    assert recent_pipeline_stats()["copied"]["stages"]["plain"]["items"] == 3
@@ -0,0 +1,108 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from core.publisher import EventPublisher
+
+
+class StubReceiver:
+    """Local HTTP receiver recording posted payloads; fails the first `failures` requests with 503"""
+
+    def __init__(self, failures=0, delay=0.0):
+        self.received = []
+        self.failures = failures
+        self.delay = delay
+        receiver = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+                time.sleep(receiver.delay)
+                if receiver.failures:
+                    receiver.failures -= 1
+                    self.send_response(503)
+                else:
+                    receiver.received.append(body)
+                    self.send_response(200)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_port}/events"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+@pytest.fixture
+def receiver_factory():
+    receivers = []
+
+    def make(**kwargs):
+        receivers.append(StubReceiver(**kwargs))
+        return receivers[-1]
+
+    yield make
+    for receiver in receivers:
+        receiver.close()
+
+
+def test_publish_does_not_block_and_coalesces(receiver_factory):
+    receiver = receiver_factory(delay=0.2)
+    publisher = EventPublisher(receiver.url).start()
+
+    started = time.monotonic()
+    for i in range(20):
+        publisher.publish("camera-0", {"frame": i})
+    assert time.monotonic() - started < 0.1
+
+    publisher.stop()
+    assert receiver.received[-1] == {"frame": 19}
+    assert len(receiver.received) < 20
+    assert publisher.stats()["coalesced"] > 0
+
+
+def test_stop_flushes_an_update_being_retried(receiver_factory):
+    receiver = receiver_factory(failures=1)
+    publisher = EventPublisher(receiver.url).start()
+
+    publisher.publish("camera-0", {"objects": ["person"]})
+    time.sleep(0.1)  # First attempt fails; the update now waits for its retry
+    publisher.stop()
+
+    assert receiver.received == [{"objects": ["person"]}]
+    stats = publisher.stats()
+    assert stats["sent"] == 1 and stats["retries"] == 1 and stats["dropped"] == 0
+
+
+def test_stop_drops_what_cannot_be_flushed_in_time(receiver_factory):
+    receiver = receiver_factory(failures=100)
+    publisher = EventPublisher(receiver.url, max_retries=100).start()
+
+    publisher.publish("camera-0", {"frame": 1})
+    publisher.publish("camera-1", {"frame": 1})
+    started = time.monotonic()
+    publisher.stop(timeout=0.5)
+    assert time.monotonic() - started < 3
+    assert receiver.received == []
+    assert publisher.stats()["dropped"] == 2
+
+
+def test_stop_without_start_returns_at_once(receiver_factory):
+    receiver = receiver_factory()
+    publisher = EventPublisher(receiver.url)
+    publisher.publish("camera-0", {"frame": 1})
+
+    started = time.monotonic()
+    publisher.stop()
+    assert time.monotonic() - started < 1
+    assert publisher.stats()["dropped"] == 1
+    assert receiver.received == []
@@ -0,0 +1,73 @@
+import pytest
+
+from core import runtime
+from core.runtime import parse_cpu_list, plan_worker
+
+
+class FakeTopology:
+    """`cores` physical cores, each with an SMT sibling"""
+
+    def __init__(self, cores=8):
+        self.cores = [[cpu, cpu + cores] for cpu in range(cores)]
+        self.usable_cores = cores
+
+    def cores_by_node(self):
+        return self.cores
+
+
+@pytest.mark.parametrize("text, cpus", [
+    ("0-3", [0, 1, 2, 3]),
+    ("0-3,8,10-11", [0, 1, 2, 3, 8, 10, 11]),
+    ("5", [5]),
+    ("2,4,\n", [2, 4]),
+    ("", []),
+])
+def test_parse_cpu_list(text, cpus):
+    assert parse_cpu_list(text) == cpus
+
+
+def test_single_worker_gets_the_whole_machine():
+    plan = plan_worker(FakeTopology(), 1, 0, pin=True)
+    assert plan["threads"] == 8 and plan["interop_threads"] == 1
+    assert plan["cpus"] == list(range(16))
+
+
+def test_workers_get_disjoint_shares():
+    plans = [plan_worker(FakeTopology(), 4, index, pin=True) for index in range(4)]
+    assert [plan["threads"] for plan in plans] == [2, 2, 2, 2]
+    assert plans[1]["cpus"] == [2, 3, 10, 11]
+    claimed = [cpu for plan in plans for cpu in plan["cpus"]]
+    assert sorted(claimed) == list(range(16))
+
+    assert plan_worker(FakeTopology(), 4, 0)["cpus"] is None
+    assert plan_worker(FakeTopology(), 4, 0, threads=3, interop_threads=2)["threads"] == 3
+
+
+def test_more_workers_than_cores_are_not_pinned(caplog):
+    plan = plan_worker(FakeTopology(2), 3, 2, pin=True)
+    assert plan["threads"] == 1
+    assert plan["cpus"] is None
+    assert "Not pinning" in caplog.text
+
+
+def test_claims_in_one_process_get_distinct_slots(monkeypatch, tmp_path):
+    if runtime.fcntl is None:
+        pytest.skip("no flock on this platform")
+    monkeypatch.setenv(runtime.RUNTIME_DIR_ENV, str(tmp_path / "run"))
+    monkeypatch.setattr(runtime, "_worker_lock", None)
+
+    first = runtime._claim_worker_slot(3)
+    held = runtime._worker_lock
+    second = runtime._claim_worker_slot(3)
+    assert {first, second} == {0, 1}
+    assert sorted(path.name for path in (tmp_path / "run").iterdir()) == ["vior-worker-0.lock", "vior-worker-1.lock"]
+    held.close()
+    runtime._worker_lock.close()
+
+
+def test_lock_names_are_keyed_by_app(monkeypatch):
+    monkeypatch.delenv(runtime.RUNTIME_DIR_ENV, raising=False)
+    path = runtime._lock_path(0)
+    monkeypatch.setattr(runtime, "APP_DIR", "/srv/other-app")
+    assert runtime._lock_path(0) != path
+    assert runtime._lock_path(0).endswith("-worker-0.lock")
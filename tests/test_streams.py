@@ -0,0 +1,123 @@
+import threading
+import time
+
+import cv2
+import numpy as np
+import pytest
+
+import core.streams
+from core.streams import StabilityDebouncer, StreamIngestService, StreamReader
+
+FRAMES = 20
+FPS = 20
+
+
+@pytest.fixture
+def video(tmp_path):
+    path = str(tmp_path / "camera.avi")
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"MJPG"), FPS, (160, 120))
+    for i in range(FRAMES):
+        writer.write(np.full((120, 160, 3), i * 10, np.uint8))
+    writer.release()
+    return path
+
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(0.01)
+    return True
+
+
+def test_reader_keeps_only_the_latest_frame(video):
+    reader = StreamReader("file", video, loop_files=False).start()
+    try:
+        seen = []
+        while not reader.finished:
+            latest = reader.latest(seen[-1] if seen else 0)
+            if latest is not None:
+                seq, _, _ = latest
+                seen.append(seq)
+                reader.mark_consumed(seq)
+                assert reader.latest(seq) is None
+            time.sleep(0.2)  # A consumer slower than the file's frame rate
+    finally:
+        reader.stop()
+
+    seq, frame, _ = reader.latest()
+    assert seq == reader.frames_read == FRAMES
+    assert abs(float(frame.mean()) - (FRAMES - 1) * 10) < 3
+    assert reader.frames_dropped > 0
+    assert len(seen) < FRAMES
+
+
+class RecordingEvent(threading.Event):
+    def __init__(self):
+        super().__init__()
+        self.waits = []
+
+    def wait(self, timeout=None):
+        self.waits.append(timeout)
+        return super().wait(timeout)
+
+
+def test_lost_live_source_reconnects_with_backoff(monkeypatch, tmp_path):
+    monkeypatch.setattr(core.streams, "RECONNECT_DELAY", 0.01)
+    monkeypatch.setattr(core.streams, "MAX_RECONNECT_DELAY", 0.04)
+    reader = StreamReader("camera", "rtsp://camera/stream")
+    reader.source = str(tmp_path / "gone.avi")  # Opens as a dead source without touching the network
+    reader._stop = RecordingEvent()
+    reader.start()
+    try:
+        assert wait_for(lambda: reader.reconnects >= 5)
+    finally:
+        reader.stop()
+    assert reader._stop.waits[:5] == [0.01, 0.02, 0.04, 0.04, 0.04]
+    assert not reader.finished
+
+
+def test_debouncer_reports_only_stable_changes():
+    debouncer = StabilityDebouncer(stability_threshold=2, cooldown_time=2)
+    person = {"person": ["centre"]}
+    assert not debouncer.update(person, now=0)
+    assert not debouncer.update(person, now=1.5)
+    assert debouncer.update(person, now=2.5)
+    # Unchanged objects are not reported again
+    assert not debouncer.update(person, now=10)
+
+    # A flicker resets the stability clock
+    assert not debouncer.update({}, now=11)
+    assert not debouncer.update(person, now=12)
+    assert not debouncer.update(person, now=13)
+    assert not debouncer.update({}, now=13.5)
+    assert not debouncer.update({}, now=15)
+    assert debouncer.update({}, now=15.6)
+
+
+class FlakyDetector:
+    batch_size = 4
+
+    def __init__(self):
+        self.calls = 0
+
+    def get_object_positions_batch(self, frames, options=None):
+        self.calls += 1
+        if self.calls == 1:
+            raise RuntimeError("CUDA error: device-side assert triggered")
+        return [{"person": [{"object_id": "person_1", "position": "centre", "confidence": 0.9}]} for _ in frames]
+
+
+def test_service_survives_an_inference_error(video, caplog):
+    detector = FlakyDetector()
+    service = StreamIngestService([video], detector=detector, on_change=lambda *args: None).start()
+    try:
+        assert wait_for(lambda: service.frames_inferred >= 3)
+        assert service._thread.is_alive()
+    finally:
+        service.stop()
+    assert service.errors == 1
+    assert service.stats()["errors"] == 1
+    assert "device-side assert" in caplog.text
+    assert "person" in service.latest_detections["0"]
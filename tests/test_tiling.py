@@ -0,0 +1,50 @@
+from core.detection import merge_tile_boxes, tile_grid
+
+SHAPE = (1280, 1280)
+FRAME = (0, 0, 1280, 1280)
+LEFT_TILE = (0, 0, 640, 640)
+RIGHT_TILE = (512, 0, 1152, 640)
+PERSON, CAR = 0, 2
+
+
+def test_tile_grid_covers_the_frame():
+    assert tile_grid(*SHAPE) == [(x, y) for y in (0, 512, 640) for x in (0, 512, 640)]
+
+
+def test_chained_boxes_in_one_tile_stay_separate():
+    # Six people in a row, each box overlapping 70% of the next
+    row = [(100 + 30 * i, 100, 200 + 30 * i, 300, PERSON, 0.9) for i in range(6)]
+    # The whole-frame pass finding the same people again only adds duplicates
+    again = [box[:5] + (0.5,) for box in row]
+    merged = merge_tile_boxes(row + again, [LEFT_TILE] * 6 + [FRAME] * 6, SHAPE)
+    assert sorted(merged) == sorted(row)
+
+
+def test_nested_distinct_objects_are_kept():
+    adult = (100, 100, 400, 600, PERSON, 0.9)
+    child = (200, 150, 260, 300, PERSON, 0.8)
+    merged = merge_tile_boxes([adult, child], [FRAME, LEFT_TILE], SHAPE)
+    assert sorted(merged) == sorted([adult, child])
+
+
+def test_duplicate_from_overlapping_tiles_keeps_the_best_box():
+    best = (520, 100, 600, 200, CAR, 0.9)
+    duplicate = (522, 101, 601, 199, CAR, 0.7)
+    assert merge_tile_boxes([duplicate, best], [RIGHT_TILE, LEFT_TILE], SHAPE) == [best]
+    # Other classes are never suppressed
+    person = (522, 101, 601, 199, PERSON, 0.7)
+    assert len(merge_tile_boxes([best, person], [LEFT_TILE, RIGHT_TILE], SHAPE)) == 2
+
+
+def test_piece_cut_at_a_seam_gives_way_without_growing_the_whole_box():
+    piece = (600, 100, 640, 200, CAR, 0.8)  # Cut by the left tile's right edge
+    whole = (600, 100, 700, 200, CAR, 0.6)
+    assert merge_tile_boxes([piece, whole], [LEFT_TILE, RIGHT_TILE], SHAPE) == [whole]
+
+
+def test_box_at_the_image_border_is_not_cut():
+    right_tile = (640, 0, 1280, 640)
+    at_border = (1200, 100, 1280, 200, CAR, 0.8)
+    larger = (1150, 80, 1280, 260, CAR, 0.9)
+    merged = merge_tile_boxes([at_border, larger], [right_tile, FRAME], SHAPE)
+    assert sorted(merged) == sorted([at_border, larger])
@@ -0,0 +1,92 @@
+import numpy as np
+
+from core.timeline import CHUNK_ROWS, DetectionTimeline
+
+NAMES = {0: "person", 2: "car"}
+BOX = (10, 20, 110, 220)
+
+
+def test_append_across_chunk_boundary():
+    timeline = DetectionTimeline(NAMES, fps=10)
+    total = CHUNK_ROWS + 10
+    for frame in range(total):
+        timeline.append(frame, frame / 10, 0, 1, BOX, 0.5)
+        if frame == CHUNK_ROWS - 1:
+            assert len(timeline.rows) == CHUNK_ROWS  # Cached view is rebuilt after more rows arrive
+
+    assert len(timeline) == total
+    assert len(timeline._chunks) == 2
+    rows = timeline.rows
+    assert rows['frame'].tolist() == list(range(total))
+    assert rows['x2'][CHUNK_ROWS] == 110
+
+
+def test_extend_keeps_order_with_appends():
+    restored = DetectionTimeline(NAMES)
+    restored.append(0, 0.0, 0, 1, BOX, 0.9)
+    restored.append(1, 0.1, 0, 1, BOX, 0.9)
+
+    timeline = DetectionTimeline(NAMES)
+    timeline.append(0, 0.0, 2, 5, BOX, 0.8)
+    timeline.extend(restored.rows)
+    timeline.append(2, 0.2, 2, 5, BOX, 0.8)
+    assert timeline.rows['track_id'].tolist() == [5, 1, 1, 5]
+
+
+def test_class_counts_have_empty_bins_for_gaps():
+    timeline = DetectionTimeline(NAMES)
+    timeline.append(2, 0.2, 0, 1, BOX, 0.9)
+    timeline.append(5, 0.5, 0, 1, BOX, 0.9)  # Same track in the same second counts once
+    timeline.append(5, 0.5, 0, 2, BOX, 0.8)
+    timeline.append(31, 3.1, 0, 1, BOX, 0.9)
+    timeline.append(31, 3.1, 2, 3, BOX, 0.7)
+
+    assert timeline.class_counts_over_time(1.0) == {"person": [2, 0, 0, 1], "car": [0, 0, 0, 1]}
+    assert timeline.class_counts_over_time(2.0) == {"person": [2, 1], "car": [0, 1]}
+    assert DetectionTimeline(NAMES).class_counts_over_time() == {}
+
+
+def test_track_summary():
+    timeline = DetectionTimeline(NAMES)
+    timeline.track_names = {1: "person_1", 2: "car_1"}
+    timeline.append(0, 0.0, 0, 1, BOX, 0.9)
+    timeline.append(10, 1.0, 2, 2, BOX, 0.6)
+    timeline.append(20, 2.0, 0, 1, BOX, 0.9)
+    timeline.append(45, 4.5, 0, 1, BOX, 0.9)
+
+    assert timeline.track_summary() == [
+        {"track_id": 1, "object_id": "person_1", "object": "person", "first_seen": 0.0,
+         "last_seen": 4.5, "dwell_time": 4.5, "sightings": 3},
+        {"track_id": 2, "object_id": "car_1", "object": "car", "first_seen": 1.0,
+         "last_seen": 1.0, "dwell_time": 0.0, "sightings": 1},
+    ]
+    assert timeline.first_seen(1) == 0.0 and timeline.last_seen(1) == 4.5
+    assert timeline.first_seen(7) is None
+    assert DetectionTimeline().track_summary() == []
+
+
+def test_save_and_load(tmp_path):
+    timeline = DetectionTimeline(NAMES, fps=25.0, chunk_rows=4)
+    timeline.track_names = {1: "person_1"}
+    for frame in range(10):
+        timeline.append(frame, frame / 25, 0, 1, BOX, 0.75)
+    path = str(tmp_path / "timeline.npz")
+    timeline.save(path)
+
+    loaded = DetectionTimeline.load(path)
+    assert np.array_equal(loaded.rows, timeline.rows)
+    assert loaded.names == NAMES and loaded.fps == 25.0
+    assert loaded.track_names == {1: "person_1"}
+    assert loaded.track_summary() == timeline.track_summary()
+    loaded.append(10, 0.4, 0, 1, BOX, 0.75)
+    assert len(loaded) == 11
+
+
+def test_save_and_load_empty(tmp_path):
+    path = str(tmp_path / "empty.npz")
+    DetectionTimeline(NAMES).save(path)
+
+    loaded = DetectionTimeline.load(path)
+    assert len(loaded) == 0 and len(loaded.rows) == 0
+    assert loaded.names == NAMES and loaded.fps is None
+    assert loaded.track_summary() == [] and loaded.class_counts_over_time() == {}
@@ -0,0 +1,72 @@
+import io
+
+import cv2
+import numpy as np
+import pytest
+
+from core.uploads import BufferPool, ImageArchive, InvalidArchive, UploadTooLarge, read_image_upload
+
+
+def _jpeg(size):
+    ok, encoded = cv2.imencode('.jpg', np.random.randint(0, 255, (size, size, 3), np.uint8))
+    return encoded.tobytes()
+
+
+def test_buffer_pool_reuses_buffers():
+    pool = BufferPool(max_buffers=1, initial_size=1024, max_retained_size=1024 * 1024)
+    with pool.borrow() as first:
+        pass
+    with pool.borrow() as second:
+        assert second is first
+
+
+def test_buffer_pool_drops_buffers_past_retained_size():
+    pool = BufferPool(max_buffers=1, initial_size=1024, max_retained_size=64 * 1024)
+    data = _jpeg(512)
+    assert len(data) > 64 * 1024
+
+    image = read_image_upload(pool, io.BytesIO(data), limit=len(data))
+    assert image.shape == (512, 512, 3)
+    assert pool.dropped == 1
+    with pool.borrow() as buffer:
+        assert len(buffer) == 1024
+
+
+def test_read_image_upload_rejects_oversized():
+    pool = BufferPool(max_buffers=1, initial_size=1024)
+    with pytest.raises(UploadTooLarge):
+        read_image_upload(pool, io.BytesIO(b'x' * 5000), limit=4096)
+
+
+def _zip(path, names, data=b'x'):
+    import zipfile
+    with zipfile.ZipFile(path, 'w') as archive:
+        for name in names:
+            archive.writestr(name, data)
+    return str(path)
+
+
+def test_image_archive_lists_entries_up_front(tmp_path):
+    path = _zip(tmp_path / 'images.zip', ['a.jpg', 'b.png', 'notes.txt'])
+    archive = ImageArchive(path, max_entries=10)
+    try:
+        assert len(archive) == 3
+        results = list(archive.images(['image/jpeg', 'image/png'], limit=1024))
+    finally:
+        archive.close()
+    assert [name for name, _, _ in results] == ['a.jpg', 'b.png', 'notes.txt']
+    assert results[0][1] == b'x' and results[0][2] is None
+    assert results[2][1] is None and results[2][2].startswith("Invalid file type")
+
+
+def test_image_archive_rejects_corrupt_archive(tmp_path):
+    path = tmp_path / 'broken.zip'
+    path.write_bytes(b'PK\x03\x04 not really a zip')
+    with pytest.raises(InvalidArchive):
+        ImageArchive(str(path))
+
+
+def test_image_archive_enforces_max_entries(tmp_path):
+    path = _zip(tmp_path / 'many.zip', [f'{i}.jpg' for i in range(5)])
+    with pytest.raises(InvalidArchive, match="Too many files"):
+        ImageArchive(path, max_entries=4)